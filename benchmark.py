@@ -0,0 +1,389 @@
+from pathlib import Path
+import ctypes
+import gc
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from compiler.astnodes import Node
+from compiler.compiler import Compiler
+from compiler.typesystem import TypeSystem
+from compiler.wasm_backend import WasmBackend
+from compiler.wasm_binary import parse
+from compiler.wasm_peephole import RULES, countInstrs
+from test import build_and_check_ast
+import llvmlite.binding as llvm
+from ctypes import CFUNCTYPE, c_int
+from contextlib import contextmanager
+from typing import List, Tuple
+
+runtime_tests_dir = (Path(__file__).parent / "tests/runtime/").resolve()
+benchmark_tests_dir = (Path(__file__).parent / "tests/benchmark/").resolve()
+
+llvm_opt_levels = [0, 1, 2, 3]
+llvm_runs = 5
+
+
+llvm_allocators = ["gc", "arena"]
+
+wasm_runs = 3
+
+# (number of class chains, classes per chain) for the generated class hierarchies
+class_hierarchy_sizes = [(10, 10), (10, 50), (20, 100), (50, 100)]
+
+# (nesting depth, variables per function) for the generated nested functions
+nested_function_sizes = [(5, 50), (20, 20), (50, 10), (50, 40)]
+typecheck_runs = 3
+
+# source lines of the generated program whose AST size is measured
+ast_memory_lines = 100000
+
+
+def run_all_benchmarks():
+    run_llvm_opt_benchmarks()
+    run_llvm_alloc_benchmarks()
+    run_wasm_bulk_memory_benchmarks()
+    run_wasm_locals_report()
+    run_wasm_peephole_report()
+    run_class_layout_benchmarks()
+    run_typecheck_benchmarks()
+    run_ast_memory_benchmarks()
+
+
+@contextmanager
+def suppress_output():
+    # silence output from compiled programs, including buffered C stdio
+    libc = ctypes.CDLL(None)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    libc.fflush(None)
+    saved = [os.dup(1), os.dup(2)]
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    try:
+        yield
+    finally:
+        libc.fflush(None)
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        os.close(devnull)
+        os.close(saved[0])
+        os.close(saved[1])
+
+
+def benchmark_programs() -> List[Path]:
+    return sorted(benchmark_tests_dir.glob("*.py")) + sorted(runtime_tests_dir.glob("*.py"))
+
+
+def time_llvm(test: Path, optLevel: int, alloc: str = "gc"):
+    # returns (compile seconds, jit seconds, best run seconds)
+    start = time.perf_counter()
+    compiler = Compiler()
+    chocopy_ast = build_and_check_ast(compiler, test)
+    module = compiler.optimizeLLVM(
+        compiler.emitLLVM(chocopy_ast, alloc), optLevel)
+    compiled = time.perf_counter()
+    target_machine = llvm.Target.from_default_triple().create_target_machine()
+    with llvm.create_mcjit_compiler(module, target_machine) as ee:
+        ee.finalize_object()
+        fptr = CFUNCTYPE(c_int)(ee.get_function_address("main"))
+        jitted = time.perf_counter()
+        best = None
+        with suppress_output():
+            for _ in range(llvm_runs):
+                run_start = time.perf_counter()
+                fptr()
+                elapsed = time.perf_counter() - run_start
+                if best is None or elapsed < best:
+                    best = elapsed
+    return compiled - start, jitted - compiled, best
+
+
+def run_llvm_opt_benchmarks():
+    print("Running LLVM optimization level benchmarks...\n")
+    header = "{:<40}".format("program")
+    for level in llvm_opt_levels:
+        header += "{:>12}".format(f"-O{level} (ms)")
+    header += "{:>10}".format("speedup")
+    print(header)
+    totals = {level: 0.0 for level in llvm_opt_levels}
+    for test in benchmark_programs():
+        times = {}
+        for level in llvm_opt_levels:
+            _, _, run = time_llvm(test, level)
+            times[level] = run
+            totals[level] += run
+        row = "{:<40}".format(test.parent.name + "/" + test.name)
+        for level in llvm_opt_levels:
+            row += "{:>12.3f}".format(times[level] * 1000)
+        best = min(times[level] for level in llvm_opt_levels[1:])
+        row += "{:>9.2f}x".format(times[0] / best if best > 0 else 0)
+        print(row)
+    row = "{:<40}".format("total")
+    for level in llvm_opt_levels:
+        row += "{:>12.3f}".format(totals[level] * 1000)
+    print(row + "\n")
+
+
+def run_llvm_alloc_benchmarks(optLevel: int = 2):
+    print(f"Running LLVM allocator benchmarks (-O{optLevel})...\n")
+    header = "{:<40}".format("program")
+    for alloc in llvm_allocators:
+        header += "{:>12}".format(f"{alloc} (ms)")
+    print(header)
+    for test in benchmark_programs():
+        row = "{:<40}".format(test.parent.name + "/" + test.name)
+        for alloc in llvm_allocators:
+            _, _, run = time_llvm(test, optLevel, alloc)
+            row += "{:>12.3f}".format(run * 1000)
+        print(row)
+    print()
+
+
+def time_wasm(test: Path, bulkMemory: bool = True) -> float:
+    # returns the best wall clock seconds for running the program with node, including startup
+    compiler = Compiler()
+    chocopy_ast = build_and_check_ast(compiler, test)
+    wasm = compiler.emitWASMBinary(test.name[:-3], chocopy_ast, bulkMemory)
+    runtime = str(Path(__file__).parent / "wasm.js")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        wasm_file = os.path.join(tmpdir, test.name[:-3] + ".wasm")
+        with open(wasm_file, "wb") as f:
+            f.write(wasm)
+        best = None
+        for _ in range(wasm_runs):
+            start = time.perf_counter()
+            subprocess.run(["node", runtime, wasm_file], check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+    assert best is not None
+    return best
+
+
+def run_wasm_bulk_memory_benchmarks():
+    print("Running WASM bulk memory benchmarks...\n")
+    header = "{:<40}{:>12}{:>12}{:>10}".format(
+        "program", "loop (ms)", "bulk (ms)", "speedup")
+    print(header)
+    for test in sorted(benchmark_tests_dir.glob("*.py")):
+        loop = time_wasm(test, False)
+        bulk = time_wasm(test, True)
+        print("{:<40}{:>12.3f}{:>12.3f}{:>9.2f}x".format(
+            test.parent.name + "/" + test.name, loop * 1000, bulk * 1000, loop / bulk))
+    print()
+
+
+def count_wasm_locals(test: Path, reuseLocals: bool) -> List[int]:
+    # returns the number of locals declared by each function, excluding the stdlib
+    stdlib = parse("(module " + WasmBackend("", TypeSystem()).stdlib() + ")")[0]
+    assert isinstance(stdlib, list)
+    stdlib_funcs = set(f[1] for f in stdlib if isinstance(f, list) and f[0] == "func")
+    compiler = Compiler()
+    chocopy_ast = build_and_check_ast(compiler, test)
+    wat = compiler.emitWASM(test.name[:-3], chocopy_ast,
+                            reuseLocals=reuseLocals).emit()
+    module = parse(wat)[0]
+    assert isinstance(module, list)
+    counts = []
+    for field in module:
+        if isinstance(field, list) and field[0] == "func" and field[1] not in stdlib_funcs:
+            counts.append(len([x for x in field if isinstance(x, list)
+                               and len(x) > 0 and x[0] == "local"]))
+    return counts
+
+
+def run_wasm_locals_report():
+    print("WASM locals per function, without and with reuse of temporaries...\n")
+    header = "{:<40}{:>14}{:>14}{:>14}{:>14}".format(
+        "program", "total before", "total after", "max before", "max after")
+    print(header)
+    totals = [0, 0]
+    for test in benchmark_programs():
+        before = count_wasm_locals(test, False)
+        after = count_wasm_locals(test, True)
+        totals[0] += sum(before)
+        totals[1] += sum(after)
+        print("{:<40}{:>14}{:>14}{:>14}{:>14}".format(
+            test.parent.name + "/" + test.name, sum(before), sum(after), max(before), max(after)))
+    print("{:<40}{:>14}{:>14}\n".format("total", totals[0], totals[1]))
+
+
+def run_wasm_peephole_report():
+    print("WASM instructions, without and with the peephole optimizer...\n")
+    print("{:<40}{:>14}{:>14}".format("program", "before", "after"))
+    totals = [0, 0]
+    rewrites = {r: 0 for r in RULES}
+    removed = {r: 0 for r in RULES}
+    for test in benchmark_programs():
+        compiler = Compiler()
+        chocopy_ast = build_and_check_ast(compiler, test)
+        builder = compiler.emitWASM(test.name[:-3], chocopy_ast, peephole=False)
+        before = countInstrs(builder)
+        peephole = compiler.optimizeWASM(builder)
+        after = countInstrs(builder)
+        totals[0] += before
+        totals[1] += after
+        for r in peephole.rules:
+            rewrites[r] += peephole.rewrites[r]
+            removed[r] += peephole.removed[r]
+        print("{:<40}{:>14}{:>14}".format(
+            test.parent.name + "/" + test.name, before, after))
+    print("{:<40}{:>14}{:>14}\n".format("total", totals[0], totals[1]))
+    print("{:<40}{:>14}{:>14}".format("rule", "rewrites", "removed"))
+    for r in RULES:
+        print("{:<40}{:>14}{:>14}".format(r, rewrites[r], removed[r]))
+    print()
+
+
+def class_hierarchy_program(chains: int, depth: int) -> str:
+    # each class overrides a method of its superclass, and adds a method and an attribute
+    lines = []
+    for c in range(chains):
+        for d in range(depth):
+            name = f"C{c}_{d}"
+            superclass = "object" if d == 0 else f"C{c}_{d - 1}"
+            lines.append(f"class {name}({superclass}):")
+            lines.append(f"    a{d}: int = {d}")
+            lines.append(f"    def get(self: \"{name}\") -> int:")
+            lines.append(f"        return self.a{d}")
+            lines.append(f"    def m{d}(self: \"{name}\") -> int:")
+            lines.append(f"        return self.get() + {d}")
+    for c in range(chains):
+        lines.append(f"x{c}: C{c}_0 = None")
+    for c in range(chains):
+        lines.append(f"x{c} = C{c}_{depth - 1}()")
+        lines.append(f"print(x{c}.get() + x{c}.m0())")
+    return "\n".join(lines) + "\n"
+
+
+def run_class_layout_benchmarks():
+    print("Compile time for generated class hierarchies...\n")
+    print("{:<24}{:>14}{:>14}{:>14}{:>14}{:>14}".format(
+        "chains x depth", "check (ms)", "layout (ms)", "lower (ms)", "wasm (ms)", "llvm (ms)"))
+    for chains, depth in class_hierarchy_sizes:
+        source = class_hierarchy_program(chains, depth)
+        compiler = Compiler()
+        start = time.perf_counter()
+        chocopy_ast = compiler.parseSource(source, "classes.py")
+        assert chocopy_ast is not None
+        compiler.typecheck(chocopy_ast)
+        assert len(compiler.typechecker.errors) == 0
+        checked = time.perf_counter()
+        # lay out every class from scratch
+        compiler.ts.layouts.clear()
+        for cls in compiler.ts.classes:
+            compiler.ts.getLayout(cls)
+        laidOut = time.perf_counter()
+        compiler.lower(chocopy_ast)
+        lowered = time.perf_counter()
+        compiler.emitWASM("classes", chocopy_ast)
+        wasm = time.perf_counter()
+        compiler.emitLLVM(chocopy_ast)
+        end = time.perf_counter()
+        print("{:<24}{:>14.1f}{:>14.1f}{:>14.1f}{:>14.1f}{:>14.1f}".format(
+            f"{chains} x {depth}", (checked - start) * 1000, (laidOut - checked) * 1000,
+            (lowered - laidOut) * 1000,
+            (wasm - lowered) * 1000, (end - wasm) * 1000))
+    print()
+
+
+def nested_function_program(depth: int, names: int) -> str:
+    # each function declares variables, a nested function, and adds up every visible variable
+    lines = []
+    for d in range(depth):
+        indent = "    " * d
+        lines.append(f"{indent}def f{d}(a{d}: int) -> int:")
+        lines.append(f"{indent}    t{d}: int = 0")
+        for i in range(names):
+            lines.append(f"{indent}    v{d}_{i}: int = {i}")
+    for d in reversed(range(depth)):
+        indent = "    " * (d + 1)
+        for k in range(d + 1):
+            for i in range(names):
+                lines.append(f"{indent}t{d} = t{d} + v{k}_{i} + a{k}")
+        if d < depth - 1:
+            lines.append(f"{indent}return f{d + 1}(t{d})")
+        else:
+            lines.append(f"{indent}return t{d}")
+    lines.append("print(f0(1))")
+    return "\n".join(lines) + "\n"
+
+
+def run_typecheck_benchmarks():
+    print("Typechecker throughput for generated nested functions...\n")
+    print("{:<24}{:>14}{:>14}{:>20}".format(
+        "depth x names", "identifiers", "check (ms)", "identifiers/ms"))
+    for depth, names in nested_function_sizes:
+        source = nested_function_program(depth, names)
+        # each update statement reads three identifiers and assigns one
+        identifiers = 4 * names * depth * (depth + 1) // 2
+        best = None
+        for _ in range(typecheck_runs):
+            compiler = Compiler()
+            chocopy_ast = compiler.parseSource(source, "nested.py")
+            assert chocopy_ast is not None
+            start = time.perf_counter()
+            compiler.typecheck(chocopy_ast)
+            elapsed = time.perf_counter() - start
+            assert len(compiler.typechecker.errors) == 0
+            if best is None or elapsed < best:
+                best = elapsed
+        assert best is not None
+        print("{:<24}{:>14}{:>14.1f}{:>20.1f}".format(
+            f"{depth} x {names}", identifiers, best * 1000, identifiers / (best * 1000)))
+    print()
+
+
+def ast_memory_program(lines: int) -> str:
+    # functions of ten lines each, mixing the common statements and expressions
+    source = []
+    for i in range(lines // 10):
+        source += [
+            f"def f{i}(a: int, b: [int]) -> int:",
+            "    x: int = 0",
+            "    s: str = \"s\"",
+            "    while x < a:",
+            "        x = x + b[x % len(b)] * 2",
+            "        if x > 10 and not (x == 3):",
+            "            s = s + \"t\"",
+            "        else:",
+            "            print(x)",
+            "    return x + len(s)",
+        ]
+    return "\n".join(source) + "\n"
+
+
+def measure_ast_memory(lines: int, trace: bool) -> Tuple[int, int, int]:
+    # returns (AST nodes, bytes retained by the AST, peak RSS in kilobytes)
+    # run in a fresh interpreter, so that the peak RSS only covers this program
+    source = ast_memory_program(lines)
+    if trace:
+        tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    chocopy_ast = Compiler().parseSource(source, "memory.py")
+    assert chocopy_ast is not None
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    nodes = sum(1 for o in gc.get_objects() if isinstance(o, Node))
+    return nodes, retained, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_ast_memory_benchmarks():
+    print(f"AST memory for a generated {ast_memory_lines} line program...\n")
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        nodes, retained, _ = pool.apply(measure_ast_memory, (ast_memory_lines, True))
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        _, _, rss = pool.apply(measure_ast_memory, (ast_memory_lines, False))
+    print("{:<24}{:>14}".format("AST nodes", nodes))
+    print("{:<24}{:>14.1f}".format("AST size (MB)", retained / (1 << 20)))
+    print("{:<24}{:>14.1f}".format("bytes per node", retained / nodes))
+    print("{:<24}{:>14.1f}\n".format("peak RSS (MB)", rss / 1024))
@@ -17,7 +17,7 @@ from .stringliteral import StringLiteral
 from .callexpr import CallExpr
 from .exprstmt import ExprStmt
 from .indexexpr import IndexExpr
-from .node import Node
+from .node import Node, Location
 from .typeannotation import TypeAnnotation
 from .classdef import ClassDef
 from .forstmt import ForStmt
@@ -1,11 +1,13 @@
 from .stmt import Stmt
 from .expr import Expr
+from .node import Location
 from typing import List
 
 
 class AssignStmt(Stmt):
+    __slots__ = ("targets", "value")
 
-    def __init__(self, location: List[int], targets: List[Expr], value: Expr):
+    def __init__(self, location: Location, targets: List[Expr], value: Expr):
         super().__init__(location, "AssignStmt")
         self.targets = targets
         self.value = value
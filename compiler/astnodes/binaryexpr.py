@@ -1,10 +1,11 @@
 from .expr import Expr
-from typing import List
+from .node import Location
 
 
 class BinaryExpr(Expr):
+    __slots__ = ("left", "right", "operator")
 
-    def __init__(self, location: List[int], left: Expr, operator: str, right: Expr):
+    def __init__(self, location: Location, left: Expr, operator: str, right: Expr):
         super().__init__(location, "BinaryExpr")
         self.left = left
         self.right = right
@@ -1,10 +1,11 @@
 from .literal import Literal
-from typing import List
+from .node import Location
 
 
 class BooleanLiteral(Literal):
+    __slots__ = ()
 
-    def __init__(self, location: List[int], value: bool):
+    def __init__(self, location: Location, value: bool):
         super().__init__(location, "BooleanLiteral")
         # pyrefly: ignore [bad-assignment]
         self.value = value
@@ -1,11 +1,13 @@
 from .expr import Expr
 from .identifier import Identifier
+from .node import Location
 from typing import List
 
 
 class CallExpr(Expr):
+    __slots__ = ("function", "args", "isConstructor", "freevars")
 
-    def __init__(self, location: List[int], function: Identifier, args: List[Expr]):
+    def __init__(self, location: Location, function: Identifier, args: List[Expr]):
         super().__init__(location, "CallExpr")
         self.function = function
         self.args = args
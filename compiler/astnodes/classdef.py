@@ -7,12 +7,14 @@ from .classtype import ClassType
 from ..types.classvaluetype import ClassValueType
 from ..types.functype import FuncType
 from ..types.Types import NoneType
+from .node import Location
 from typing import List
 
 
 class ClassDef(Declaration):
+    __slots__ = ("name", "superclass", "declarations")
 
-    def __init__(self, location: List[int], name: Identifier, superclass: Identifier, declarations: List[Declaration]):
+    def __init__(self, location: Location, name: Identifier, superclass: Identifier, declarations: List[Declaration]):
         super().__init__(location, "ClassDef")
         self.name = name
         self.superclass = superclass
@@ -1,10 +1,11 @@
 from .typeannotation import TypeAnnotation
-from typing import List
+from .node import Location
 
 
 class ClassType(TypeAnnotation):
+    __slots__ = ("className",)
 
-    def __init__(self, location: List[int], className: str):
+    def __init__(self, location: Location, className: str):
         super().__init__(location, "ClassType")
         self.className = className
 
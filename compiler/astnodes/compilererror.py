@@ -1,10 +1,10 @@
-from .node import Node
-from typing import List
+from .node import Node, Location
 
 
 class CompilerError(Node):
+    __slots__ = ("message", "syntax")
 
-    def __init__(self, location: List[int], message: str, syntax: bool = False):
+    def __init__(self, location: Location, message: str, syntax: bool = False):
         super().__init__(location, "CompilerError")
         self.message = message
         self.syntax = syntax
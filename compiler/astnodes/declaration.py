@@ -1,11 +1,11 @@
 from .identifier import Identifier
-from .node import Node
-from typing import List
+from .node import Node, Location
 
 
 class Declaration(Node):
+    __slots__ = ()
 
-    def __init__(self, location: List[int], kind: str):
+    def __init__(self, location: Location, kind: str):
         super().__init__(location, kind)
 
     def getIdentifier(self) -> Identifier:
@@ -1,11 +1,12 @@
-from .node import Node
+from .node import Node, Location
 from .compilererror import CompilerError
 from typing import List
 
 
 class Errors(Node):
+    __slots__ = ("errors",)
 
-    def __init__(self, location: List[int], errors: List[CompilerError]):
+    def __init__(self, location: Location, errors: List[CompilerError]):
         super().__init__(location, "Errors")
         self.errors = errors
 
@@ -1,12 +1,13 @@
-from .node import Node
-from typing import List, Optional, Union
+from .node import Node, Location
+from typing import Optional, Union
 from ..types import ValueType, FuncType
 
 
 class Expr(Node):
+    __slots__ = ("inferredType", "shouldBoxAsRef")
     inferredType: Optional[Union[ValueType, FuncType]]
 
-    def __init__(self, location: List[int], kind: str):
+    def __init__(self, location: Location, kind: str):
         super().__init__(location, kind)
         self.inferredType = None
         self.shouldBoxAsRef = False
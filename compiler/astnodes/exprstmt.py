@@ -1,11 +1,12 @@
 from .stmt import Stmt
 from .expr import Expr
-from typing import List
+from .node import Location
 
 
 class ExprStmt(Stmt):
+    __slots__ = ("expr",)
 
-    def __init__(self, location: List[int], expr: Expr):
+    def __init__(self, location: Location, expr: Expr):
         super().__init__(location, "ExprStmt")
         self.expr = expr
 
@@ -1,12 +1,14 @@
 from .stmt import Stmt
 from .expr import Expr
 from .identifier import Identifier
+from .node import Location
 from typing import List
 
 
 class ForStmt(Stmt):
+    __slots__ = ("identifier", "iterable", "body")
 
-    def __init__(self, location: List[int], identifier: Identifier, iterable: Expr, body: List[Stmt]):
+    def __init__(self, location: Location, identifier: Identifier, iterable: Expr, body: List[Stmt]):
         super().__init__(location, "ForStmt")
         self.identifier = identifier
         self.iterable = iterable
@@ -4,19 +4,22 @@ from .typedvar import TypedVar
 from .typeannotation import TypeAnnotation
 from .stmt import Stmt
 from ..types import FuncType
+from .node import Location
 from typing import List, Optional
 
 
 class FuncDef(Declaration):
+    __slots__ = ("name", "params", "returnType", "declarations",
+                 "statements", "isMethod", "freevars", "type")
     freevars: List[Identifier]  # used in AST transformations, not printed out
-    type: Optional[FuncType] = None  # type signature of function
+    type: Optional[FuncType]  # type signature of function
 
     # The AST for
     #     def NAME(PARAMS) -> RETURNTYPE:
     #         DECLARATIONS
     #         STATEMENTS
 
-    def __init__(self, location: List[int], name: Identifier, params: List[TypedVar], returnType: TypeAnnotation,
+    def __init__(self, location: Location, name: Identifier, params: List[TypedVar], returnType: TypeAnnotation,
                  declarations: List[Declaration], statements: List[Stmt], isMethod: bool = False):
         super().__init__(location, "FuncDef")
         self.name = name
@@ -26,6 +29,7 @@ class FuncDef(Declaration):
         self.statements = [s for s in statements if s is not None]
         self.isMethod = isMethod
         self.freevars = []
+        self.type = None
 
     def getFreevarNames(self):
         return set([v.name for v in self.freevars])
@@ -1,5 +1,6 @@
 from .expr import Expr
-from typing import List, Optional
+from .node import Location
+from typing import Optional
 from ..types import VarInstance
 
 CIL_KEYWORDS = set(["char", "value", "int32", "int64", "string", "long", "null"] +
@@ -122,11 +123,13 @@ CIL_KEYWORDS = set(["char", "value", "int32", "int64", "string", "long", "null"]
 
 
 class Identifier(Expr):
-    varInstance: Optional[VarInstance] = None
+    __slots__ = ("name", "varInstance")
+    varInstance: Optional[VarInstance]
 
-    def __init__(self, location: List[int], name: str):
+    def __init__(self, location: Location, name: str):
         super().__init__(location, "Identifier")
         self.name = name
+        self.varInstance = None
 
     def visit(self, visitor):
         return visitor.Identifier(self)
@@ -1,10 +1,11 @@
 from .expr import Expr
-from typing import List
+from .node import Location
 
 
 class IfExpr(Expr):
+    __slots__ = ("condition", "thenExpr", "elseExpr")
 
-    def __init__(self, location: List[int], condition: Expr, thenExpr: Expr, elseExpr: Expr):
+    def __init__(self, location: Location, condition: Expr, thenExpr: Expr, elseExpr: Expr):
         super().__init__(location, "IfExpr")
         self.condition = condition
         self.thenExpr = thenExpr
@@ -1,11 +1,13 @@
 from .stmt import Stmt
 from .expr import Expr
+from .node import Location
 from typing import List
 
 
 class IfStmt(Stmt):
+    __slots__ = ("condition", "thenBody", "elseBody")
 
-    def __init__(self, location: List[int], condition: Expr, thenBody: List[Stmt], elseBody: List[Stmt]):
+    def __init__(self, location: Location, condition: Expr, thenBody: List[Stmt], elseBody: List[Stmt]):
         super().__init__(location, "IfStmt")
         self.condition = condition
         self.thenBody = [s for s in thenBody if s is not None]
@@ -1,10 +1,11 @@
 from .expr import Expr
-from typing import List
+from .node import Location
 
 
 class IndexExpr(Expr):
+    __slots__ = ("list", "index")
 
-    def __init__(self, location: List[int], lst: Expr, index: Expr):
+    def __init__(self, location: Location, lst: Expr, index: Expr):
         super().__init__(location, "IndexExpr")
         self.list = lst
         self.index = index
@@ -1,10 +1,11 @@
 from .literal import Literal
-from typing import List
+from .node import Location
 
 
 class IntegerLiteral(Literal):
+    __slots__ = ()
 
-    def __init__(self, location: List[int], value: int):
+    def __init__(self, location: Location, value: int):
         super().__init__(location, "IntegerLiteral")
         # pyrefly: ignore [bad-assignment]
         self.value = value
@@ -1,12 +1,14 @@
 from .expr import Expr
 from ..types import ValueType
+from .node import Location
 from typing import List, Optional
 
 
 class ListExpr(Expr):
+    __slots__ = ("elements", "emptyListType")
     emptyListType: Optional[ValueType]
 
-    def __init__(self, location: List[int], elements: List[Expr]):
+    def __init__(self, location: Location, elements: List[Expr]):
         super().__init__(location, "ListExpr")
         self.elements = elements
         # this is populated by the EmptyListTyper pass
@@ -1,10 +1,11 @@
 from .typeannotation import TypeAnnotation
-from typing import List
+from .node import Location
 
 
 class ListType(TypeAnnotation):
+    __slots__ = ("elementType",)
 
-    def __init__(self, location: List[int], elementType: TypeAnnotation):
+    def __init__(self, location: Location, elementType: TypeAnnotation):
         super().__init__(location, "ListType")
         self.elementType = elementType
 
@@ -1,10 +1,11 @@
 from .expr import Expr
-from typing import List
+from .node import Location
 
 
 class Literal(Expr):
+    __slots__ = ("value",)
 
-    def __init__(self, location: List[int], kind: str):
+    def __init__(self, location: Location, kind: str):
         super().__init__(location, kind)
         self.value = None
 
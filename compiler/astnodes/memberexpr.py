@@ -1,12 +1,14 @@
 from .expr import Expr
 from .identifier import Identifier
-from typing import List, Union
+from .node import Location
+from typing import Union
 from ..types import FuncType, ValueType
 
 
 class MemberExpr(Expr):
+    __slots__ = ("object", "member")
 
-    def __init__(self, location: List[int], obj: Expr, member: Identifier):
+    def __init__(self, location: Location, obj: Expr, member: Identifier):
         super().__init__(location, "MemberExpr")
         self.object = obj
         self.member = member
@@ -1,11 +1,13 @@
 from .expr import Expr
 from .memberexpr import MemberExpr
+from .node import Location
 from typing import List
 
 
 class MethodCallExpr(Expr):
+    __slots__ = ("method", "args")
 
-    def __init__(self, location: List[int], method: MemberExpr, args: List[Expr]):
+    def __init__(self, location: Location, method: MemberExpr, args: List[Expr]):
         super().__init__(location, "MethodCallExpr")
         self.method = method
         self.args = args
@@ -1,16 +1,27 @@
-from typing import List, Self, Optional
+from typing import Self, Optional, Tuple
+
+# line and column
+Location = Tuple[int, int]
 
 
 class Node:
+    # nodes have no __dict__, which keeps large ASTs small
+    # subclasses must declare the attributes they add in __slots__
+    # the location is stored as two ints, rather than a tuple per node
+    __slots__ = ("kind", "line", "col", "errorMsg")
     errorMsg: Optional[str]
 
-    def __init__(self, location: List[int], kind: str):
+    def __init__(self, location: Location, kind: str):
         if len(location) != 2:
             raise Exception('location must be length 2')
         self.kind = kind
-        self.location = location
+        self.line, self.col = location
         self.errorMsg = None
 
+    @property
+    def location(self) -> Location:
+        return (self.line, self.col)
+
     def visit(self, visitor) -> Self:
         raise Exception('operation not supported')
 
@@ -24,7 +35,7 @@ class Node:
         d = {}
         d['kind'] = self.kind
         if dump_location:
-            d['location'] = self.location + self.location
+            d['location'] = [self.line, self.col, self.line, self.col]
         if self.errorMsg is not None:
             d['errorMsg'] = self.errorMsg
         return d
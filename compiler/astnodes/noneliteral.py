@@ -1,10 +1,11 @@
 from .literal import Literal
-from typing import List
+from .node import Location
 
 
 class NoneLiteral(Literal):
+    __slots__ = ()
 
-    def __init__(self, location: List[int]):
+    def __init__(self, location: Location):
         super().__init__(location, "NoneLiteral")
         self.value = None
 
@@ -1,11 +1,12 @@
 from .declaration import Declaration
 from .identifier import Identifier
-from typing import List
+from .node import Location
 
 
 class NonLocalDecl(Declaration):
+    __slots__ = ("variable",)
 
-    def __init__(self, location: List[int], variable: Identifier):
+    def __init__(self, location: Location, variable: Identifier):
         super().__init__(location, "NonLocalDecl")
         self.variable = variable
 
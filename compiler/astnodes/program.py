@@ -1,4 +1,4 @@
-from .node import Node
+from .node import Node, Location
 from .declaration import Declaration
 from .stmt import Stmt
 from .errors import Errors
@@ -8,8 +8,9 @@ from typing import List
 
 
 class Program(Node):
+    __slots__ = ("declarations", "statements", "errors")
 
-    def __init__(self, location: List[int], declarations: List[Declaration], statements: List[Stmt], errors: Errors):
+    def __init__(self, location: Location, declarations: List[Declaration], statements: List[Stmt], errors: Errors):
         super().__init__(location, "Program")
         self.declarations = [d for d in declarations if d is not None]
         self.statements = [s for s in statements if s is not None]
@@ -1,13 +1,15 @@
 from .stmt import Stmt
 from .expr import Expr
 from ..types import ValueType
-from typing import List, Optional
+from .node import Location
+from typing import Optional
 
 
 class ReturnStmt(Stmt):
+    __slots__ = ("value", "expType")
     expType: Optional[ValueType]
 
-    def __init__(self, location: List[int], value: Optional[Expr]):
+    def __init__(self, location: Location, value: Optional[Expr]):
         super().__init__(location, "ReturnStmt")
         self.value = value
         self.isReturn = True
@@ -1,9 +1,9 @@
-from .node import Node
-from typing import List
+from .node import Node, Location
 
 
 class Stmt(Node):
+    __slots__ = ("isReturn",)
 
-    def __init__(self, location: List[int], kind: str):
+    def __init__(self, location: Location, kind: str):
         super().__init__(location, kind)
         self.isReturn = False
@@ -1,10 +1,11 @@
 from .literal import Literal
-from typing import List
+from .node import Location
 
 
 class StringLiteral(Literal):
+    __slots__ = ()
 
-    def __init__(self, location: List[int], value: str):
+    def __init__(self, location: Location, value: str):
         super().__init__(location, "StringLiteral")
         # pyrefly: ignore [bad-assignment]
         self.value = value
@@ -1,8 +1,8 @@
-from .node import Node
-from typing import List
+from .node import Node, Location
 
 
 class TypeAnnotation(Node):
+    __slots__ = ()
 
-    def __init__(self, location: List[int], kind: str):
+    def __init__(self, location: Location, kind: str):
         super().__init__(location, kind)
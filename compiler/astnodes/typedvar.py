@@ -1,18 +1,21 @@
-from .node import Node
+from .node import Node, Location
 from .identifier import Identifier
 from .typeannotation import TypeAnnotation
 from ..types import ValueType, VarInstance
-from typing import List, Optional
+from typing import Optional
 
 
 class TypedVar(Node):
-    t: Optional[ValueType] = None  # the typechecked type goes here
-    varInstance: Optional[VarInstance] = None
+    __slots__ = ("identifier", "type", "t", "varInstance")
+    t: Optional[ValueType]  # the typechecked type goes here
+    varInstance: Optional[VarInstance]
 
-    def __init__(self, location: List[int], identifier: Identifier, typ: TypeAnnotation):
+    def __init__(self, location: Location, identifier: Identifier, typ: TypeAnnotation):
         super().__init__(location, "TypedVar")
         self.identifier = identifier
         self.type = typ
+        self.t = None
+        self.varInstance = None
 
     def name(self):
         return self.identifier.name
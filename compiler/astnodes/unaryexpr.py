@@ -1,10 +1,11 @@
 from .expr import Expr
-from typing import List
+from .node import Location
 
 
 class UnaryExpr(Expr):
+    __slots__ = ("operator", "operand")
 
-    def __init__(self, location: List[int], operator: str, operand: Expr):
+    def __init__(self, location: Location, operator: str, operand: Expr):
         super().__init__(location, "UnaryExpr")
         self.operand = operand
         self.operator = operator
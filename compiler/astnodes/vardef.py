@@ -2,13 +2,15 @@ from .declaration import Declaration
 from .expr import Expr
 from .identifier import Identifier
 from .typedvar import TypedVar
-from typing import List, Optional
+from .node import Location
+from typing import Optional
 
 
 class VarDef(Declaration):
+    __slots__ = ("var", "value", "isAttr", "attrOfClass")
     attrOfClass: Optional[str]
 
-    def __init__(self, location: List[int], var: TypedVar, value: Expr, isAttr: bool = False, attrOfClass=None):
+    def __init__(self, location: Location, var: TypedVar, value: Expr, isAttr: bool = False, attrOfClass=None):
         super().__init__(location, "VarDef")
         self.var = var
         self.value = value
@@ -1,11 +1,13 @@
 from .stmt import Stmt
 from .expr import Expr
+from .node import Location
 from typing import List
 
 
 class WhileStmt(Stmt):
+    __slots__ = ("condition", "body")
 
-    def __init__(self, location: List[int], condition: Expr, body: List[Stmt]):
+    def __init__(self, location: Location, condition: Expr, body: List[Stmt]):
         super().__init__(location, "WhileStmt")
         self.condition = condition
         self.body = [s for s in body if s is not None]
@@ -181,13 +181,11 @@ class CilBackend(CommonVisitor):
             self.visit(c)
 
     def ClassDef(self, node: ClassDef):
-        def constructor(superclass: str, func: FuncDef):
-            func.type = func.getTypeX().dropFirstParam()
-            func.name.name = ".ctor"
+        def constructor(superclass: str, func: FuncDef, fields: List[VarDef]):
             # add call to parent constructor after child field initialization
             # before other constructor statements
             self.FuncDef(func, "specialname rtspecialname instance",
-                         node.superclass.getCILName())
+                         node.superclass.getCILName(), fields)
 
         func_decls = [d for d in node.declarations if isinstance(d, FuncDef)]
         var_decls = [d for d in node.declarations if isinstance(d, VarDef)]
@@ -207,16 +205,15 @@ class CilBackend(CommonVisitor):
             if d.name.name == "__init__":
                 # constructor
                 constructor_def = d
-                d.declarations = var_decls + d.declarations
-                constructor(superclass, d)
+                constructor(superclass, d, var_decls)
             else:
                 # method
-                d.type = d.getTypeX().dropFirstParam()
                 self.FuncDef(d, "virtual instance")
         if constructor_def is None:
             # give a default constructor if none exists
             funcDef = node.getDefaultConstructor()
-            constructor(superclass, funcDef)
+            # the default constructor already declares the fields
+            constructor(superclass, funcDef, [])
 
         self.unindent()  # end class
 
@@ -231,10 +228,17 @@ class CilBackend(CommonVisitor):
             locals.newLine(sortedDecls[i].decl() + comma)
         locals.unindent().newLine(")")
 
-    def FuncDef(self, node: FuncDef, funcType: str = "static", superConstructor: Optional[str] = None):
+    def FuncDef(self, node: FuncDef, funcType: str = "static", superConstructor: Optional[str] = None,
+                fields: Optional[List[VarDef]] = None):
+        # the AST is shared with other backends, so methods and constructors are not rewritten in place
+        # self is the implicit this argument of instance methods
+        t = node.getTypeX()
+        if "instance" in funcType:
+            t = t.dropFirstParam()
+        name = ".ctor" if superConstructor else node.name.getCILName()
         self.instr(f".method public hidebysig {funcType}")
         self.instr(
-            f"{node.getTypeX().getCILSignature(node.name.getCILName())} cil managed")
+            f"{t.getCILSignature(name)} cil managed")
         self.indent()
         self.instr(f".maxstack {self.stackLimit}")
         self.enterScope()
@@ -244,7 +248,8 @@ class CilBackend(CommonVisitor):
         for i in range(len(node.params)):
             param = node.params[i]
             self.newLocalEntry(param.identifier.name, param.getTypeX(), True)
-        for d in node.declarations:
+        # constructors initialize the fields first
+        for d in (fields or []) + node.declarations:
             self.visit(d)
         # pyrefly: ignore [bad-assignment]
         self.returnType = node.getTypeX().returnType
@@ -6,9 +6,9 @@ from .types import *
 
 def typeToAnnotation(t: ValueType) -> TypeAnnotation:
     if isinstance(t, ListValueType):
-        return ListType([0, 0], typeToAnnotation(t.elementType))
+        return ListType((0, 0), typeToAnnotation(t.elementType))
     elif isinstance(t, ClassValueType):
-        return ClassType([0, 0], t.className)
+        return ClassType((0, 0), t.className)
     else:
         raise Exception("unexpected type")
 
@@ -58,7 +58,7 @@ class ClosureTransformer(TypeChecker):
             assert isinstance(node.method.object.inferredType, ClassValueType)
             class_name, member_name = node.method.object.inferredType.className, node.method.member.name
             t = self.ts.getMethod(class_name, member_name)
-        if t is None or len(t.freevars) == 0 or not isinstance(t, FuncType):
+        if not isinstance(t, FuncType) or len(t.freevars) == 0:
             return
         for fv in t.freevars:
             node.args.append(fv.copy())
@@ -8,17 +8,25 @@ from .empty_list_typer import EmptyListTyper
 from .nestedfunchoister import NestedFuncHoister
 from .typesystem import TypeSystem
 from .jvm_backend import JvmBackend
+from .jvm_classfile import assembleClass
 from .cil_backend import CilBackend
 from .python_backend import PythonBackend
 from .wasm_backend import WasmBackend
+from .wasm_binary import assembleBuilder
+from .wasm_peephole import WasmPeephole
+from .builder import Builder
 from .llvm_backend import LlvmBackend
+from .llvm_optimizer import optimize
+from .llvm_native import emitObject, linkExecutable
 import ast
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Compiler:
     transformer: Optional[ClosureTransformer] = None
+    # the program that has already been lowered for the backends
+    lowered: Optional[Program] = None
 
     def __init__(self):
         self.ts = TypeSystem()
@@ -26,7 +34,6 @@ class Compiler:
         self.typechecker = TypeChecker(self.ts)
 
     def parse(self, infile) -> Optional[Program]:
-        astparser = self.parser
         # given an input file, parse it into an AST object
         lines = None
         fname = infile
@@ -37,6 +44,11 @@ class Compiler:
         else:
             with open(infile, "r") as f:
                 lines = "".join([line for line in f])
+        return self.parseSource(lines, fname)
+
+    def parseSource(self, lines: str, fname: str) -> Optional[Program]:
+        # given the source text of a file, parse it into an AST object
+        astparser = self.parser
         try:
             tree = ast.parse(lines)
             return astparser.visit(tree)
@@ -54,6 +66,15 @@ class Compiler:
         self.transformer.visit(ast)
         return ast
 
+    def lower(self, ast: Program) -> Program:
+        # lower closures and type empty lists, which mutates the AST
+        # backends only read the lowered AST, so it is shared by every target emitted from it
+        if ast is not self.lowered:
+            self.closurepass(ast)
+            EmptyListTyper().visit(ast)
+            self.lowered = ast
+        return ast
+
     def typecheck(self, ast: Program):
         # given an AST object, typecheck it
         # typechecking mutates the AST, adding types and errors
@@ -66,33 +87,67 @@ class Compiler:
         return backend.builder
 
     def emitJVM(self, main: str, ast: Program):
-        self.closurepass(ast)
-        EmptyListTyper().visit(ast)
+        self.lower(ast)
         assert self.transformer is not None
         jvm_backend = JvmBackend(main, self.transformer.ts)
         jvm_backend.visit(ast)
         return jvm_backend.classes
 
+    def emitJVMClasses(self, main: str, ast: Program) -> Dict[str, bytes]:
+        # encode each class as a .class file, without an external assembler
+        classes = {}
+        for builder in self.emitJVM(main, ast).values():
+            name, classfile = assembleClass(builder.emit())
+            classes[name] = classfile
+        return classes
+
     def emitCIL(self, main: str, ast: Program):
-        self.closurepass(ast)
-        EmptyListTyper().visit(ast)
+        self.lower(ast)
         assert self.transformer is not None
         cil_backend = CilBackend(main, self.transformer.ts)
         cil_backend.visit(ast)
         return cil_backend.builder
 
-    def emitWASM(self, main: str, ast: Program):
-        self.closurepass(ast)
-        EmptyListTyper().visit(ast)
+    def emitWASM(self, main: str, ast: Program, bulkMemory: bool = True, reuseLocals: bool = True,
+                 peephole: bool = True):
+        # bulkMemory selects whether the bulk memory instructions can be used
+        # reuseLocals selects whether locals of dead temporaries are reused
+        # peephole selects whether the emitted instructions are optimized with all peephole rules
+        self.lower(ast)
         assert self.transformer is not None
-        wasm_backend = WasmBackend(main, self.transformer.ts)
+        wasm_backend = WasmBackend(
+            main, self.transformer.ts, bulkMemory, reuseLocals)
         wasm_backend.visit(ast)
+        if peephole:
+            self.optimizeWASM(wasm_backend.builder)
         return wasm_backend.builder
 
-    def emitLLVM(self, ast: Program):
-        self.closurepass(ast)
-        EmptyListTyper().visit(ast)
+    def optimizeWASM(self, builder: Builder, rules: Optional[List[str]] = None) -> WasmPeephole:
+        # rewrite the instructions in place, returns the optimizer with statistics for each rule
+        peephole = WasmPeephole(rules)
+        peephole.optimize(builder)
+        return peephole
+
+    def emitWASMBinary(self, main: str, ast: Program, bulkMemory: bool = True, peephole: bool = True) -> bytes:
+        # encode the WASM module in the binary format, without external tools
+        return assembleBuilder(self.emitWASM(main, ast, bulkMemory, peephole=peephole))
+
+    def emitLLVM(self, ast: Program, alloc: str = "gc"):
+        # alloc selects the runtime allocator, either "gc" or "arena"
+        self.lower(ast)
         assert self.transformer is not None
-        llvm_backend = LlvmBackend(self.transformer.ts)
+        llvm_backend = LlvmBackend(self.transformer.ts, alloc)
         llvm_backend.visit(ast)
         return llvm_backend.module
+
+    def optimizeLLVM(self, module, optLevel: int = 0, passes: Optional[List[str]] = None):
+        # run the LLVM pass pipeline for the given optimization level
+        return optimize(module, optLevel, passes)
+
+    def emitLLVMObject(self, module, optLevel: int = 0, passes: Optional[List[str]] = None) -> bytes:
+        # compile the LLVM module to a native object file
+        return emitObject(module, optLevel, passes)
+
+    def linkNative(self, objfile: str, outfile: str):
+        # link a native object file into an executable
+        linkExecutable(objfile, outfile)
@@ -3,15 +3,17 @@ from .types import *
 from .builder import Builder
 from .typesystem import TypeSystem
 from .visitor import CommonVisitor
+from .jvm_classfile import frameSize
 from typing import List, Dict, Optional, cast, Callable
 import json
 
 
 class JvmBackend(CommonVisitor):
-    localLimit = 50
-    stackLimit = 500
     defaultToGlobals = False  # treat all vars as global if this is true
     classes: Dict[str, Builder]
+    # placeholder for the .code directive of the current method, and the index of its first instruction
+    codeHeader: Optional[Builder] = None
+    codeStart = 0
 
     def __init__(self, main: str, ts: TypeSystem):
         self.classes = {}
@@ -42,7 +44,7 @@ class JvmBackend(CommonVisitor):
 
     def wrap(self, val: Expr, elementType: ValueType):
         self.loadInt(1)
-        self.instr(f"anewarray {elementType.getJavaName(True)}")
+        self.newArray(elementType)
         self.instr("dup")
         self.loadInt(0)
         self.visit(val)
@@ -68,24 +70,42 @@ class JvmBackend(CommonVisitor):
         else:
             self.instr(f"iload {n}")
 
-    def arrayStore(self, elementType: ValueType):
-        # expect the stack to be array, idx, value
+    def newArray(self, elementType: ValueType):
+        # expect the stack to be the length
+        # ints and bools are stored unboxed in primitive arrays
         if elementType == IntType():
+            self.instr("newarray int")
+        elif elementType == BoolType():
+            self.instr("newarray boolean")
+        else:
+            self.instr(f"anewarray {elementType.getJavaName()}")
+
+    def box(self, valueType: ValueType):
+        # box an int or bool that is used as an object
+        if valueType == IntType():
             self.instr(
                 "invokestatic Method java/lang/Integer valueOf (I)Ljava/lang/Integer;")
-        elif elementType == BoolType():
+        elif valueType == BoolType():
             self.instr(
                 "invokestatic Method java/lang/Boolean valueOf (Z)Ljava/lang/Boolean;")
-        self.instr("aastore")
+
+    def arrayStore(self, elementType: ValueType):
+        # expect the stack to be array, idx, value
+        if elementType == IntType():
+            self.instr("iastore")
+        elif elementType == BoolType():
+            self.instr("bastore")
+        else:
+            self.instr("aastore")
 
     def arrayLoad(self, elementType: ValueType):
         # expect the stack to be array, idx
-        self.instr("aaload")
         if elementType == IntType():
-            self.instr("invokevirtual Method java/lang/Integer intValue ()I")
+            self.instr("iaload")
         elif elementType == BoolType():
-            self.instr(
-                "invokevirtual Method java/lang/Boolean booleanValue ()Z")
+            self.instr("baload")
+        else:
+            self.instr("aaload")
 
     def newLocalEntry(self, name: str) -> int:
         # add a new entry to locals table w/o storing anything
@@ -108,6 +128,19 @@ class JvmBackend(CommonVisitor):
         self.locals[-1][name] = n
         return n
 
+    def beginCode(self):
+        # the frame size is only known once the code has been emitted
+        self.codeHeader = self.currentBuilder().newBlock()
+        self.codeStart = len(self.currentBuilder().lines)
+
+    def endCode(self, signature: str, isStatic: bool):
+        # compute the max stack and locals by simulating the emitted code
+        assert self.codeHeader is not None
+        code = cast(List[str], self.currentBuilder().lines[self.codeStart:])
+        stack, locals = frameSize(code, signature, isStatic)
+        self.codeHeader.newLine(f".code stack {stack} locals {locals}")
+        self.instr(".end code")
+
     def visitStmtList(self, stmts: List[Stmt]):
         if len(stmts) == 0:
             self.instr("nop")
@@ -131,26 +164,25 @@ class JvmBackend(CommonVisitor):
         # main
         self.instr(".method public static main : ([Ljava/lang/String;)V")
         self.currentBuilder().indent()
-        self.instr(
-            f".code stack {self.stackLimit} locals {len(node.declarations) + self.localLimit}")
+        self.beginCode()
         self.defaultToGlobals = True
         self.visitStmtList(node.statements)
         self.defaultToGlobals = False
         self.instr("return")
-        self.instr(".end code")
+        self.endCode("([Ljava/lang/String;)V", True)
         self.currentBuilder().unindent()
         self.instr(".end method")
 
         # global inits
         self.instr(".method static <clinit> : ()V")
         self.currentBuilder().indent()
-        self.instr(".code stack 1 locals 0")
+        self.beginCode()
         for v in var_decls:
             self.visit(v.value)
             self.instr(
                 f"putstatic Field {self.main} {v.var.identifier.name} {v.var.getTypeX().getJavaSignature()}")
         self.instr("return")
-        self.instr(".end code")
+        self.endCode("()V", True)
         self.currentBuilder().unindent()
         self.instr(".end method")
 
@@ -184,19 +216,20 @@ class JvmBackend(CommonVisitor):
         for d in func_decls:
             if d.name.name == "__init__":
                 constructor_def = d
-                d.declarations = var_decls + d.declarations
-                self.constructor(superclass, d)
+                self.constructor(superclass, d, var_decls)
             else:
                 self.method(d)
         if constructor_def is None:
+            # the default constructor already declares the fields
             funcDef = node.getDefaultConstructor()
-            self.constructor(superclass, funcDef)
+            self.constructor(superclass, funcDef, [])
         self.instr(".end class")
 
-    def funcDefHelper(self, node: FuncDef):
+    def funcDefHelper(self, node: FuncDef, fields: Optional[List[VarDef]] = None):
         for i in range(len(node.params)):
             self.newLocalEntry(node.params[i].identifier.name)
-        for d in node.declarations:
+        # constructors initialize the fields first
+        for d in (fields or []) + node.declarations:
             self.visit(d)
         # pyrefly: ignore [bad-assignment]
         self.returnType = node.getTypeX().returnType
@@ -210,19 +243,18 @@ class JvmBackend(CommonVisitor):
             self.buildReturn(None)
         self.exitScope()
 
-    def constructor(self, superclass: str, node: FuncDef):
+    def constructor(self, superclass: str, node: FuncDef, fields: List[VarDef]):
         self.enterScope()
         constructorSig = node.getTypeX().dropFirstParam()
         self.instr(
             f".method public <init> : {constructorSig.getJavaSignature()}")
         self.currentBuilder().indent()
-        self.instr(
-            f".code stack {self.stackLimit} locals {len(node.declarations) + self.localLimit}")
+        self.beginCode()
         # call superclass constructor
         self.instr("aload 0")
         self.instr(f"invokespecial Method {superclass} <init> ()V ")
-        self.funcDefHelper(node)
-        self.instr(".end code")
+        self.funcDefHelper(node, fields)
+        self.endCode(constructorSig.getJavaSignature(), False)
         self.currentBuilder().unindent()
         self.instr(".end method")
 
@@ -232,10 +264,9 @@ class JvmBackend(CommonVisitor):
         self.instr(
             f".method public {node.name.name} : {methodSig.getJavaSignature()}")
         self.currentBuilder().indent()
-        self.instr(
-            f".code stack {self.stackLimit} locals {len(node.declarations) + self.localLimit}")
+        self.beginCode()
         self.funcDefHelper(node)
-        self.instr(".end code")
+        self.endCode(methodSig.getJavaSignature(), False)
         self.currentBuilder().unindent()
         self.instr(".end method")
 
@@ -244,10 +275,9 @@ class JvmBackend(CommonVisitor):
         self.instr(
             f".method public static {node.name.name} : {node.getTypeX().getJavaSignature()}")
         self.currentBuilder().indent()
-        self.instr(
-            f".code stack {self.stackLimit} locals {len(node.declarations) + self.localLimit}")
+        self.beginCode()
         self.funcDefHelper(node)
-        self.instr(".end code")
+        self.endCode(node.getTypeX().getJavaSignature(), True)
         self.currentBuilder().unindent()
         self.instr(".end method")
 
@@ -357,6 +387,49 @@ class JvmBackend(CommonVisitor):
     def isListConcat(self, operator: str, leftType: ValueType, rightType: ValueType) -> bool:
         return leftType.isListType() and rightType.isListType() and operator == "+"
 
+    def copyList(self, src: int, srcType: ValueType, dest: int, destType: ValueType,
+                 offset: Optional[int], length: int):
+        # copy length elements from the start of src to dest, starting at offset in dest
+        # offset and length are locals, offset is 0 if it is None
+        if srcType.isJavaRef() or not destType.isJavaRef():
+            self.instr(f"aload {src}")
+            self.instr("iconst_0")
+            self.instr(f"aload {dest}")
+            if offset is None:
+                self.instr("iconst_0")
+            else:
+                self.instr(f"iload {offset}")
+            self.instr(f"iload {length}")
+            self.instr(
+                "invokestatic Method java/lang/System arraycopy (Ljava/lang/Object;ILjava/lang/Object;II)V")
+            return
+        # elements of primitive arrays are boxed one at a time
+        self.instr("iconst_0")
+        idx = self.newLocal(None, False)
+        startLabel = self.newLabelName()
+        endLabel = self.newLabelName()
+        self.label(startLabel)
+        self.instr(f"iload {idx}")
+        self.instr(f"iload {length}")
+        self.instr(f"if_icmpge {endLabel}")
+        self.instr(f"aload {dest}")
+        self.instr(f"iload {idx}")
+        if offset is not None:
+            self.instr(f"iload {offset}")
+            self.instr("iadd")
+        self.instr(f"aload {src}")
+        self.instr(f"iload {idx}")
+        self.arrayLoad(srcType)
+        self.box(srcType)
+        self.arrayStore(destType)
+        self.instr(f"iload {idx}")
+        self.instr("iconst_1")
+        self.instr("iadd")
+        self.instr(f"istore {idx}")
+        self.instr(f"goto {startLabel}")
+        self.label(endLabel)
+        self.instr("nop")
+
     def BinaryExpr(self, node: BinaryExpr):
         operator = node.operator
         leftType = node.left.inferredValueType()
@@ -368,37 +441,24 @@ class JvmBackend(CommonVisitor):
         # concatenation and addition
         if operator == "+":
             if self.isListConcat(operator, leftType, rightType):
-                self.instr("dup2")
                 arrR = self.newLocal(None, True)
-                # stack is L, R, L
+                arrL = self.newLocal(None, True)
+                self.instr(f"aload {arrL}")
                 self.instr("arraylength")
                 lenL = self.newLocal(None, False)
+                self.instr(f"aload {arrR}")
                 self.instr("arraylength")
                 lenR = self.newLocal(None, False)
                 self.instr(f"iload {lenL}")
                 self.instr(f"iload {lenR}")
                 self.instr("iadd")
-                # stack is L, total_length
                 list_t = cast(ListValueType, self.ts.join(leftType, rightType))
-                self.instr(
-                    f"anewarray {list_t.elementType.getJavaName(True)}")
+                self.newArray(list_t.elementType)
                 newArr = self.newLocal(None, True)
-                self.instr("iconst_0")
-                self.instr(f"aload {newArr}")
-                self.instr("iconst_0")
-                self.instr(f"iload {lenL}")
-                # stack is L, 0, new_array, 0, len(L)
-                self.instr(
-                    "invokestatic Method java/lang/System arraycopy (Ljava/lang/Object;ILjava/lang/Object;II)V")
-                # stack is new_array
-                self.instr(f"aload {arrR}")
-                self.instr("iconst_0")
-                self.instr(f"aload {newArr}")
-                self.instr(f"iload {lenL}")
-                self.instr(f"iload {lenR}")
-                # stack is R, 0, new_array, len(L), len(R)
-                self.instr(
-                    "invokestatic Method java/lang/System arraycopy (Ljava/lang/Object;ILjava/lang/Object;II)V")
+                self.copyList(arrL, cast(ListValueType, leftType).elementType,
+                              newArr, list_t.elementType, None, lenL)
+                self.copyList(arrR, cast(ListValueType, rightType).elementType,
+                              newArr, list_t.elementType, lenL, lenR)
                 self.instr(f"aload {newArr}")
             elif leftType == StrType():
                 self.instr(
@@ -562,11 +622,13 @@ class JvmBackend(CommonVisitor):
                 elementType = ClassValueType("object")
         else:
             elementType = cast(ListValueType, t).elementType
-        self.instr(f"anewarray {elementType.getJavaName(True)}")
+        self.newArray(elementType)
         for i in range(len(node.elements)):
             self.instr("dup")
             self.loadInt(i)
             self.visit(node.elements[i])
+            if elementType.isJavaRef():
+                self.box(node.elements[i].inferredValueType())
             self.arrayStore(elementType)
 
     def WhileStmt(self, node: WhileStmt):
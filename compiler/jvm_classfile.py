@@ -0,0 +1,417 @@
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+# assembles the Krakatau assembly emitted by JvmBackend directly into .class files,
+# so that no external assembler is needed to produce them
+# supports the subset of the assembler syntax used by the backend:
+# one class per input, fields, and methods with a single code attribute
+
+CLASS_MAGIC = 0xCAFEBABE
+
+CONSTANT_UTF8 = 1
+CONSTANT_INTEGER = 3
+CONSTANT_CLASS = 7
+CONSTANT_STRING = 8
+CONSTANT_FIELDREF = 9
+CONSTANT_METHODREF = 10
+CONSTANT_NAME_AND_TYPE = 12
+
+ACCESS_FLAGS = {"public": 0x0001, "private": 0x0002, "protected": 0x0004,
+                "static": 0x0008, "final": 0x0010, "super": 0x0020,
+                "abstract": 0x0400}
+
+# opcodes for instructions without operands
+SIMPLE_OPS: Dict[str, int] = {
+    "nop": 0x00, "aconst_null": 0x01,
+    "iconst_m1": 0x02, "iconst_0": 0x03, "iconst_1": 0x04, "iconst_2": 0x05,
+    "iconst_3": 0x06, "iconst_4": 0x07, "iconst_5": 0x08,
+    "iaload": 0x2e, "aaload": 0x32, "baload": 0x33,
+    "iastore": 0x4f, "aastore": 0x53, "bastore": 0x54,
+    "pop": 0x57, "pop2": 0x58, "dup": 0x59, "dup_x1": 0x5a, "dup_x2": 0x5b,
+    "dup2": 0x5c, "dup2_x1": 0x5d, "dup2_x2": 0x5e, "swap": 0x5f,
+    "iadd": 0x60, "isub": 0x64, "imul": 0x68, "idiv": 0x6c, "irem": 0x70,
+    "ineg": 0x74, "ishl": 0x78, "ishr": 0x7a, "iushr": 0x7c,
+    "iand": 0x7e, "ior": 0x80, "ixor": 0x82,
+    "ireturn": 0xac, "areturn": 0xb0, "return": 0xb1,
+    "arraylength": 0xbe, "athrow": 0xbf,
+}
+
+# opcodes for instructions taking a local variable index
+LOCAL_OPS: Dict[str, int] = {"iload": 0x15, "aload": 0x19,
+                             "istore": 0x36, "astore": 0x3a}
+WIDE = 0xc4
+
+# opcodes for instructions taking a label
+BRANCH_OPS: Dict[str, int] = {
+    "ifeq": 0x99, "ifne": 0x9a, "iflt": 0x9b, "ifge": 0x9c, "ifgt": 0x9d, "ifle": 0x9e,
+    "if_icmpeq": 0x9f, "if_icmpne": 0xa0, "if_icmplt": 0xa1, "if_icmpge": 0xa2,
+    "if_icmpgt": 0xa3, "if_icmple": 0xa4, "if_acmpeq": 0xa5, "if_acmpne": 0xa6,
+    "goto": 0xa7, "ifnull": 0xc6, "ifnonnull": 0xc7,
+}
+
+# opcodes for instructions taking a class
+CLASS_OPS: Dict[str, int] = {"new": 0xbb, "anewarray": 0xbd,
+                             "checkcast": 0xc0, "instanceof": 0xc1}
+
+# opcodes for instructions taking a field or method reference
+FIELD_OPS: Dict[str, int] = {"getstatic": 0xb2, "putstatic": 0xb3,
+                             "getfield": 0xb4, "putfield": 0xb5}
+METHOD_OPS: Dict[str, int] = {"invokevirtual": 0xb6, "invokespecial": 0xb7,
+                              "invokestatic": 0xb8}
+
+LDC = 0x12
+LDC_W = 0x13
+BIPUSH = 0x10
+SIPUSH = 0x11
+NEWARRAY = 0xbc
+ARRAY_TYPES = {"boolean": 4, "char": 5, "float": 6, "double": 7,
+               "byte": 8, "short": 9, "int": 10, "long": 11}
+
+TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|\S+')
+
+# change in operand stack depth for instructions without operands, in slots
+SIMPLE_STACK_EFFECTS: Dict[str, int] = {
+    "nop": 0, "aconst_null": 1,
+    "iconst_m1": 1, "iconst_0": 1, "iconst_1": 1, "iconst_2": 1,
+    "iconst_3": 1, "iconst_4": 1, "iconst_5": 1,
+    "iaload": -1, "aaload": -1, "baload": -1,
+    "iastore": -3, "aastore": -3, "bastore": -3,
+    "pop": -1, "pop2": -2, "dup": 1, "dup_x1": 1, "dup_x2": 1,
+    "dup2": 2, "dup2_x1": 2, "dup2_x2": 2, "swap": 0,
+    "iadd": -1, "isub": -1, "imul": -1, "idiv": -1, "irem": -1,
+    "ineg": 0, "ishl": -1, "ishr": -1, "iushr": -1,
+    "iand": -1, "ior": -1, "ixor": -1,
+    "ireturn": -1, "areturn": -1, "return": 0,
+    "arraylength": 0, "athrow": -1,
+}
+# branches that pop one or two operands, other branches pop none
+UNARY_BRANCHES = {"ifeq", "ifne", "iflt", "ifge", "ifgt", "ifle", "ifnull", "ifnonnull"}
+BINARY_BRANCHES = {"if_icmpeq", "if_icmpne", "if_icmplt", "if_icmpge", "if_icmpgt",
+                   "if_icmple", "if_acmpeq", "if_acmpne"}
+# instructions that never continue to the next instruction
+TERMINATORS = {"goto", "ireturn", "areturn", "return", "athrow"}
+
+
+def u1(n: int) -> bytes:
+    return n.to_bytes(1, "big")
+
+
+def u2(n: int) -> bytes:
+    return n.to_bytes(2, "big")
+
+
+def s2(n: int) -> bytes:
+    return n.to_bytes(2, "big", signed=True)
+
+
+def u4(n: int) -> bytes:
+    return n.to_bytes(4, "big")
+
+
+def modifiedUtf8(s: str) -> bytes:
+    # the JVM encodes NUL with 2 bytes and characters outside the BMP as surrogate pairs
+    out = bytearray()
+    units = s.encode("utf-16-be", "surrogatepass")
+    for i in range(0, len(units), 2):
+        c = int.from_bytes(units[i:i + 2], "big")
+        if 0 < c < 0x80:
+            out.append(c)
+        elif c < 0x800:
+            out += bytes([0xc0 | (c >> 6), 0x80 | (c & 0x3f)])
+        else:
+            out += bytes([0xe0 | (c >> 12), 0x80 | ((c >> 6) & 0x3f), 0x80 | (c & 0x3f)])
+    return bytes(out)
+
+
+def parseDescriptor(desc: str) -> Tuple[List[str], str]:
+    # split a method descriptor into the parameter types and return type
+    if not desc.startswith("(") or ")" not in desc:
+        raise Exception(f"Malformed method descriptor: {desc}")
+    params = []
+    i = 1
+    while desc[i] != ")":
+        start = i
+        while desc[i] == "[":
+            i += 1
+        i = desc.index(";", i) + 1 if desc[i] == "L" else i + 1
+        params.append(desc[start:i])
+    return params, desc[i + 1:]
+
+
+def slotSize(desc: str) -> int:
+    # number of stack or local slots taken by a value of the type
+    if desc == "V":
+        return 0
+    return 2 if desc in {"J", "D"} else 1
+
+
+def stackEffect(tokens: List[str]) -> int:
+    # change in operand stack depth after executing the instruction
+    op = tokens[0]
+    if op in SIMPLE_STACK_EFFECTS:
+        return SIMPLE_STACK_EFFECTS[op]
+    elif op in {"iload", "aload", "ldc", "bipush", "sipush", "new"}:
+        return 1
+    elif op in {"istore", "astore"} or op in UNARY_BRANCHES:
+        return -1
+    elif op in BINARY_BRANCHES:
+        return -2
+    elif op in {"goto", "anewarray", "newarray", "checkcast", "instanceof"}:
+        return 0
+    elif op in FIELD_OPS:
+        size = slotSize(tokens[4])
+        return {"getstatic": size, "putstatic": -size,
+                "getfield": size - 1, "putfield": -size - 1}[op]
+    elif op in METHOD_OPS:
+        params, ret = parseDescriptor(tokens[4])
+        receiver = 0 if op == "invokestatic" else 1
+        return slotSize(ret) - sum(slotSize(p) for p in params) - receiver
+    raise Exception(f"Unsupported JVM instruction: {' '.join(tokens)}")
+
+
+def frameSize(lines: List[str], desc: str, isStatic: bool) -> Tuple[int, int]:
+    # compute max stack and max locals of a method by simulating its code
+    # follows every path through the code, the stack depth must agree where paths meet
+    instrs: List[List[str]] = []
+    labels: Dict[str, int] = {}
+    for line in lines:
+        tokens = TOKEN_RE.findall(line)
+        if len(tokens) == 1 and tokens[0].endswith(":"):
+            labels[tokens[0][:-1]] = len(instrs)
+        elif len(tokens) > 0:
+            instrs.append(tokens)
+    params, _ = parseDescriptor(desc)
+    maxLocals = sum(slotSize(p) for p in params) + (0 if isStatic else 1)
+    maxStack = 0
+    depths: Dict[int, int] = {}
+    work = [(0, 0)]
+    while len(work) > 0:
+        idx, depth = work.pop()
+        if idx >= len(instrs):
+            raise Exception("Execution falls off the end of the code")
+        if idx in depths:
+            if depths[idx] != depth:
+                raise Exception(f"Inconsistent stack depth at instruction {' '.join(instrs[idx])}")
+            continue
+        depths[idx] = depth
+        tokens = instrs[idx]
+        op = tokens[0]
+        depth += stackEffect(tokens)
+        if depth < 0:
+            raise Exception(f"Stack underflow at instruction {' '.join(tokens)}")
+        maxStack = max(maxStack, depth)
+        if op in LOCAL_OPS:
+            maxLocals = max(maxLocals, int(tokens[1]) + 1)
+        if op in BRANCH_OPS:
+            if tokens[1] not in labels:
+                raise Exception(f"Unknown label: {tokens[1]}")
+            work.append((labels[tokens[1]], depth))
+        if op not in TERMINATORS:
+            work.append((idx + 1, depth))
+    return maxStack, maxLocals
+
+
+class ConstantPool:
+    # constant pool entries are deduplicated, indices start at 1
+    entries: List[bytes]
+    indices: Dict[bytes, int]
+
+    def __init__(self):
+        self.entries = []
+        self.indices = {}
+
+    def add(self, entry: bytes) -> int:
+        if entry not in self.indices:
+            self.entries.append(entry)
+            self.indices[entry] = len(self.entries)
+        return self.indices[entry]
+
+    def utf8(self, s: str) -> int:
+        data = modifiedUtf8(s)
+        return self.add(u1(CONSTANT_UTF8) + u2(len(data)) + data)
+
+    def integer(self, n: int) -> int:
+        return self.add(u1(CONSTANT_INTEGER) + n.to_bytes(4, "big", signed=True))
+
+    def string(self, s: str) -> int:
+        return self.add(u1(CONSTANT_STRING) + u2(self.utf8(s)))
+
+    def cls(self, name: str) -> int:
+        return self.add(u1(CONSTANT_CLASS) + u2(self.utf8(name)))
+
+    def nameAndType(self, name: str, desc: str) -> int:
+        return self.add(u1(CONSTANT_NAME_AND_TYPE) + u2(self.utf8(name)) + u2(self.utf8(desc)))
+
+    def ref(self, tag: int, cls: str, name: str, desc: str) -> int:
+        return self.add(u1(tag) + u2(self.cls(cls)) + u2(self.nameAndType(name, desc)))
+
+    def encode(self) -> bytes:
+        return u2(len(self.entries) + 1) + b"".join(self.entries)
+
+
+class JvmMethod:
+    def __init__(self, flags: int, name: str, desc: str):
+        self.flags = flags
+        self.name = name
+        self.desc = desc
+        self.maxStack = 0
+        self.maxLocals = 0
+        # lists of tokens for each instruction or label
+        self.code: List[List[str]] = []
+
+
+class JvmClassAssembler:
+    pool: ConstantPool
+    fields: List[Tuple[int, str, str]]
+    methods: List[JvmMethod]
+
+    def __init__(self):
+        self.pool = ConstantPool()
+        self.major = 49
+        self.minor = 0
+        self.flags = 0
+        self.name: Optional[str] = None
+        self.superclass = "java/lang/Object"
+        self.fields = []
+        self.methods = []
+
+    def assemble(self, text: str) -> Tuple[str, bytes]:
+        # returns the class name and the contents of the class file
+        method: Optional[JvmMethod] = None
+        for line in text.split("\n"):
+            tokens = TOKEN_RE.findall(line)
+            if len(tokens) == 0:
+                continue
+            head = tokens[0]
+            if head == ".version":
+                self.major, self.minor = int(tokens[1]), int(tokens[2])
+            elif head == ".class":
+                self.flags = self.accessFlags(tokens[1:-1])
+                self.name = tokens[-1]
+            elif head == ".super":
+                self.superclass = tokens[1]
+            elif head == ".field":
+                self.fields.append((self.accessFlags(tokens[1:-2]), tokens[-2], tokens[-1]))
+            elif head == ".method":
+                if tokens[-2] != ":":
+                    raise Exception(f"Malformed method declaration: {line.strip()}")
+                method = JvmMethod(self.accessFlags(tokens[1:-3]), tokens[-3], tokens[-1])
+                self.methods.append(method)
+            elif head == ".code":
+                assert method is not None
+                method.maxStack = int(tokens[tokens.index("stack") + 1])
+                method.maxLocals = int(tokens[tokens.index("locals") + 1])
+            elif head == ".end":
+                if tokens[1] == "method":
+                    method = None
+            elif method is not None:
+                method.code.append(tokens)
+            else:
+                raise Exception(f"Unexpected line outside of a method: {line.strip()}")
+        if self.name is None:
+            raise Exception("Missing .class declaration")
+        return self.name, self.encode()
+
+    def accessFlags(self, names: List[str]) -> int:
+        flags = 0
+        for n in names:
+            if n not in ACCESS_FLAGS:
+                raise Exception(f"Unknown access flag: {n}")
+            flags |= ACCESS_FLAGS[n]
+        return flags
+
+    def encode(self) -> bytes:
+        assert self.name is not None
+        thisIdx = self.pool.cls(self.name)
+        superIdx = self.pool.cls(self.superclass)
+        fields = b"".join(u2(flags) + u2(self.pool.utf8(name)) + u2(self.pool.utf8(desc)) + u2(0)
+                          for flags, name, desc in self.fields)
+        methods = b"".join(self.encodeMethod(m) for m in self.methods)
+        # the constant pool is complete only after encoding the methods
+        return (u4(CLASS_MAGIC) + u2(self.minor) + u2(self.major) + self.pool.encode() +
+                u2(self.flags) + u2(thisIdx) + u2(superIdx) + u2(0) +
+                u2(len(self.fields)) + fields + u2(len(self.methods)) + methods + u2(0))
+
+    def encodeMethod(self, method: JvmMethod) -> bytes:
+        out = u2(method.flags) + u2(self.pool.utf8(method.name)) + \
+            u2(self.pool.utf8(method.desc))
+        if len(method.code) == 0:
+            return out + u2(0)
+        code = self.encodeCode(method)
+        attr = u2(method.maxStack) + u2(method.maxLocals) + \
+            u4(len(code)) + code + u2(0) + u2(0)
+        return out + u2(1) + u2(self.pool.utf8("Code")) + u4(len(attr)) + attr
+
+    def encodeCode(self, method: JvmMethod) -> bytes:
+        # the size of each instruction does not depend on label positions,
+        # so labels are resolved after a first pass that only encodes operands
+        labels: Dict[str, int] = {}
+        instrs: List[Tuple[int, List[str], bytes]] = []
+        offset = 0
+        for tokens in method.code:
+            if len(tokens) == 1 and tokens[0].endswith(":"):
+                labels[tokens[0][:-1]] = offset
+                continue
+            encoded = self.encodeInstr(tokens)
+            instrs.append((offset, tokens, encoded))
+            offset += len(encoded)
+        code = bytearray()
+        for pos, tokens, encoded in instrs:
+            if tokens[0] in BRANCH_OPS:
+                if tokens[1] not in labels:
+                    raise Exception(f"Unknown label: {tokens[1]}")
+                delta = labels[tokens[1]] - pos
+                if not -(1 << 15) <= delta < (1 << 15):
+                    raise Exception(f"Branch offset out of range in method {method.name}")
+                encoded = u1(BRANCH_OPS[tokens[0]]) + s2(delta)
+            code += encoded
+        if len(code) >= 1 << 16:
+            raise Exception(f"Method {method.name} is too large")
+        return bytes(code)
+
+    def encodeInstr(self, tokens: List[str]) -> bytes:
+        op = tokens[0]
+        if op in SIMPLE_OPS:
+            return u1(SIMPLE_OPS[op])
+        elif op in LOCAL_OPS:
+            n = int(tokens[1])
+            if n < 256:
+                return u1(LOCAL_OPS[op]) + u1(n)
+            return u1(WIDE) + u1(LOCAL_OPS[op]) + u2(n)
+        elif op in BRANCH_OPS:
+            # placeholder with the final size
+            return bytes(3)
+        elif op in CLASS_OPS:
+            return u1(CLASS_OPS[op]) + u2(self.pool.cls(tokens[1]))
+        elif op in FIELD_OPS:
+            self.expectKind(tokens, "Field")
+            return u1(FIELD_OPS[op]) + u2(self.pool.ref(CONSTANT_FIELDREF, *tokens[2:5]))
+        elif op in METHOD_OPS:
+            self.expectKind(tokens, "Method")
+            return u1(METHOD_OPS[op]) + u2(self.pool.ref(CONSTANT_METHODREF, *tokens[2:5]))
+        elif op == "ldc":
+            value = tokens[1]
+            if value.startswith('"'):
+                idx = self.pool.string(json.loads(value))
+            else:
+                idx = self.pool.integer(int(value))
+            if idx < 256:
+                return u1(LDC) + u1(idx)
+            return u1(LDC_W) + u2(idx)
+        elif op == "bipush":
+            return u1(BIPUSH) + int(tokens[1]).to_bytes(1, "big", signed=True)
+        elif op == "sipush":
+            return u1(SIPUSH) + s2(int(tokens[1]))
+        elif op == "newarray":
+            return u1(NEWARRAY) + u1(ARRAY_TYPES[tokens[1]])
+        raise Exception(f"Unsupported JVM instruction: {' '.join(tokens)}")
+
+    def expectKind(self, tokens: List[str], kind: str):
+        if len(tokens) != 5 or tokens[1] != kind:
+            raise Exception(f"Malformed {kind.lower()} reference: {' '.join(tokens)}")
+
+
+def assembleClass(text: str) -> Tuple[str, bytes]:
+    # assemble the text of one class, returns the class name and the class file
+    return JvmClassAssembler().assemble(text)
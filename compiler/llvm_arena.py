@@ -0,0 +1,145 @@
+from typing import Dict, List
+
+import llvmlite.ir as ir
+
+int8_t = ir.IntType(8)
+int32_t = ir.IntType(32)
+int64_t = ir.IntType(64)
+voidptr_t = int8_t.as_pointer()
+
+# size of each chunk of memory requested from the OS
+ARENA_CHUNK_BYTES = 1 << 22
+
+PROT_READ_WRITE = 0x3
+MAP_PRIVATE = 0x2
+MAP_ANONYMOUS_LINUX = 0x20
+MAP_ANONYMOUS_DARWIN = 0x1000
+
+
+class LlvmArena:
+    # bump pointer allocator over large mmap'd chunks, emitted as LLVM IR
+    # memory is never freed, which makes allocation a few instructions in the common case
+    # the number of allocations and bytes allocated are printed to stderr when the program exits
+    # implements the same interface as LlvmGC
+    module: ir.Module
+    externs: Dict[str, ir.Function]
+    functions: Dict[str, ir.Function]
+    builder: ir.IRBuilder
+    oomErrorCode: int
+
+    def __init__(self, module: ir.Module, externs: Dict[str, ir.Function], oomErrorCode: int):
+        self.module = module
+        self.externs = externs
+        self.oomErrorCode = oomErrorCode
+        self.functions = {}
+
+    def classLayout(self, idx: int) -> int:
+        # the arena does not trace allocations, so layouts are unused
+        return 0
+
+    def staticHeader(self, size: int) -> ir.Constant:
+        # allocations do not have headers
+        return ir.Constant(ir.LiteralStructType([]), [])
+
+    def mapAnonymous(self) -> int:
+        triple = self.module.triple
+        if "windows" in triple or "win32" in triple:
+            raise Exception("The arena allocator requires mmap")
+        elif "apple" in triple or "darwin" in triple:
+            return MAP_ANONYMOUS_DARWIN
+        return MAP_ANONYMOUS_LINUX
+
+    def emit(self, roots: List[ir.GlobalVariable], classes: List[ir.LiteralStructType]):
+        mmap_t = ir.FunctionType(
+            voidptr_t, [voidptr_t, int64_t, int32_t, int32_t, int32_t, int64_t])
+        self.externs['mmap'] = ir.Function(self.module, mmap_t, 'mmap')
+        dprintf_t = ir.FunctionType(int32_t, [int32_t, voidptr_t], True)
+        self.externs['dprintf'] = ir.Function(self.module, dprintf_t, 'dprintf')
+
+        self.global_variable('__arena_ptr', int64_t)
+        self.global_variable('__arena_end', int64_t)
+        self.global_variable('__arena_count', int64_t)
+        self.global_variable('__arena_bytes', int64_t)
+        fmt = bytearray('Arena: %lld allocations, %lld bytes\n\00'.encode('ascii'))
+        fmt_t = ir.ArrayType(int8_t, len(fmt))
+        fmt_global = ir.GlobalVariable(self.module, fmt_t, '__fmt_arena')
+        fmt_global.linkage = 'internal'
+        fmt_global.global_constant = True
+        fmt_global.initializer = ir.Constant(fmt_t, fmt)  # type: ignore
+
+        self.emitAlloc()
+
+    def emitStackBottom(self, builder: ir.IRBuilder):
+        pass
+
+    def emitExit(self, builder: ir.IRBuilder):
+        # print allocation statistics to stderr
+        fmt = builder.bitcast(self.module.get_global('__fmt_arena'), voidptr_t)
+        count = builder.load(self.module.get_global('__arena_count'))
+        bytes = builder.load(self.module.get_global('__arena_bytes'))
+        builder.call(self.externs['dprintf'], [int32_t(2), fmt, count, bytes])
+
+    def alloc(self, builder: ir.IRBuilder, size: ir.Value, layout: int, name: str = '') -> ir.Value:
+        # allocate zeroed memory, which is never freed
+        return builder.call(self.functions['__arena_alloc'], [size, int32_t(layout)], name)
+
+    def emitAlloc(self):
+        func = ir.Function(self.module, ir.FunctionType(
+            voidptr_t, [int32_t, int32_t]), '__arena_alloc')
+        func.linkage = 'internal'
+        self.functions['__arena_alloc'] = func
+        self.builder = ir.IRBuilder(func.append_basic_block('entry'))
+        size = func.args[0]
+        # keep allocations aligned to 8 bytes
+        size64 = self.builder.zext(size, int64_t)
+        aligned = self.builder.and_(self.builder.add(
+            size64, int64_t(7)), int64_t(-8))
+        ptr_addr = self.module.get_global('__arena_ptr')
+        end_addr = self.module.get_global('__arena_end')
+        ptr = self.builder.load(ptr_addr)
+        new_ptr = self.builder.add(ptr, aligned)
+        full = self.builder.icmp_unsigned(
+            '>', new_ptr, self.builder.load(end_addr))
+        start_block = self.builder.block
+        with self.builder.if_then(full, likely=False):
+            # start a new chunk, large allocations get a chunk of their own
+            small = self.builder.icmp_unsigned(
+                '<', aligned, int64_t(ARENA_CHUNK_BYTES))
+            chunk_size = self.builder.select(
+                small, int64_t(ARENA_CHUNK_BYTES), aligned)
+            chunk = self.builder.call(self.externs['mmap'], [
+                voidptr_t(None), chunk_size, int32_t(PROT_READ_WRITE),
+                int32_t(MAP_PRIVATE | self.mapAnonymous()), int32_t(-1), int64_t(0)])
+            chunk = self.builder.ptrtoint(chunk, int64_t)
+            with self.builder.if_then(self.builder.icmp_signed('==', chunk, int64_t(-1)), likely=False):
+                self.outOfMemory()
+            self.builder.store(self.builder.add(
+                chunk, chunk_size), end_addr)
+            chunk_block = self.builder.block
+        addr = self.builder.phi(int64_t)
+        addr.add_incoming(ptr, start_block)
+        addr.add_incoming(chunk, chunk_block)
+        self.builder.store(self.builder.add(addr, aligned), ptr_addr)
+
+        count_addr = self.module.get_global('__arena_count')
+        self.builder.store(self.builder.add(
+            self.builder.load(count_addr), int64_t(1)), count_addr)
+        bytes_addr = self.module.get_global('__arena_bytes')
+        self.builder.store(self.builder.add(
+            self.builder.load(bytes_addr), size64), bytes_addr)
+        self.builder.ret(self.builder.inttoptr(addr, voidptr_t))
+
+    def outOfMemory(self):
+        # report the error through the same mechanism as other runtime errors
+        self.builder.store(int32_t(0), self.module.get_global('__error_line'))
+        self.builder.store(int32_t(self.oomErrorCode),
+                           self.module.get_global('__error_code'))
+        self.builder.call(self.externs['longjmp'], [
+            self.module.get_global('__jmp_buf'), int32_t(1)])
+        self.builder.unreachable()
+
+    def global_variable(self, name: str, t: ir.Type) -> ir.GlobalVariable:
+        data = ir.GlobalVariable(self.module, t, name)
+        data.linkage = 'internal'
+        data.initializer = t(None)  # type: ignore
+        return data
@@ -1,9 +1,12 @@
 from .astnodes import *
+from . import astnodes
 from .types import *
 from .typesystem import TypeSystem
 from .visitor import Visitor
+from .llvm_gc import LlvmGC, LAYOUT_ATOMIC, LAYOUT_POINTER_LIST
+from .llvm_arena import LlvmArena
 from collections import defaultdict
-from typing import List, Dict, Tuple, Optional, cast, Any, Callable
+from typing import List, Dict, Tuple, Optional, Union, cast, Any, Callable
 
 import llvmlite.ir as ir
 import llvmlite.binding as llvm
@@ -16,6 +19,7 @@ class ErrorCode:
     NULL_PTR = 1
     OUT_OF_BOUNDS = 2
     ASSERT = 3
+    OUT_OF_MEMORY = 4
 
 
 bool_t = ir.IntType(1)  # for booleans
@@ -26,6 +30,19 @@ jmp_buf_t = ir.ArrayType(ir.IntType(8), JMP_BUF_BYTES)
 input_buf_t = ir.ArrayType(int8_t, INPUT_CHARS + 1)
 
 
+llvm_initialized = False
+
+
+def initializeLLVM():
+    # LLVM only needs to be initialized once per process
+    global llvm_initialized
+    if not llvm_initialized:
+        llvm.initialize()
+        llvm.initialize_native_target()
+        llvm.initialize_native_asmprinter()
+        llvm_initialized = True
+
+
 class LLVMBuilder(ir.IRBuilder):
     def cast(self, value, typ, name='') -> ir.Value:
         # the bitcast operation should return something, the type is wrong
@@ -41,13 +58,16 @@ class LlvmBackend(Visitor):
     methodOffsets: Dict[Tuple[str, str], Tuple[int, ir.FunctionType]]
     # idx in struct, initial value
     attrOffsets: Dict[str, Dict[str, Tuple[int, Expr]]]
+    # class name -> layout tag for the garbage collector
+    classLayouts: Dict[str, int]
+    # string literal -> global constant
+    strings: Dict[str, ir.GlobalVariable]
     builder: Optional[LLVMBuilder] = None
+    allocator: Union[LlvmGC, LlvmArena]
     currentClass: Optional[str] = None
 
-    def __init__(self, ts: TypeSystem):
-        llvm.initialize()
-        llvm.initialize_native_target()
-        llvm.initialize_native_asmprinter()
+    def __init__(self, ts: TypeSystem, alloc: str = "gc"):
+        initializeLLVM()
         self.module = ir.Module()
         self.module.triple = llvm.get_process_triple()
         self.ts = ts
@@ -57,6 +77,16 @@ class LlvmBackend(Visitor):
         self.structs = {}
         self.methodOffsets = {}
         self.attrOffsets = {}
+        self.strings = {}
+        self.classLayouts = {}
+        if alloc == "gc":
+            self.allocator = LlvmGC(
+                self.module, self.externs, ErrorCode.OUT_OF_MEMORY)
+        elif alloc == "arena":
+            self.allocator = LlvmArena(
+                self.module, self.externs, ErrorCode.OUT_OF_MEMORY)
+        else:
+            raise Exception(f"Unsupported allocator: {alloc}")
 
     def initializeOffsets(self):
         # assign positions in the global method table
@@ -65,6 +95,7 @@ class LlvmBackend(Visitor):
         for cls in classes:
             self.attrOffsets[cls] = {}
             self.structs[cls] = self.getClassStructType(cls)
+            self.classLayouts[cls] = self.allocator.classLayout(len(self.classLayouts))
             attrs = self.ts.getOrderedAttrs(cls)
             for i, (name, _, val) in enumerate(attrs):
                 # offset by 1 because first field of struct is ptr to vtable
@@ -134,6 +165,9 @@ class LlvmBackend(Visitor):
         self.global_constant('__fmt_s',
                              ir.ArrayType(int8_t, 4),
                              self.make_bytearray('%s\n\00'.encode('ascii')))
+        self.global_constant('__fmt_str_s',
+                             ir.ArrayType(int8_t, 6),
+                             self.make_bytearray('%.*s\n\00'.encode('ascii')))
         self.global_constant('__fmt_oob',
                              ir.ArrayType(int8_t, 26),
                              self.make_bytearray('Out of bounds on line %i\n\00'.encode('ascii')))
@@ -143,23 +177,27 @@ class LlvmBackend(Visitor):
         self.global_constant('__fmt_assert',
                              ir.ArrayType(int8_t, 29),
                              self.make_bytearray('Assertion failed on line %i\n\00'.encode('ascii')))
+        self.global_constant('__fmt_oom',
+                             ir.ArrayType(int8_t, 15),
+                             self.make_bytearray('Out of memory\n\00'.encode('ascii')))
         self.global_constant('__fmt_err',
                              ir.ArrayType(int8_t, 18),
                              self.make_bytearray('Error on line %i\n\00'.encode('ascii')))
-        self.global_constant('__fmt_str_concat',
-                             ir.ArrayType(int8_t, 5),
-                             self.make_bytearray('%s%s\00'.encode('ascii')))
-        self.global_constant('__fmt_str',
-                             ir.ArrayType(int8_t, 3),
-                             self.make_bytearray('%s\00'.encode('ascii')))
         self.global_constant('__fmt_input',
                              ir.ArrayType(int8_t, 9),
                              self.make_bytearray('%100[^\n]\00'.encode('ascii')))
-        self.global_constant(
-            "__jmp_buf", jmp_buf_t, ir.Constant(jmp_buf_t, bytearray([0] * JMP_BUF_BYTES)))
-        self.global_constant(
-            "__input_buf", input_buf_t,
-            ir.Constant(input_buf_t, bytearray([0] * (INPUT_CHARS + 1))))
+        # table of single character strings, shared by all string indexing
+        chars = []
+        for i in range(256):
+            string = ir.Constant(ir.LiteralStructType([int32_t, ir.ArrayType(int8_t, 1)]), [
+                                 int32_t(1), self.make_bytearray(bytes([i]))])
+            header = self.allocator.staticHeader(5)
+            chars.append(ir.Constant(ir.LiteralStructType(
+                [header.type, string.type]), [header, string]))
+        chars_t = ir.ArrayType(chars[0].type, 256)
+        self.global_constant('__chars', chars_t, ir.Constant(chars_t, chars))
+        self.global_variable("__jmp_buf", jmp_buf_t)
+        self.global_variable("__input_buf", input_buf_t)
 
         error_code = self.global_variable("__error_code", int32_t)
         error_line = self.global_variable("__error_line", int32_t)
@@ -169,24 +207,20 @@ class LlvmBackend(Visitor):
 
         setjmp_t = ir.FunctionType(int32_t, [jmp_buf_t.as_pointer()])
         self.externs['setjmp'] = ir.Function(self.module, setjmp_t, 'setjmp')
+        # the optimizer must not cache values across the setjmp call
+        self.externs['setjmp'].attributes.add('returns_twice')
 
         longjmp_t = ir.FunctionType(
             ir.VoidType(), [jmp_buf_t.as_pointer(), int32_t])
         self.externs['longjmp'] = ir.Function(
             self.module, longjmp_t, 'longjmp')
+        self.externs['longjmp'].attributes.add('noreturn')
 
         strlen_t = ir.FunctionType(int32_t, [voidptr_t])
         self.externs['strlen'] = ir.Function(self.module, strlen_t, 'strlen')
 
-        sprintf_t = ir.FunctionType(voidptr_t, [voidptr_t, voidptr_t], True)
-        self.externs['sprintf'] = ir.Function(
-            self.module, sprintf_t, 'sprintf')
-
-        malloc_t = ir.FunctionType(voidptr_t, [int32_t])
-        self.externs['malloc'] = ir.Function(self.module, malloc_t, 'malloc')
-
-        strcmp_t = ir.FunctionType(int32_t, [voidptr_t, voidptr_t])
-        self.externs['strcmp'] = ir.Function(self.module, strcmp_t, 'strcmp')
+        memcmp_t = ir.FunctionType(int32_t, [voidptr_t, voidptr_t, int32_t])
+        self.externs['memcmp'] = ir.Function(self.module, memcmp_t, 'memcmp')
 
         memcpy_t = ir.FunctionType(voidptr_t, [voidptr_t, voidptr_t, int32_t])
         self.externs['memcpy'] = ir.Function(self.module, memcpy_t, 'memcpy')
@@ -200,6 +234,10 @@ class LlvmBackend(Visitor):
         for d in varDefs:
             t = d.var.getTypeX().getLLVMType()
             self.global_variable(d.var.name(), t)
+        # the garbage collector uses global variables holding pointers as roots
+        roots = [self.module.get_global(d.var.name()) for d in varDefs
+                 if d.var.getTypeX().getLLVMType().is_pointer]
+        self.allocator.emit(roots, [self.structs[cls] for cls in self.classLayouts])
         funcDefs = [d for d in node.declarations if isinstance(d, FuncDef)]
         for d in funcDefs:
             funcname = d.name.name
@@ -225,13 +263,14 @@ class LlvmBackend(Visitor):
         for d in funcDefs:
             self.visit(d)
 
-        # main function
-        funcType = ir.FunctionType(ir.VoidType(), [])
+        # main function, returns the exit status of the program
+        funcType = ir.FunctionType(int32_t, [])
         func = ir.Function(self.module, funcType, "main")
 
         self.enterScope()
         entry_block = func.append_basic_block('entry')
         self.builder = LLVMBuilder(entry_block)
+        self.allocator.emitStackBottom(self.getBuilder())
 
         status = self.getBuilder().call(self.externs['setjmp'], [
             self.module.get_global('__jmp_buf')])
@@ -269,11 +308,18 @@ class LlvmBackend(Visitor):
                                 self.printf(self.module.get_global(
                                     '__fmt_oob'), error_line)
                             with else____:
-                                self.printf(self.module.get_global(
-                                    '__fmt_err'), error_line)
-
-        self.getBuilder().branch(end_program)
-        error_block = self.getBuilder().block
+                                oom_cond = self.getBuilder().icmp_signed(
+                                    '==', error_code, int32_t(ErrorCode.OUT_OF_MEMORY))
+                                with self.getBuilder().if_else(oom_cond) as (oom, else_____):
+                                    with oom:
+                                        self.printf(self.module.get_global(
+                                            '__fmt_oom'))
+                                    with else_____:
+                                        self.printf(self.module.get_global(
+                                            '__fmt_err'), error_line)
+
+        self.allocator.emitExit(self.getBuilder())
+        self.getBuilder().ret(int32_t(1))
 
         self.getBuilder().position_at_start(program_block)
         # initialize globals
@@ -287,7 +333,8 @@ class LlvmBackend(Visitor):
         self.getBuilder().branch(end_program)
         self.getBuilder().position_at_start(end_program)
         assert not end_program.is_terminated
-        self.getBuilder().ret_void()
+        self.allocator.emitExit(self.getBuilder())
+        self.getBuilder().ret(int32_t(0))
 
         for block in func.blocks:
             self.getBuilder().position_at_end(block)
@@ -410,6 +457,8 @@ class LlvmBackend(Visitor):
 
     def BinaryExpr(self, node: BinaryExpr):
         operator = node.operator
+        if operator in {"and", "or"}:
+            return self.shortCircuit(node)
         leftType = node.left.inferredValueType()
         rightType = node.right.inferredValueType()
         lhs = self.visit(node.left)
@@ -431,8 +480,7 @@ class LlvmBackend(Visitor):
                 # pyrefly: ignore [missing-argument]
                 size = self.getBuilder().add(int32_t(4), self.getBuilder().mul(
                     total_len, self.sizeof(elemType)), 'bytes')
-                new_arr = self.getBuilder().call(
-                    self.externs['malloc'], [size], 'new_list')
+                new_arr = self.alloc(size, self.listLayout(elemType), 'new_list')
                 size_ptr = self.getBuilder().cast(new_arr, int32_t.as_pointer())
                 self.getBuilder().store(total_len, size_ptr)
 
@@ -453,19 +501,17 @@ class LlvmBackend(Visitor):
                     self.toVoidPtr(data_rhs_start), self.toVoidPtr(rhs_data), rhs_bytes])
                 return new_arr
             elif leftType == StrType():
-                lhs = self.toVoidPtr(lhs)
-                rhs = self.toVoidPtr(rhs)
-                llen = self.getBuilder().call(self.externs['strlen'], [lhs])
-                rlen = self.getBuilder().call(self.externs['strlen'], [rhs])
-                # pyrefly: ignore [missing-argument, missing-argument]
-                total_len = self.getBuilder().add(self.getBuilder().add(
-                    llen, rlen), int32_t(1))
-                new_str = self.getBuilder().call(
-                    self.externs['malloc'], [total_len], 'new_str')
-                fmt = self.toVoidPtr(
-                    self.module.get_global('__fmt_str_concat'))
-                self.getBuilder().call(self.externs['sprintf'], [
-                    new_str, fmt, lhs, rhs])
+                llen = self.list_len(lhs)
+                rlen = self.list_len(rhs)
+                # pyrefly: ignore [missing-argument]
+                total_len = self.getBuilder().add(llen, rlen, 'total_len')
+                new_str = self.alloc_str(total_len)
+                data_lhs_start = self.getListDataPtr(new_str, int8_t)
+                self.getBuilder().call(self.externs['memcpy'], [
+                    data_lhs_start, self.getListDataPtr(lhs, int8_t), llen])
+                data_rhs_start = self.getBuilder().gep(data_lhs_start, [llen])
+                self.getBuilder().call(self.externs['memcpy'], [
+                    data_rhs_start, self.getListDataPtr(rhs, int8_t), rlen])
                 return new_str
             elif leftType == IntType():
                 # pyrefly: ignore [missing-argument]
@@ -498,9 +544,7 @@ class LlvmBackend(Visitor):
             if leftType == IntType():
                 return self.getBuilder().icmp_signed(operator, lhs, rhs)
             elif leftType == StrType():
-                cmp = self.getBuilder().call(
-                    self.externs['strcmp'], [lhs, rhs])
-                return self.getBuilder().icmp_signed("==", cmp, int32_t(0))
+                return self.str_eq(lhs, rhs)
             else:
                 # bool
                 return self.getBuilder().icmp_signed(operator, lhs, rhs)
@@ -508,9 +552,7 @@ class LlvmBackend(Visitor):
             if leftType == IntType():
                 return self.getBuilder().icmp_signed(operator, lhs, rhs)
             elif leftType == StrType():
-                cmp = self.getBuilder().call(
-                    self.externs['strcmp'], [lhs, rhs])
-                return self.getBuilder().icmp_signed("!=", cmp, int32_t(0))
+                return self.getBuilder().not_(self.str_eq(lhs, rhs))
             else:
                 # bool
                 return self.getBuilder().icmp_signed(operator, lhs, rhs)
@@ -521,17 +563,26 @@ class LlvmBackend(Visitor):
             # pyrefly: ignore [missing-argument]
             rhs_ptr = self.getBuilder().ptrtoint(rhs, int32_t)
             return self.getBuilder().icmp_unsigned("==", lhs_ptr, rhs_ptr)
-        # logical operators
-        elif operator == "and":
-            # pyrefly: ignore [missing-argument]
-            return self.getBuilder().and_(lhs, rhs)
-        elif operator == "or":
-            # pyrefly: ignore [missing-argument]
-            return self.getBuilder().or_(lhs, rhs)
         else:
             raise Exception(
                 f"Internal compiler error: unexpected operator {operator}")
 
+    def shortCircuit(self, node: astnodes.BinaryExpr) -> ir.Value:
+        # the right operand is only evaluated if the left one does not decide the result
+        lhs = self.visit(node.left)
+        lhs_block = self.getBuilder().block
+        if node.operator == "and":
+            cond = lhs
+        else:
+            cond = self.getBuilder().not_(lhs)
+        with self.getBuilder().if_then(cond):
+            rhs = self.visit(node.right)
+            rhs_block = self.getBuilder().block
+        phi = self.getBuilder().phi(bool_t, node.operator)
+        phi.add_incoming(bool_t(int(node.operator == "or")), lhs_block)
+        phi.add_incoming(rhs, rhs_block)
+        return phi
+
     def IndexExpr(self, node: IndexExpr):
         if node.list.inferredType == StrType():
             string = self.visit(node.list)
@@ -562,27 +613,15 @@ class LlvmBackend(Visitor):
         return self.getBuilder().gep(data, [index])
 
     def strIndex(self, string: ir.Value, index: ir.Value, check_bounds: bool = False, line: int = 0) -> ir.Value:
-        string = self.toVoidPtr(string)
-        # bounds checks
-        if check_bounds:
-            assert line != 0
-            min_idx = self.getBuilder().icmp_signed('>', int32_t(0), index)
-            with self.getBuilder().if_then(min_idx):
-                self.longJmp(ErrorCode.OUT_OF_BOUNDS, line)
-            length = self.getBuilder().call(self.externs['strlen'], [string])
-            max_idx = self.getBuilder().icmp_signed('<=', length, index)
-            with self.getBuilder().if_then(max_idx):
-                self.longJmp(ErrorCode.OUT_OF_BOUNDS, line)
-        ptr = self.getBuilder().gep(string, [index])
-        char = self.getBuilder().load(ptr)
-        addr = self.getBuilder().call(self.externs['malloc'], [
-            int32_t(2)], 'char')
-        addr = self.toVoidPtr(addr)
-        char_ptr = self.getBuilder().gep(addr, [int32_t(0)])
-        self.getBuilder().store(char, char_ptr, 8)
-        t_ptr = self.getBuilder().gep(addr, [int32_t(1)])
-        self.getBuilder().store(int8_t(0), t_ptr, 8)
-        return addr
+        # strings have the same layout as lists of chars, so indexing is the same
+        char = self.getBuilder().load(self.listIndex(
+            string, index, int8_t, check_bounds, line))
+        # return the single character string from the table instead of allocating
+        # pyrefly: ignore [missing-argument]
+        char = self.getBuilder().zext(char, int32_t)
+        chars = self.module.get_global('__chars')
+        ptr = self.getBuilder().gep(chars, [int32_t(0), char, int32_t(1)])
+        return self.toVoidPtr(ptr)
 
     def UnaryExpr(self, node: UnaryExpr):
         if node.operator == "-":
@@ -595,8 +634,7 @@ class LlvmBackend(Visitor):
     def constructor(self, node: CallExpr) -> ir.Value:
         cls = node.function.name
         size = self.sizeof(self.structs[cls])
-        obj = self.getBuilder().call(
-            self.externs['malloc'], [size], 'new_object')
+        obj = self.alloc(size, self.classLayouts[cls], 'new_object')
         # initialize fields
         for attr in self.attrOffsets[cls]:
             _, val = self.attrOffsets[cls][attr]
@@ -668,10 +706,12 @@ class LlvmBackend(Visitor):
         iterable = self.visit(node.iterable)
 
         if node.iterable.inferredType == StrType():
+            # strings are immutable, so the length only needs to be loaded once
+            length = self.list_len(iterable)
             self.whileHelper(
                 lambda: self.getBuilder().icmp_signed("<",
                                                       self.getBuilder().load(idx_var),
-                                                      self.getBuilder().call(self.externs['strlen'], [iterable])),
+                                                      length),
                 lambda: self.forBody(node,
                                      var,
                                      lambda currIdx: self.strIndex(
@@ -705,8 +745,7 @@ class LlvmBackend(Visitor):
         # pyrefly: ignore [missing-argument, missing-argument]
         size = self.getBuilder().add(int32_t(4), self.getBuilder().mul(
             int32_t(n), self.sizeof(elemType)))
-        addr = self.getBuilder().call(self.externs['malloc'], [
-            size], 'list_literal')
+        addr = self.alloc(size, self.listLayout(elemType), 'list_literal')
         addr = self.getBuilder().cast(addr, int32_t.as_pointer())
         for i in range(n):
             value = self.visit(node.elements[i])
@@ -830,26 +869,25 @@ class LlvmBackend(Visitor):
         return voidptr_t(None)
 
     def StringLiteral(self, node: StringLiteral):
-        # pyrefly: ignore [unsupported-operation]
-        bytes = bytearray((node.value + '\00').encode('ascii'))
-        # pyrefly: ignore [bad-argument-type]
-        size = int32_t(1 + len(node.value))
-        addr = self.getBuilder().call(
-            self.externs['malloc'], [size], 'str_literal')
-        for i in range(len(bytes)):
-            idx_ptr = self.getBuilder().gep(addr, [int32_t(i)])
-            self.getBuilder().store(int8_t(bytes[i]), idx_ptr)
-        return addr
+        # strings are immutable, so each distinct literal is a single global constant
+        value = node.value
+        assert value is not None
+        if value not in self.strings:
+            data = self.make_bytearray(value.encode('ascii'))
+            string = ir.Constant(ir.LiteralStructType([int32_t, data.type]), [
+                                 int32_t(len(value)), data])
+            # literals have a header like heap allocations, but are never collected
+            header = self.allocator.staticHeader(4 + len(value))
+            t = ir.LiteralStructType([header.type, string.type])
+            self.strings[value] = self.global_constant(
+                '__str_' + str(len(self.strings)), t, ir.Constant(t, [header, string]))
+        return self.strings[value].gep([int32_t(0), int32_t(1)]).bitcast(voidptr_t)
 
     # BUILT-INS
 
     def emit_len(self, arg: Expr) -> ir.Value:
         val = self.visit(arg)
-        if arg.inferredType == StrType():
-            val = self.toVoidPtr(val)
-            return self.getBuilder().call(self.externs['strlen'], [val])
-        else:
-            return self.list_len(val)
+        return self.list_len(val)
 
     def assert_nonnull(self, val: ir.Value, line: int):
         val = self.toVoidPtr(val)
@@ -900,7 +938,9 @@ class LlvmBackend(Visitor):
         elif cast(ClassValueType, arg.inferredType).className == 'int':
             self.printf(self.module.get_global('__fmt_i'), self.visit(arg))
         else:
-            self.printf(self.module.get_global('__fmt_s'), self.visit(arg))
+            val = self.visit(arg)
+            self.printf(self.module.get_global('__fmt_str_s'),
+                        self.list_len(val), self.getListDataPtr(val, int8_t))
         return self.NoneLiteral(None)
 
     def emit_input(self) -> ir.Value:
@@ -911,14 +951,42 @@ class LlvmBackend(Visitor):
 
         # copy contents into new string so that input buffer can be reused
         len = self.getBuilder().call(self.externs['strlen'], [input_buf])
-        new_str = self.getBuilder().call(
-            # pyrefly: ignore [missing-argument]
-            self.externs['malloc'], [self.getBuilder().add(len, int32_t(1))], 'new_str')
-        fmt = self.toVoidPtr(self.module.get_global('__fmt_str'))
-        self.getBuilder().call(self.externs['sprintf'], [
-            new_str, fmt, input_buf])
+        new_str = self.alloc_str(len)
+        self.getBuilder().call(self.externs['memcpy'], [
+            self.getListDataPtr(new_str, int8_t), input_buf, len])
         return new_str
 
+    def alloc_str(self, length: ir.Value) -> ir.Value:
+        # allocate a string with a 4 byte length header followed by the chars
+        # pyrefly: ignore [missing-argument]
+        size = self.getBuilder().add(int32_t(4), length)
+        addr = self.alloc(size, LAYOUT_ATOMIC, 'new_str')
+        self.getBuilder().store(length, self.getBuilder().cast(
+            addr, int32_t.as_pointer()))
+        return addr
+
+    def alloc(self, size: ir.Value, layout: int, name: str = '') -> ir.Value:
+        # allocate zeroed, garbage collected memory
+        return self.allocator.alloc(self.getBuilder(), size, layout, name)
+
+    def listLayout(self, elemType: ir.Type) -> int:
+        return LAYOUT_POINTER_LIST if elemType.is_pointer else LAYOUT_ATOMIC
+
+    def str_eq(self, lhs: ir.Value, rhs: ir.Value) -> ir.Value:
+        # only compare the contents if the lengths match
+        llen = self.list_len(lhs)
+        same_len = self.getBuilder().icmp_signed('==', llen, self.list_len(rhs))
+        len_block = self.getBuilder().block
+        with self.getBuilder().if_then(same_len):
+            cmp = self.getBuilder().call(self.externs['memcmp'], [
+                self.getListDataPtr(lhs, int8_t), self.getListDataPtr(rhs, int8_t), llen])
+            same_chars = self.getBuilder().icmp_signed('==', cmp, int32_t(0))
+            cmp_block = self.getBuilder().block
+        phi = self.getBuilder().phi(bool_t, 'str_eq')
+        phi.add_incoming(bool_t(0), len_block)
+        phi.add_incoming(same_chars, cmp_block)
+        return phi
+
     # UTILS
 
     def make_bytearray(self, buf: bytes) -> ir.Constant:
@@ -926,9 +994,9 @@ class LlvmBackend(Visitor):
         n = len(b)
         return ir.Constant(ir.ArrayType(int8_t, n), b)
 
-    def printf(self, format: ir.Value, arg: ir.Value) -> ir.Value:
+    def printf(self, format: ir.Value, *args: ir.Value) -> ir.Value:
         fmt_ptr = self.toVoidPtr(format)
-        return self.getBuilder().call(self.externs['printf'], [fmt_ptr, arg])
+        return self.getBuilder().call(self.externs['printf'], [fmt_ptr, *args])
 
     def global_constant(self, name: str, t: ir.Type, value: ir.Constant) -> ir.GlobalVariable:
         module = self.module
@@ -0,0 +1,453 @@
+from typing import Callable, Dict, List
+
+import llvmlite.ir as ir
+
+int8_t = ir.IntType(8)
+int32_t = ir.IntType(32)
+int64_t = ir.IntType(64)
+voidptr_t = int8_t.as_pointer()
+
+# every heap allocation is preceded by a header:
+# pointer to the next allocation, size of the payload in bytes, and tag
+# the lowest bit of the tag is the mark bit, the rest is the layout
+header_t = ir.LiteralStructType([voidptr_t, int32_t, int32_t])
+HEADER_BYTES = 16
+
+# layouts describing where the pointers in an allocation are
+LAYOUT_ATOMIC = 0  # no pointers, ex: strings or lists of ints/bools
+LAYOUT_POINTER_LIST = 1  # list of pointers after the 4 byte length
+LAYOUT_CLASS_START = 2  # objects, offset by the class's index
+
+# bytes allocated before the first collection
+GC_INITIAL_THRESHOLD = 1 << 20
+
+
+class LlvmGC:
+    # mark-sweep garbage collector, emitted as LLVM IR
+    # pointers stored in globals and in the heap always point to the start of a payload,
+    # so they are traced precisely using per-class tables of pointer offsets
+    # the stack is scanned conservatively: any word pointing into an allocation keeps it alive
+    module: ir.Module
+    externs: Dict[str, ir.Function]
+    functions: Dict[str, ir.Function]
+    builder: ir.IRBuilder
+    oomErrorCode: int
+
+    def __init__(self, module: ir.Module, externs: Dict[str, ir.Function], oomErrorCode: int):
+        self.module = module
+        self.externs = externs
+        self.oomErrorCode = oomErrorCode
+        self.functions = {}
+
+    def classLayout(self, idx: int) -> int:
+        return LAYOUT_CLASS_START + idx
+
+    def staticHeader(self, size: int) -> ir.Constant:
+        # header for constant data that is never collected, such as string literals
+        # it is permanently marked so the collector never writes to it
+        return ir.Constant(header_t, [voidptr_t(None), int32_t(size), int32_t((LAYOUT_ATOMIC << 1) | 1)])
+
+    def emit(self, roots: List[ir.GlobalVariable], classes: List[ir.LiteralStructType]):
+        # roots are global variables holding pointers
+        # classes are the struct types of objects, in the order of their layout
+        self.declareExterns()
+        self.global_variable('__gc_objects', voidptr_t)
+        self.global_variable('__gc_count', int64_t)
+        self.global_variable('__gc_allocated', int64_t)
+        threshold = self.global_variable('__gc_threshold', int64_t)
+        threshold.initializer = int64_t(GC_INITIAL_THRESHOLD)
+        self.global_variable('__gc_stack_bottom', voidptr_t)
+        self.global_variable('__gc_mark_stack', voidptr_t.as_pointer())
+        self.global_variable('__gc_mark_top', int64_t)
+
+        roots_t = ir.ArrayType(voidptr_t.as_pointer(), len(roots))
+        self.global_constant('__gc_roots', roots_t, ir.Constant(
+            roots_t, [r.bitcast(voidptr_t.as_pointer()) for r in roots]))
+
+        # each class has a table of the count of pointer attributes followed by their offsets
+        tables = []
+        for i, struct in enumerate(classes):
+            null = struct.as_pointer()(None)
+            offsets = [null.gep([int32_t(0), int32_t(j)]).ptrtoint(int32_t)
+                       for j in range(1, len(struct.elements))
+                       if struct.elements[j].is_pointer]
+            table_t = ir.ArrayType(int32_t, len(offsets) + 1)
+            table = self.global_constant(
+                '__gc_layout_' + str(i), table_t, ir.Constant(table_t, [int32_t(len(offsets))] + offsets))
+            tables.append(table.bitcast(int32_t.as_pointer()))
+        layouts_t = ir.ArrayType(int32_t.as_pointer(), len(tables))
+        self.global_constant('__gc_layouts', layouts_t,
+                             ir.Constant(layouts_t, tables))
+
+        self.emitCompareWords()
+        self.emitMark()
+        self.emitCollect(len(roots))
+        self.emitAlloc()
+
+    def declareExterns(self):
+        calloc_t = ir.FunctionType(voidptr_t, [int64_t, int64_t])
+        self.externs['calloc'] = ir.Function(self.module, calloc_t, 'calloc')
+        free_t = ir.FunctionType(ir.VoidType(), [voidptr_t])
+        self.externs['free'] = ir.Function(self.module, free_t, 'free')
+        cmp_t = ir.FunctionType(int32_t, [voidptr_t, voidptr_t]).as_pointer()
+        qsort_t = ir.FunctionType(ir.VoidType(), [
+                                  voidptr_t, int64_t, int64_t, cmp_t])
+        self.externs['qsort'] = ir.Function(self.module, qsort_t, 'qsort')
+        frameaddress_t = ir.FunctionType(voidptr_t, [int32_t])
+        self.externs['frameaddress'] = ir.Function(
+            self.module, frameaddress_t, 'llvm.frameaddress.p0i8')
+
+    def emitStackBottom(self, builder: ir.IRBuilder):
+        # called at the start of main, the stack is scanned up to main's frame
+        frame = builder.call(self.externs['frameaddress'], [int32_t(0)])
+        builder.store(frame, self.module.get_global('__gc_stack_bottom'))
+
+    def emitExit(self, builder: ir.IRBuilder):
+        pass
+
+    def alloc(self, builder: ir.IRBuilder, size: ir.Value, layout: int, name: str = '') -> ir.Value:
+        # allocate zeroed memory that is freed once it is unreachable
+        return builder.call(self.functions['__gc_alloc'], [size, int32_t(layout)], name)
+
+    # RUNTIME FUNCTIONS
+
+    def function(self, name: str, t: ir.FunctionType) -> ir.Function:
+        func = ir.Function(self.module, t, name)
+        func.linkage = 'internal'
+        self.functions[name] = func
+        self.builder = ir.IRBuilder(func.append_basic_block('entry'))
+        return func
+
+    def emitCompareWords(self):
+        # qsort comparator for an array of addresses
+        func = self.function('__gc_compare_words', ir.FunctionType(
+            int32_t, [voidptr_t, voidptr_t]))
+        lhs = self.load(func.args[0], int64_t)
+        rhs = self.load(func.args[1], int64_t)
+        gt = self.builder.zext(self.builder.icmp_unsigned('>', lhs, rhs), int32_t)
+        lt = self.builder.zext(self.builder.icmp_unsigned('<', lhs, rhs), int32_t)
+        self.builder.ret(self.builder.sub(gt, lt))
+
+    def emitMark(self):
+        # mark the allocation starting at an address, and push it on the mark stack
+        func = self.function('__gc_mark', ir.FunctionType(
+            ir.VoidType(), [voidptr_t]))
+        ptr = func.args[0]
+        with self.builder.if_then(self.builder.icmp_unsigned('==', ptr, voidptr_t(None))):
+            self.builder.ret_void()
+        header = self.builder.gep(ptr, [int32_t(-HEADER_BYTES)])
+        tag_ptr = self.headerField(header, 2)
+        tag = self.builder.load(tag_ptr)
+        marked = self.builder.trunc(tag, ir.IntType(1))
+        with self.builder.if_then(marked):
+            self.builder.ret_void()
+        self.builder.store(self.builder.or_(tag, int32_t(1)), tag_ptr)
+        # atomic allocations do not need to be traced
+        atomic = self.builder.icmp_unsigned(
+            '==', self.builder.lshr(tag, int32_t(1)), int32_t(LAYOUT_ATOMIC))
+        with self.builder.if_then(atomic):
+            self.builder.ret_void()
+        top_ptr = self.module.get_global('__gc_mark_top')
+        top = self.builder.load(top_ptr)
+        stack = self.builder.load(self.module.get_global('__gc_mark_stack'))
+        self.builder.store(header, self.builder.gep(stack, [top]))
+        self.builder.store(self.builder.add(top, int64_t(1)), top_ptr)
+        self.builder.ret_void()
+
+    def emitCollect(self, n_roots: int):
+        func = self.function('__gc_collect', ir.FunctionType(ir.VoidType(), []))
+        mark = self.functions['__gc_mark']
+        objects = self.module.get_global('__gc_objects')
+        jmp_buf_t = self.externs['setjmp'].args[0].type.pointee
+        # spill callee-saved registers onto the stack so that they are scanned
+        regs = self.builder.alloca(jmp_buf_t, None, 'regs')
+        self.builder.call(self.externs['setjmp'], [regs])
+
+        count = self.builder.load(self.module.get_global('__gc_count'))
+        with self.builder.if_then(self.builder.icmp_unsigned('==', count, int64_t(0))):
+            self.builder.ret_void()
+        stack_top = self.builder.and_(
+            self.builder.ptrtoint(regs, int64_t), int64_t(-8))
+        stack_bottom = self.builder.ptrtoint(self.builder.load(
+            self.module.get_global('__gc_stack_bottom')), int64_t)
+        n_words = self.builder.lshr(
+            self.builder.sub(stack_bottom, stack_top), int64_t(3))
+        # each allocation is pushed on the mark stack at most once
+        stack = self.builder.bitcast(self.builder.call(
+            self.externs['calloc'], [count, int64_t(8)]), voidptr_t.as_pointer())
+        words = self.builder.bitcast(self.builder.call(
+            self.externs['calloc'], [self.builder.add(n_words, int64_t(1)), int64_t(8)]), int64_t.as_pointer())
+        stack_null = self.builder.icmp_unsigned('==', stack, stack.type(None))
+        words_null = self.builder.icmp_unsigned('==', words, words.type(None))
+        with self.builder.if_then(self.builder.or_(stack_null, words_null), likely=False):
+            # not enough memory to collect, try again after the next allocation
+            self.free(stack)
+            self.free(words)
+            self.builder.ret_void()
+        self.builder.store(stack, self.module.get_global('__gc_mark_stack'))
+        self.builder.store(int64_t(0), self.module.get_global('__gc_mark_top'))
+
+        # find the range of addresses in the heap
+        header = self.builder.alloca(voidptr_t, None, 'header')
+        heap_start = self.builder.alloca(int64_t, None, 'heap_start')
+        heap_end = self.builder.alloca(int64_t, None, 'heap_end')
+        self.builder.store(int64_t(-1), heap_start)
+        self.builder.store(int64_t(0), heap_end)
+        self.builder.store(self.builder.load(objects), header)
+
+        def findRange():
+            h = self.builder.load(header)
+            start = self.headerAddr(h)
+            end = self.headerEnd(h)
+            self.builder.store(self.umin(self.builder.load(heap_start), start), heap_start)
+            self.builder.store(self.umax(self.builder.load(heap_end), end), heap_end)
+            self.builder.store(self.load(h, voidptr_t), header)
+        self.loop(lambda: self.builder.icmp_unsigned('!=', self.builder.load(header), voidptr_t(None)),
+                  findRange)
+
+        # collect the words on the stack that may point into the heap, and sort them
+        addr = self.builder.alloca(int64_t, None, 'addr')
+        n_candidates = self.builder.alloca(int64_t, None, 'n_candidates')
+        self.builder.store(stack_top, addr)
+        self.builder.store(int64_t(0), n_candidates)
+
+        def scanStack():
+            curr = self.builder.load(addr)
+            word = self.builder.load(
+                self.builder.inttoptr(curr, int64_t.as_pointer()))
+            in_heap = self.builder.and_(
+                self.builder.icmp_unsigned(
+                    '>=', word, self.builder.load(heap_start)),
+                self.builder.icmp_unsigned('<=', word, self.builder.load(heap_end)))
+            with self.builder.if_then(in_heap):
+                n = self.builder.load(n_candidates)
+                self.builder.store(word, self.builder.gep(words, [n]))
+                self.builder.store(self.builder.add(
+                    n, int64_t(1)), n_candidates)
+            self.builder.store(self.builder.add(curr, int64_t(8)), addr)
+        self.loop(lambda: self.builder.icmp_unsigned('<', self.builder.load(addr), stack_bottom),
+                  scanStack)
+        n = self.builder.load(n_candidates)
+        self.builder.call(self.externs['qsort'], [
+            self.builder.bitcast(words, voidptr_t), n, int64_t(8),
+            self.functions['__gc_compare_words']])
+
+        # mark allocations containing any of the words, found with a binary search
+        lo = self.builder.alloca(int64_t, None, 'lo')
+        hi = self.builder.alloca(int64_t, None, 'hi')
+        self.builder.store(self.builder.load(objects), header)
+
+        def markFromStack():
+            h = self.builder.load(header)
+            start = self.headerAddr(h)
+            self.builder.store(int64_t(0), lo)
+            self.builder.store(n, hi)
+
+            def search():
+                mid = self.builder.lshr(self.builder.add(
+                    self.builder.load(lo), self.builder.load(hi)), int64_t(1))
+                below = self.builder.icmp_unsigned('<', self.builder.load(
+                    self.builder.gep(words, [mid])), start)
+                with self.builder.if_else(below) as (then, else_):
+                    with then:
+                        self.builder.store(self.builder.add(
+                            mid, int64_t(1)), lo)
+                    with else_:
+                        self.builder.store(mid, hi)
+            self.loop(lambda: self.builder.icmp_unsigned('<', self.builder.load(lo), self.builder.load(hi)),
+                      search)
+            # the first word at or after the start of the allocation
+            idx = self.builder.load(lo)
+            with self.builder.if_then(self.builder.icmp_unsigned('<', idx, n)):
+                word = self.builder.load(self.builder.gep(words, [idx]))
+                with self.builder.if_then(self.builder.icmp_unsigned('<=', word, self.headerEnd(h))):
+                    self.builder.call(
+                        mark, [self.builder.gep(h, [int32_t(HEADER_BYTES)])])
+            self.builder.store(self.load(h, voidptr_t), header)
+        self.loop(lambda: self.builder.icmp_unsigned('!=', self.builder.load(header), voidptr_t(None)),
+                  markFromStack)
+
+        # mark from global variables
+        roots = self.module.get_global('__gc_roots')
+        for r in range(n_roots):
+            root = self.builder.load(self.builder.gep(
+                roots, [int32_t(0), int32_t(r)]))
+            self.builder.call(mark, [self.builder.load(root)])
+
+        # trace reachable allocations
+        top_ptr = self.module.get_global('__gc_mark_top')
+        offset = self.builder.alloca(int32_t, None, 'offset')
+
+        def trace():
+            top = self.builder.sub(self.builder.load(top_ptr), int64_t(1))
+            self.builder.store(top, top_ptr)
+            h = self.builder.load(self.builder.gep(stack, [top]))
+            payload = self.builder.gep(h, [int32_t(HEADER_BYTES)])
+            size = self.headerSize(h)
+            layout = self.builder.lshr(self.builder.load(
+                self.headerField(h, 2)), int32_t(1))
+            is_list = self.builder.icmp_unsigned(
+                '==', layout, int32_t(LAYOUT_POINTER_LIST))
+            with self.builder.if_else(is_list) as (then, else_):
+                with then:
+                    # the whole allocation is scanned rather than just the length,
+                    # since lists are collected while their elements are still being initialized
+                    self.builder.store(int32_t(4), offset)
+                    self.loop(lambda: self.builder.icmp_unsigned(
+                        '<=', self.builder.add(self.builder.load(offset), int32_t(8)), size),
+                        lambda: self.markAt(payload, offset, offset, int32_t(8)))
+                with else_:
+                    table = self.builder.load(self.builder.gep(self.module.get_global('__gc_layouts'), [
+                        int32_t(0), self.builder.sub(layout, int32_t(LAYOUT_CLASS_START))]))
+                    n_offsets = self.builder.load(table)
+                    self.builder.store(int32_t(1), offset)
+                    self.loop(lambda: self.builder.icmp_unsigned(
+                        '<=', self.builder.load(offset), n_offsets),
+                        lambda: self.markAt(payload, self.builder.gep(table, [self.builder.load(offset)]), offset, int32_t(1)))
+        self.loop(lambda: self.builder.icmp_unsigned('!=', self.builder.load(top_ptr), int64_t(0)),
+                  trace)
+
+        # free unmarked allocations and clear the marks
+        link = self.builder.alloca(voidptr_t.as_pointer(), None, 'link')
+        live = self.builder.alloca(int64_t, None, 'live')
+        live_count = self.builder.alloca(int64_t, None, 'live_count')
+        self.builder.store(self.builder.bitcast(
+            objects, voidptr_t.as_pointer()), link)
+        self.builder.store(int64_t(0), live)
+        self.builder.store(int64_t(0), live_count)
+
+        def sweep():
+            curr_link = self.builder.load(link)
+            h = self.builder.load(curr_link)
+            tag_ptr = self.headerField(h, 2)
+            tag = self.builder.load(tag_ptr)
+            with self.builder.if_else(self.builder.trunc(tag, ir.IntType(1))) as (then, else_):
+                with then:
+                    self.builder.store(self.builder.and_(tag, int32_t(-2)), tag_ptr)
+                    self.builder.store(self.builder.add(self.builder.load(live), self.builder.zext(
+                        self.headerSize(h), int64_t)), live)
+                    self.builder.store(self.builder.add(
+                        self.builder.load(live_count), int64_t(1)), live_count)
+                    self.builder.store(self.builder.bitcast(
+                        h, voidptr_t.as_pointer()), link)
+                with else_:
+                    self.builder.store(self.load(h, voidptr_t), curr_link)
+                    self.builder.call(self.externs['free'], [h])
+        self.loop(lambda: self.builder.icmp_unsigned('!=', self.builder.load(self.builder.load(link)), voidptr_t(None)),
+                  sweep)
+
+        self.free(stack)
+        self.free(words)
+        self.builder.store(self.builder.load(live_count),
+                           self.module.get_global('__gc_count'))
+        live_bytes = self.builder.load(live)
+        self.builder.store(live_bytes, self.module.get_global('__gc_allocated'))
+        # collect again once the heap has doubled
+        self.builder.store(self.umax(self.builder.mul(live_bytes, int64_t(2)), int64_t(GC_INITIAL_THRESHOLD)),
+                           self.module.get_global('__gc_threshold'))
+        self.builder.ret_void()
+
+    def emitAlloc(self):
+        func = self.function('__gc_alloc', ir.FunctionType(
+            voidptr_t, [int32_t, int32_t]))
+        size, layout = func.args
+        size64 = self.builder.zext(size, int64_t)
+        allocated_ptr = self.module.get_global('__gc_allocated')
+        total = self.builder.add(self.builder.load(allocated_ptr), size64)
+        over = self.builder.icmp_unsigned(
+            '>', total, self.builder.load(self.module.get_global('__gc_threshold')))
+        with self.builder.if_then(over):
+            self.builder.call(self.functions['__gc_collect'], [])
+        bytes = self.builder.add(size64, int64_t(HEADER_BYTES))
+        header = self.builder.call(
+            self.externs['calloc'], [int64_t(1), bytes], 'header')
+        with self.builder.if_then(self.builder.icmp_unsigned('==', header, voidptr_t(None)), likely=False):
+            self.outOfMemory()
+
+        objects = self.module.get_global('__gc_objects')
+        self.builder.store(self.builder.load(objects),
+                           self.builder.bitcast(header, voidptr_t.as_pointer()))
+        self.builder.store(size, self.headerField(header, 1))
+        self.builder.store(self.builder.shl(
+            layout, int32_t(1)), self.headerField(header, 2))
+        self.builder.store(header, objects)
+
+        count_ptr = self.module.get_global('__gc_count')
+        self.builder.store(self.builder.add(
+            self.builder.load(count_ptr), int64_t(1)), count_ptr)
+        self.builder.store(self.builder.add(
+            self.builder.load(allocated_ptr), size64), allocated_ptr)
+        self.builder.ret(self.builder.gep(header, [int32_t(HEADER_BYTES)]))
+
+    def outOfMemory(self):
+        # report the error through the same mechanism as other runtime errors
+        self.builder.store(int32_t(0), self.module.get_global('__error_line'))
+        self.builder.store(int32_t(self.oomErrorCode),
+                           self.module.get_global('__error_code'))
+        self.builder.call(self.externs['longjmp'], [
+            self.module.get_global('__jmp_buf'), int32_t(1)])
+        self.builder.unreachable()
+
+    # UTILS
+
+    def markAt(self, payload: ir.Value, offset_ptr: ir.Value, counter: ir.Value, step: ir.Value):
+        # mark the pointer at payload + *offset_ptr, then advance the counter
+        field = self.builder.gep(payload, [self.builder.load(offset_ptr)])
+        self.builder.call(self.functions['__gc_mark'], [
+                          self.load(field, voidptr_t)])
+        self.builder.store(self.builder.add(
+            self.builder.load(counter), step), counter)
+
+    def loop(self, condFn: Callable, bodyFn: Callable):
+        cond_block = self.builder.append_basic_block('loop')
+        body_block = self.builder.append_basic_block('body')
+        end_block = self.builder.append_basic_block('end')
+        self.builder.branch(cond_block)
+        self.builder.position_at_start(cond_block)
+        self.builder.cbranch(condFn(), body_block, end_block)
+        self.builder.position_at_start(body_block)
+        bodyFn()
+        self.builder.branch(cond_block)
+        self.builder.position_at_start(end_block)
+
+    def load(self, ptr: ir.Value, t: ir.Type) -> ir.Value:
+        # load a value of type t from an i8* address, which may be unaligned
+        return self.builder.load(self.builder.bitcast(ptr, t.as_pointer()), align=1)
+
+    def free(self, ptr: ir.Value):
+        self.builder.call(self.externs['free'], [
+                          self.builder.bitcast(ptr, voidptr_t)])
+
+    def umin(self, a: ir.Value, b: ir.Value) -> ir.Value:
+        return self.builder.select(self.builder.icmp_unsigned('<', a, b), a, b)
+
+    def umax(self, a: ir.Value, b: ir.Value) -> ir.Value:
+        return self.builder.select(self.builder.icmp_unsigned('>', a, b), a, b)
+
+    def headerField(self, header: ir.Value, idx: int) -> ir.Value:
+        header = self.builder.bitcast(header, header_t.as_pointer())
+        return self.builder.gep(header, [int32_t(0), int32_t(idx)])
+
+    def headerSize(self, header: ir.Value) -> ir.Value:
+        return self.builder.load(self.headerField(header, 1))
+
+    def headerAddr(self, header: ir.Value) -> ir.Value:
+        return self.builder.ptrtoint(header, int64_t)
+
+    def headerEnd(self, header: ir.Value) -> ir.Value:
+        # address one past the end of the allocation
+        return self.builder.add(self.builder.add(self.headerAddr(header), int64_t(HEADER_BYTES)),
+                                self.builder.zext(self.headerSize(header), int64_t))
+
+    def global_constant(self, name: str, t: ir.Type, value: ir.Constant) -> ir.GlobalVariable:
+        data = ir.GlobalVariable(self.module, t, name)
+        data.linkage = 'internal'
+        data.global_constant = True
+        data.initializer = value  # type: ignore
+        return data
+
+    def global_variable(self, name: str, t: ir.Type) -> ir.GlobalVariable:
+        data = ir.GlobalVariable(self.module, t, name)
+        data.linkage = 'internal'
+        data.initializer = t(None)  # type: ignore
+        return data
@@ -0,0 +1,37 @@
+import os
+import subprocess
+from typing import List, Optional, Union
+
+import llvmlite.ir as ir
+import llvmlite.binding as llvm
+
+from .llvm_optimizer import optimize
+
+
+def getTargetMachine(optLevel: int = 0) -> llvm.TargetMachine:
+    # position independent code, so that the object can be linked as a PIE
+    target = llvm.Target.from_default_triple()
+    return target.create_target_machine(opt=optLevel, reloc="pic",
+                                        codemodel="default")
+
+
+def emitObject(module: Union[ir.Module, llvm.ModuleRef], optLevel: int = 0,
+               passes: Optional[List[str]] = None) -> bytes:
+    # optimize the module and compile it to a native object file
+    llvmmod = optimize(module, optLevel, passes)
+    target_machine = getTargetMachine(optLevel)
+    llvmmod.triple = target_machine.triple
+    llvmmod.data_layout = str(target_machine.target_data)
+    return target_machine.emit_object(llvmmod)
+
+
+def linkExecutable(objfile: str, outfile: str, cc: Optional[str] = None):
+    # link an object file into an executable using the system C compiler
+    # the C compiler can be overridden with the CC environment variable
+    if cc is None:
+        cc = os.environ.get("CC", "cc")
+    result = subprocess.run([cc, objfile, "-o", outfile],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if result.returncode != 0:
+        raise Exception("Error: linking {} failed:\n{}".format(
+            objfile, result.stdout.decode()))
@@ -0,0 +1,81 @@
+from typing import Dict, List, Optional, Union
+
+import llvmlite.ir as ir
+import llvmlite.binding as llvm
+
+# named passes that can be used to build a pipeline
+# each entry maps a pass name to a function that adds it to a pass manager
+PASSES = {
+    # sroa subsumes mem2reg, promoting allocas to SSA registers
+    "mem2reg": lambda pm: pm.add_sroa_pass(),
+    "instcombine": lambda pm: pm.add_instruction_combining_pass(),
+    "simplifycfg": lambda pm: pm.add_cfg_simplification_pass(),
+    "reassociate": lambda pm: pm.add_reassociate_expressions_pass(),
+    "gvn": lambda pm: pm.add_gvn_pass(),
+    "sccp": lambda pm: pm.add_sccp_pass(),
+    "dce": lambda pm: pm.add_dead_code_elimination_pass(),
+    "dse": lambda pm: pm.add_dead_store_elimination_pass(),
+    "licm": lambda pm: pm.add_licm_pass(),
+    "loop-simplify": lambda pm: pm.add_loop_simplification_pass(),
+    "loop-rotate": lambda pm: pm.add_loop_rotate_pass(),
+    "loop-unroll": lambda pm: pm.add_loop_unroll_pass(),
+    "loop-deletion": lambda pm: pm.add_loop_deletion_pass(),
+    "inline": lambda pm: pm.add_function_inlining_pass(225),
+    "inline-aggressive": lambda pm: pm.add_function_inlining_pass(275),
+    "tailcallelim": lambda pm: pm.add_tail_call_elimination_pass(),
+    "ipsccp": lambda pm: pm.add_ipsccp_pass(),
+    "globalopt": lambda pm: pm.add_global_optimizer_pass(),
+    "globaldce": lambda pm: pm.add_global_dce_pass(),
+}
+
+# pass pipelines for -O0 to -O3
+PIPELINES: Dict[int, List[str]] = {
+    0: [],
+    1: ["mem2reg", "instcombine", "simplifycfg", "dce"],
+    2: ["globalopt", "ipsccp", "mem2reg", "instcombine", "simplifycfg",
+        "inline", "mem2reg", "instcombine", "reassociate", "gvn",
+        "loop-simplify", "loop-rotate", "licm", "instcombine",
+        "simplifycfg", "dse", "dce", "globaldce"],
+    3: ["globalopt", "ipsccp", "mem2reg", "instcombine", "simplifycfg",
+        "inline-aggressive", "mem2reg", "instcombine", "reassociate", "gvn",
+        "sccp", "loop-simplify", "loop-rotate", "licm", "loop-deletion",
+        "loop-unroll", "instcombine", "gvn", "simplifycfg", "tailcallelim",
+        "dse", "dce", "globaldce"],
+}
+
+
+def getPipeline(optLevel: int, passes: Optional[List[str]] = None) -> List[str]:
+    # an explicit list of passes overrides the default pipeline for the level
+    if passes is not None:
+        pipeline = passes
+    elif optLevel in PIPELINES:
+        pipeline = PIPELINES[optLevel]
+    else:
+        raise Exception(f"Unsupported optimization level: {optLevel}")
+    for p in pipeline:
+        if p not in PASSES:
+            raise Exception(f"Unknown LLVM pass: {p}")
+    return pipeline
+
+
+def optimize(module: Union[ir.Module, llvm.ModuleRef], optLevel: int = 0,
+             passes: Optional[List[str]] = None) -> llvm.ModuleRef:
+    # parse the module and run the pass pipeline over it
+    # returns the optimized module, which can be printed or passed to a JIT
+    pipeline = getPipeline(optLevel, passes)
+    if isinstance(module, ir.Module):
+        llvmmod = llvm.parse_assembly(str(module))
+    else:
+        llvmmod = module
+    llvmmod.verify()
+    if len(pipeline) == 0:
+        return llvmmod
+    target_machine = llvm.Target.from_default_triple().create_target_machine()
+    llvmmod.data_layout = str(target_machine.target_data)
+    pm = llvm.create_module_pass_manager()
+    target_machine.add_analysis_passes(pm)
+    for p in pipeline:
+        PASSES[p](pm)
+    pm.run(llvmmod)
+    llvmmod.verify()
+    return llvmmod
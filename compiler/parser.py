@@ -26,12 +26,12 @@ class Parser(ast.NodeVisitor):
             current = BinaryExpr(values[0].location, current, op, v)
         return current
 
-    def getLocation(self, node: ast.AST) -> typing.List[int]:
+    def getLocation(self, node: ast.AST) -> Location:
         # input is Python AST node
-        # get 2 item list corresponding to AST node starting location
+        # get (line, col) tuple corresponding to AST node starting location
         # make columns 1-indexed
         # pyrefly: ignore [missing-attribute, missing-attribute]
-        return [node.lineno, node.col_offset + 1]
+        return (node.lineno, node.col_offset + 1)
 
     def visit(self, node: ast.AST) -> typing.Any:
         try:
@@ -59,7 +59,7 @@ class Parser(ast.NodeVisitor):
     # and https://docs.python.org/3/library/ast.html
 
     def visit_Module(self, node: ast.Module) -> Program:
-        location = [1, 1]
+        location = (1, 1)
         if hasattr(node, "type_ignores") and node.type_ignores:
             raise ParseError("Cannot ignore type", node)
         body = [self.visit(b) for b in node.body]
@@ -88,14 +88,14 @@ class Parser(ast.NodeVisitor):
                     "Expected declaration or statement", node.body[i])
         if declarations:
             location = declarations[0].location
-        return Program(location, declarations, statements, Errors([0, 0], []))
+        return Program(location, declarations, statements, Errors((0, 0), []))
 
     def visit_FunctionDef(self, node: ast.FunctionDef) -> FuncDef:
         if node.decorator_list:
             raise ParseError("Unsupported decorator list",
                              node.decorator_list[0])
         location = self.getLocation(node)
-        identifier = Identifier([location[0], location[1] + 4], node.name)
+        identifier = Identifier((location[0], location[1] + 4), node.name)
         arguments = self.visit(node.args)
         body = [self.visit(b) for b in node.body]
         declarations = []
@@ -128,14 +128,14 @@ class Parser(ast.NodeVisitor):
 
     def visit_ClassDef(self, node: ast.ClassDef) -> ClassDef:
         location = self.getLocation(node)
-        identifier = Identifier([location[0], location[1] + 6], node.name)
+        identifier = Identifier((location[0], location[1] + 6), node.name)
         if len(node.bases) > 1:
             raise ParseError(
                 "Multiple inheritance is unsupported", node.bases[1])
         base = None
         if len(node.bases) == 0:
-            base = Identifier([location[0], location[1] +
-                               7 + len(node.name)], "object")
+            base = Identifier((location[0], location[1] +
+                               7 + len(node.name)), "object")
         else:
             base = self.visit(node.bases[0])
         if node.keywords:
@@ -224,7 +224,7 @@ class Parser(ast.NodeVisitor):
             raise ParseError(
                 "Only one identifier is allowed per global declaration", node)
         # the ID starts 7 characters to the right
-        idLoc = [location[0], location[1] + 7]
+        idLoc = (location[0], location[1] + 7)
         identifier = Identifier(idLoc, node.names[0])
         return GlobalDecl(location, identifier)
 
@@ -234,7 +234,7 @@ class Parser(ast.NodeVisitor):
             raise ParseError(
                 "Only one identifier is allowed per nonlocal declaration", node)
         # the ID starts 7 characters to the right
-        idLoc = [location[0], location[1] + 7]
+        idLoc = (location[0], location[1] + 7)
         identifier = Identifier(idLoc, node.names[0])
         return NonLocalDecl(location, identifier)
 
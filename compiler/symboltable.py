@@ -0,0 +1,77 @@
+from .types import SymbolType
+from typing import Dict, List, Optional, Tuple
+
+
+class SymbolTable:
+    # nested scopes, stored as a stack of bindings per name
+    # scope 0 is the global scope and the innermost scope is the current one
+    # (scope depth, type) bindings for each name, innermost last
+    bindings: Dict[str, List[Tuple[int, Optional[SymbolType]]]]
+    # names bound in each open scope, to unbind them when the scope is exited
+    scopes: List[List[str]]
+
+    def __init__(self):
+        self.bindings = {}
+        self.scopes = [[]]
+
+    def depth(self) -> int:
+        return len(self.scopes) - 1
+
+    def enterScope(self):
+        self.scopes.append([])
+
+    def exitScope(self):
+        for name in self.scopes.pop():
+            stack = self.bindings[name]
+            stack.pop()
+            if len(stack) == 0:
+                del self.bindings[name]
+
+    def add(self, name: str, t: Optional[SymbolType]):
+        # bind the name in the current scope, replacing an existing binding in that scope
+        depth = self.depth()
+        stack = self.bindings.get(name)
+        if stack is None:
+            self.bindings[name] = [(depth, t)]
+        elif stack[-1][0] == depth:
+            stack[-1] = (depth, t)
+            return
+        else:
+            stack.append((depth, t))
+        self.scopes[-1].append(name)
+
+    def lookup(self, name: str) -> Optional[SymbolType]:
+        # innermost binding of the name, or None if not found
+        stack = self.bindings.get(name)
+        if stack is None:
+            return None
+        return stack[-1][1]
+
+    def lookupLocal(self, name: str) -> Optional[SymbolType]:
+        # innermost binding outside the global scope
+        stack = self.bindings.get(name)
+        if stack is None or stack[-1][0] == 0:
+            return None
+        return stack[-1][1]
+
+    def lookupNonLocal(self, name: str) -> Optional[SymbolType]:
+        # innermost binding outside the global and current scopes
+        stack = self.bindings.get(name)
+        if stack is None:
+            return None
+        i = len(stack) - 1
+        if stack[i][0] == self.depth():
+            i -= 1
+        if i < 0 or stack[i][0] == 0:
+            return None
+        return stack[i][1]
+
+    def lookupGlobal(self, name: str) -> Optional[SymbolType]:
+        stack = self.bindings.get(name)
+        if stack is None or stack[0][0] != 0:
+            return None
+        return stack[0][1]
+
+    def definedInCurrentScope(self, name: str) -> bool:
+        stack = self.bindings.get(name)
+        return stack is not None and stack[-1][0] == self.depth() and stack[-1][1] is not None
@@ -1,13 +1,15 @@
 from .astnodes import *
 from .types import *
-from collections import defaultdict
-from .typesystem import TypeSystem, ClassInfo
+from .symboltable import SymbolTable
+from .typesystem import TypeSystem
 from .visitor import Visitor
 from typing import List, Optional, Any, assert_type
 
+static_types = {intType, boolType, strType}
+
 
 class TypeChecker(Visitor):
-    symbolTable: List[defaultdict]
+    symbolTable: SymbolTable
     currentClass: Optional[str]
     errors: List[CompilerError]
     expReturnType: Optional[ValueType]
@@ -20,15 +22,14 @@ class TypeChecker(Visitor):
         # C : currentClass
         # R : expReturnType
 
-        # stack of hashtables representing scope
-        # each table holds identifier->type mappings defined in that scppe
-        self.symbolTable = [defaultdict(lambda: None)]
+        # nested scopes of identifier->type mappings
+        self.symbolTable = SymbolTable()
 
         # standard library functions
-        self.symbolTable[0]["print"] = FuncType([ObjectType()], NoneType())
-        self.symbolTable[0]["input"] = FuncType([], StrType())
-        self.symbolTable[0]["len"] = FuncType([ObjectType()], IntType())
-        self.symbolTable[0]["__assert__"] = FuncType([BoolType()], NoneType())
+        self.symbolTable.add("print", FuncType([ObjectType()], NoneType()))
+        self.symbolTable.add("input", FuncType([], StrType()))
+        self.symbolTable.add("len", FuncType([ObjectType()], IntType()))
+        self.symbolTable.add("__assert__", FuncType([BoolType()], NoneType()))
 
         self.ts = ts
 
@@ -49,45 +50,36 @@ class TypeChecker(Visitor):
         pass
 
     def enterScope(self):
-        self.symbolTable.append(defaultdict(lambda: None))
+        self.symbolTable.enterScope()
 
     def exitScope(self):
-        self.symbolTable.pop()
+        self.symbolTable.exitScope()
 
     # SYMBOL TABLE LOOKUPS
 
     def getType(self, var: str):
         # get the type of an identifier in the current scope, or None if not found
-        for table in self.symbolTable[::-1]:
-            if var in table:
-                return table[var]
-        return None
+        return self.symbolTable.lookup(var)
 
     def getLocalType(self, var: str):
         # get the type of an identifier in the current scope, or None if not found
         # ignore global variables
-        for table in self.symbolTable[1:][::-1]:
-            if var in table:
-                return table[var]
-        return None
+        return self.symbolTable.lookupLocal(var)
 
     def getNonLocalType(self, var: str):
         # get the type of an identifier outside the current scope, or None if not found
         # ignore global variables
-        for table in self.symbolTable[1:-1][::-1]:
-            if var in table:
-                return table[var]
-        return None
+        return self.symbolTable.lookupNonLocal(var)
 
     def getGlobal(self, var: str):
-        return self.symbolTable[0][var]
+        return self.symbolTable.lookupGlobal(var)
 
     def addType(self, var: str, t: SymbolType):
-        self.symbolTable[-1][var] = t
+        self.symbolTable.add(var, t)
 
     def defInCurrentScope(self, var: str) -> bool:
         # return if the name was defined in the current scope
-        return self.symbolTable[-1][var] is not None
+        return self.symbolTable.definedInCurrentScope(var)
 
     # ERROR HANDLING
 
@@ -130,7 +122,7 @@ class TypeChecker(Visitor):
                     self.addError(d.superclass,
                                   F"Illegal superclass: {superclass}")
                     superclass = "object"
-                self.ts.classes[className] = ClassInfo(className, superclass)
+                self.ts.addClass(className, superclass)
             if isinstance(d, FuncDef):
                 self.funcParams(d)
                 self.addType(d.getIdentifier().name, self.getSignature(d))
@@ -175,16 +167,15 @@ class TypeChecker(Visitor):
                         self.addError(d.getIdentifier(),
                                       F"Redefined method doesn't match superclass signature: {funcName}")
                         continue
-                self.ts.classes[className].methods[funcName] = funcType
+                self.ts.addMethod(className, funcName, funcType)
             if isinstance(d, VarDef):  # attributes
                 attrName = d.getIdentifier().name
                 if self.ts.getAttrOrMethod(className, attrName):
                     self.addError(d.getIdentifier(),
                                   F"Cannot redefine attribute: {attrName}")
                     continue
-                self.ts.classes[className].attrs[attrName] = (self.visit(
-                    d.var), d.value)
-                self.ts.classes[className].orderedAttrs.append(attrName)
+                self.ts.addAttr(className, attrName,
+                                self.visit(d.var), d.value)
         for d in node.declarations:
             self.visit(d)
         self.currentClass = None
@@ -321,8 +312,6 @@ class TypeChecker(Visitor):
 
     def BinaryExpr(self, node: BinaryExpr):
         operator = node.operator
-        static_types = {IntType(),
-                        BoolType(), StrType()}
         leftType = node.left.inferredType
         rightType = node.right.inferredType
 
@@ -332,7 +321,7 @@ class TypeChecker(Visitor):
                 node.inferredType = ListValueType(
                     self.ts.join(leftType.elementType, rightType.elementType))
                 return node.inferredType
-            elif leftType == rightType and leftType in {StrType(), IntType()}:
+            elif leftType is rightType and (leftType is strType or leftType is intType):
                 node.inferredType = leftType
                 return leftType
             else:
@@ -354,8 +343,7 @@ class TypeChecker(Visitor):
             else:
                 self.binopError(node)
         elif operator in {"==", "!="}:
-            if leftType == rightType and \
-                    leftType in static_types:
+            if leftType is rightType and leftType in static_types:
                 node.inferredType = BoolType()
                 return BoolType()
             else:
@@ -523,9 +511,7 @@ class TypeChecker(Visitor):
         return node.inferredType
 
     def MemberExpr(self, node: MemberExpr):
-        static_types = {IntType(),
-                        BoolType(), StrType()}
-        if node.object.inferredType in static_types or not isinstance(node.object.inferredType, ClassValueType):
+        if not isinstance(node.object.inferredType, ClassValueType) or node.object.inferredType.isSpecialType():
             self.addError(
                 node, f"Expected object, got {node.object.inferredType}")
         else:
@@ -550,9 +536,7 @@ class TypeChecker(Visitor):
     def MethodCallExpr(self, node: MethodCallExpr):
         method_member = node.method
         t = None  # method signature
-        static_types = {IntType(),
-                        BoolType(), StrType()}
-        if method_member.object.inferredType in static_types or not isinstance(method_member.object.inferredType, ClassValueType):
+        if not isinstance(method_member.object.inferredType, ClassValueType) or method_member.object.inferredType.isSpecialType():
             self.addError(
                 method_member, f"Expected object, got {method_member.object.inferredType}")
             node.inferredType = ObjectType()
@@ -1,27 +1,37 @@
 from .classvaluetype import ClassValueType
 
+# the special types, which are interned like all class types
+# these references keep them in the weak interning table
+
+objectType = ClassValueType("object")
+intType = ClassValueType("int")
+strType = ClassValueType("str")
+boolType = ClassValueType("bool")
+noneType = ClassValueType("<None>")
+emptyType = ClassValueType("<Empty>")
+
 # factories for types
 
 
 def ObjectType():
-    return ClassValueType("object")
+    return objectType
 
 
 def IntType():
-    return ClassValueType("int")
+    return intType
 
 
 def StrType():
-    return ClassValueType("str")
+    return strType
 
 
 def BoolType():
-    return ClassValueType("bool")
+    return boolType
 
 
 def NoneType():
-    return ClassValueType("<None>")
+    return noneType
 
 
 def EmptyType():
-    return ClassValueType("<Empty>")
+    return emptyType
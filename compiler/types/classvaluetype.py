@@ -1,5 +1,6 @@
 from .valuetype import ValueType
 from llvmlite import ir
+import weakref
 
 
 class SpecialClass:
@@ -12,32 +13,48 @@ class SpecialClass:
 
 
 class ClassValueType(ValueType):
-    def __init__(self, className: str):
-        self.className = className
-
-    def __eq__(self, other):
-        if isinstance(other, ClassValueType):
-            return self.className == other.className
-        return False
+    # instances are interned, so there is one object per class name and
+    # equality is identity
+    # the table is weak so user classes do not outlive the programs that use
+    # them, the special types are kept alive by Types
+    className: str
+    hash: int
+    interned: "weakref.WeakValueDictionary[str, ClassValueType]" = weakref.WeakValueDictionary()
+
+    def __new__(cls, className: str):
+        t = cls.interned.get(className)
+        if t is None:
+            t = super().__new__(cls)
+            object.__setattr__(t, "className", className)
+            object.__setattr__(t, "hash", hash(className))
+            cls.interned[className] = t
+        return t
+
+    def __setattr__(self, name, value):
+        raise Exception("Types are immutable")
+
+    def __reduce__(self):
+        return (ClassValueType, (self.className,))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def isListType(self) -> bool:
         return self.className in {SpecialClass.EMPTY, SpecialClass.NONE}
 
-    def getJavaSignature(self, isList=False) -> str:
+    def getJavaSignature(self) -> str:
+        # lists of ints and bools are primitive arrays, so elements are unboxed
         if self.className == SpecialClass.BOOL:
-            if isList:
-                return "Ljava/lang/Boolean;"
-            else:
-                return "Z"
+            return "Z"
         elif self.className == SpecialClass.STR:
             return "Ljava/lang/String;"
         elif self.className == SpecialClass.OBJECT:
             return "Ljava/lang/Object;"
         elif self.className == SpecialClass.INT:
-            if isList:
-                return "Ljava/lang/Integer;"
-            else:
-                return "I"
+            return "I"
         elif self.className == SpecialClass.NONE:
             return "Ljava/lang/Object;"
         elif self.className == SpecialClass.EMPTY:
@@ -54,12 +71,9 @@ class ClassValueType(ValueType):
     def isJavaRef(self) -> bool:
         return self.className not in [SpecialClass.INT, SpecialClass.BOOL]
 
-    def getJavaName(self, isList=False) -> str:
+    def getJavaName(self) -> str:
         if self.className == SpecialClass.BOOL:
-            if isList:
-                return "java/lang/Boolean"
-            else:
-                return "boolean"
+            return "boolean"
         elif self.className == SpecialClass.STR:
             return "java/lang/String"
         elif self.className == SpecialClass.OBJECT:
@@ -69,10 +83,7 @@ class ClassValueType(ValueType):
         elif self.className == SpecialClass.EMPTY:
             return "[Ljava/lang/Object;"
         elif self.className == SpecialClass.INT:
-            if isList:
-                return "java/lang/Integer"
-            else:
-                return self.className
+            return self.className
         else:
             return self.className
 
@@ -99,28 +110,15 @@ class ClassValueType(ValueType):
             return "class " + self.className
 
     def getWasmName(self) -> str:
-        # bools are i32, ints are i64
-        # all others are pointers/refs, which are i32
-        if self.className == SpecialClass.BOOL:
-            return "i32"
-        elif self.className == SpecialClass.STR:
-            return "i32"
-        elif self.className == SpecialClass.OBJECT:
-            return "i32"
-        elif self.className == SpecialClass.NONE:
-            return "i32"
-        elif self.className == SpecialClass.EMPTY:
-            return "i32"
-        elif self.className == SpecialClass.INT:
-            return "i64"
-        else:
-            return "i32"
+        # ints and bools are i32
+        # all others are pointers/refs, which are also i32
+        return "i32"
 
     def __str__(self):
         return self.className
 
     def __hash__(self):
-        return str(self).__hash__()
+        return self.hash
 
     def toJSON(self, dump_location=True) -> dict:
         return {
@@ -47,14 +47,14 @@ class FuncType(SymbolType):
         if self.returnType.isNone():
             r = "V"
         else:
-            r = self.returnType.getJavaSignature(False)
+            r = self.returnType.getJavaSignature()
         params = []
         for i in range(len(self.parameters)):
             p = self.parameters[i]
-            if i in self.refParams and isinstance(p, ClassValueType):
-                sig = '[' + p.getJavaSignature(True)
+            if i in self.refParams:
+                sig = '[' + p.getJavaSignature()
             else:
-                sig = p.getJavaSignature(False)
+                sig = p.getJavaSignature()
             params.append(sig)
         return "({}){}".format("".join(params), r)
 
@@ -1,23 +1,42 @@
 from .valuetype import ValueType
 from llvmlite import ir
+import weakref
 
 
 class ListValueType(ValueType):
+    # instances are interned by element type, which is interned as well,
+    # so equality is identity
+    # the table is weak like the one for class types
     elementType: ValueType
+    hash: int
+    interned: "weakref.WeakValueDictionary[ValueType, ListValueType]" = weakref.WeakValueDictionary()
 
-    def __init__(self, elementType: ValueType):
-        self.elementType = elementType
+    def __new__(cls, elementType: ValueType):
+        t = cls.interned.get(elementType)
+        if t is None:
+            t = super().__new__(cls)
+            object.__setattr__(t, "elementType", elementType)
+            object.__setattr__(t, "hash", hash(("list", elementType)))
+            cls.interned[elementType] = t
+        return t
 
-    def __eq__(self, other):
-        if isinstance(other, ListValueType):
-            return self.elementType == other.elementType
-        return False
+    def __setattr__(self, name, value):
+        raise Exception("Types are immutable")
 
-    def getJavaSignature(self, isList=False) -> str:
-        return "[" + self.elementType.getJavaSignature(True)
+    def __reduce__(self):
+        return (ListValueType, (self.elementType,))
 
-    def getJavaName(self, isList=False) -> str:
-        return "[" + self.elementType.getJavaSignature(True)
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def getJavaSignature(self) -> str:
+        return "[" + self.elementType.getJavaSignature()
+
+    def getJavaName(self) -> str:
+        return "[" + self.elementType.getJavaSignature()
 
     def getCILName(self) -> str:
         return self.elementType.getCILName() + "[]"
@@ -35,7 +54,7 @@ class ListValueType(ValueType):
         return "[{}]".format(str(self.elementType))
 
     def __hash__(self):
-        return str(self).__hash__()
+        return self.hash
 
     def toJSON(self, dump_location=True) -> dict:
         return {
@@ -18,10 +18,10 @@ class ValueType(SymbolType):
     def getCILSignature(self) -> str:
         raise Exception("unsupported")
 
-    def getJavaName(self, isList: bool = False) -> str:
+    def getJavaName(self) -> str:
         raise Exception("unsupported")
 
-    def getJavaSignature(self, isList: bool = False) -> str:
+    def getJavaSignature(self) -> str:
         raise Exception("unsupported")
 
     def isJavaRef(self) -> bool:
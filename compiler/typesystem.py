@@ -18,12 +18,125 @@ class ClassInfo:
         return F"class {self.name}({self.superclass}): {self.attrs} {self.methods}"
 
 
+class ClassLayout:
+    # methods and attributes of a class including inherited ones, in vtable and object order
+    # layouts are shared by every caller, so they must not be modified
+    orderedMethods: List[Tuple[str, FuncType, str]]
+    orderedAttrs: List[Tuple[str, ValueType, Any]]
+    # name -> index in orderedMethods or orderedAttrs
+    methodSlots: Dict[str, int]
+    attrSlots: Dict[str, int]
+
+    def __init__(self, classInfo: ClassInfo, superLayout: Optional["ClassLayout"] = None):
+        if superLayout is None:
+            self.orderedMethods = []
+            self.orderedAttrs = []
+            self.methodSlots = {}
+            self.attrSlots = {}
+        else:
+            self.orderedMethods = list(superLayout.orderedMethods)
+            self.orderedAttrs = list(superLayout.orderedAttrs)
+            self.methodSlots = dict(superLayout.methodSlots)
+            self.attrSlots = dict(superLayout.attrSlots)
+        for name, t in classInfo.methods.items():
+            # overridden methods keep the slot of the superclass method
+            if name in self.methodSlots:
+                self.orderedMethods[self.methodSlots[name]] = (name, t, classInfo.name)
+            else:
+                self.methodSlots[name] = len(self.orderedMethods)
+                self.orderedMethods.append((name, t, classInfo.name))
+        for name in classInfo.orderedAttrs:
+            attrType, attrInit = classInfo.attrs[name]
+            self.attrSlots[name] = len(self.orderedAttrs)
+            self.orderedAttrs.append((name, attrType, attrInit))
+
+
+class ClassHierarchy:
+    # numbering of a depth first walk of the class tree, for constant time subclass tests,
+    # and tables of ancestors at power of 2 distances, for logarithmic time common ancestors
+    pre: Dict[str, int]
+    post: Dict[str, int]
+    depth: Dict[str, int]
+    # class name -> [parent, grandparent, 4th ancestor, 8th ancestor, ...]
+    ancestors: Dict[str, List[str]]
+
+    def __init__(self, classes: Dict[str, ClassInfo]):
+        self.pre = {}
+        self.post = {}
+        self.depth = {}
+        self.ancestors = {}
+        children: Dict[str, List[str]] = {name: [] for name in classes}
+        roots = []
+        for name, info in classes.items():
+            if info.superclass is None:
+                roots.append(name)
+            else:
+                children[info.superclass].append(name)
+        counter = 0
+        # (class, whether its subclasses have been visited)
+        stack = [(r, False) for r in reversed(roots)]
+        while len(stack) > 0:
+            name, done = stack.pop()
+            if done:
+                self.post[name] = counter
+                counter += 1
+                continue
+            self.pre[name] = counter
+            counter += 1
+            superclass = classes[name].superclass
+            if superclass is None:
+                self.depth[name] = 0
+                self.ancestors[name] = []
+            else:
+                # ancestors of the superclass are already known, since it was visited first
+                self.depth[name] = self.depth[superclass] + 1
+                table = [superclass]
+                while len(self.ancestors[table[-1]]) >= len(table):
+                    table.append(self.ancestors[table[-1]][len(table) - 1])
+                self.ancestors[name] = table
+            stack.append((name, True))
+            for c in reversed(children[name]):
+                stack.append((c, False))
+
+    def isSubClass(self, a: str, b: str) -> bool:
+        # a is b or a descendant of b if b's walk started before and ended after a's
+        return self.pre[b] <= self.pre[a] and self.post[a] <= self.post[b]
+
+    def ancestor(self, name: str, distance: int) -> str:
+        k = 0
+        while distance > 0:
+            if distance & 1:
+                name = self.ancestors[name][k]
+            distance >>= 1
+            k += 1
+        return name
+
+    def commonAncestor(self, a: str, b: str) -> str:
+        # lowest common ancestor, requires a and b to be in the same tree
+        if self.depth[a] < self.depth[b]:
+            a, b = b, a
+        a = self.ancestor(a, self.depth[a] - self.depth[b])
+        if a == b:
+            return a
+        for k in reversed(range(len(self.ancestors[a]))):
+            if k < len(self.ancestors[a]) and self.ancestors[a][k] != self.ancestors[b][k]:
+                a = self.ancestors[a][k]
+                b = self.ancestors[b][k]
+        return self.ancestors[a][0]
+
+
 class TypeSystem:
     classes: Dict[str, ClassInfo]
+    # class name -> layout, computed when first needed
+    layouts: Dict[str, ClassLayout]
+    # computed when first needed, and again after a class is added
+    hierarchy: Optional[ClassHierarchy]
 
     def __init__(self):
         # information for each class
         self.classes = {}
+        self.layouts = {}
+        self.hierarchy = None
 
         objectInfo = ClassInfo("object")
         objectInfo.methods["__init__"] = FuncType([ObjectType()], NoneType())
@@ -44,13 +157,61 @@ class TypeSystem:
         self.classes["<None>"] = ClassInfo("<None>", "object")
         self.classes["<Empty>"] = ClassInfo("<Empty>", "object")
 
+    def addClass(self, className: str, superclass: str):
+        self.invalidateLayouts(className)
+        self.classes[className] = ClassInfo(className, superclass)
+        self.hierarchy = None
+
+    def getHierarchy(self) -> ClassHierarchy:
+        if self.hierarchy is None:
+            self.hierarchy = ClassHierarchy(self.classes)
+        return self.hierarchy
+
+    def addMethod(self, className: str, methodName: str, methodType: FuncType):
+        self.invalidateLayouts(className)
+        self.classes[className].methods[methodName] = methodType
+
+    def addAttr(self, className: str, attrName: str, attrType: ValueType, attrInit: Any):
+        self.invalidateLayouts(className)
+        classInfo = self.classes[className]
+        classInfo.attrs[attrName] = (attrType, attrInit)
+        classInfo.orderedAttrs.append(attrName)
+
+    def invalidateLayouts(self, className: str):
+        # a layout is only cached if the layouts of all superclasses are,
+        # so a class without a layout has no subclasses with layouts
+        if className not in self.layouts:
+            return
+        stale = [c for c in self.layouts if self.isSubClass(c, className)]
+        for c in stale:
+            del self.layouts[c]
+
+    def getLayout(self, className: str) -> ClassLayout:
+        # requires className to be the name of a valid class
+        # layouts are built from the root down, so each class is only laid out once
+        missing = []
+        curr: Optional[str] = className
+        while curr is not None and curr not in self.layouts:
+            missing.append(curr)
+            curr = self.classes[curr].superclass
+        for name in reversed(missing):
+            superclass = self.classes[name].superclass
+            superLayout = None if superclass is None else self.layouts[superclass]
+            self.layouts[name] = ClassLayout(self.classes[name], superLayout)
+        return self.layouts[className]
+
     def getMethodHelper(self, className: str, methodName: str) -> Tuple[Optional[FuncType], str]:
         # requires className to be the name of a valid class
+        # members of the class itself are checked first, since they change while it is declared
         classInfo = self.classes[className]
         if methodName not in classInfo.methods:
             if classInfo.superclass is None:
                 return (None, "")
-            return self.getMethodHelper(classInfo.superclass, methodName)
+            layout = self.getLayout(classInfo.superclass)
+            if methodName not in layout.methodSlots:
+                return (None, "")
+            _, t, defClass = layout.orderedMethods[layout.methodSlots[methodName]]
+            return (t, defClass)
         return (classInfo.methods[methodName], className)
 
     def getMethod(self, className: str, methodName: str) -> Optional[FuncType]:
@@ -68,7 +229,11 @@ class TypeSystem:
         if attrName not in classInfo.attrs:
             if classInfo.superclass is None:
                 return (None, None)
-            return self.getAttrHelper(classInfo.superclass, attrName)
+            layout = self.getLayout(classInfo.superclass)
+            if attrName not in layout.attrSlots:
+                return (None, None)
+            _, t, init = layout.orderedAttrs[layout.attrSlots[attrName]]
+            return (t, init)
         return classInfo.attrs[attrName]
 
     def getAttr(self, className: str, attrName: str) -> Optional[ValueType]:
@@ -89,10 +254,15 @@ class TypeSystem:
             return classInfo.methods[name]
         elif name in classInfo.attrs:
             return classInfo.attrs[name][0]
-        else:
-            if classInfo.superclass is None:
-                return None
-            return self.getAttrOrMethod(classInfo.superclass, name)
+        elif classInfo.superclass is None:
+            return None
+        # names are unique across a class hierarchy, so a method and an attribute cannot both match
+        layout = self.getLayout(classInfo.superclass)
+        if name in layout.methodSlots:
+            return layout.orderedMethods[layout.methodSlots[name]][1]
+        elif name in layout.attrSlots:
+            return layout.orderedAttrs[layout.attrSlots[name]][1]
+        return None
 
     def classExists(self, className: str) -> bool:
         # we cannot check for None because it is a defaultdict
@@ -101,32 +271,25 @@ class TypeSystem:
     def isSubClass(self, a: str, b: str) -> bool:
         # requires a and b to be the names of valid classes
         # return if a is the same class or subclass of b
-        curr = a
-        # pyrefly: ignore [bad-assignment]
-        while curr is not None:
-            if curr == b:
-                return True
-            else:
-                curr = self.classes[curr].superclass
-        return False
+        return a == b or self.getHierarchy().isSubClass(a, b)
 
     def isSubtype(self, a: Optional[Union[ValueType, FuncType]], b: ValueType) -> bool:
         # return if a is a subtype of b
-        if b == ObjectType():
+        if a is b or b is objectType:
             return True
         if isinstance(a, ClassValueType) and isinstance(b, ClassValueType):
             return self.isSubClass(a.className, b.className)
-        return a == b
+        return False
 
     def canAssign(self, a: Optional[Union[ValueType, FuncType]], b: ValueType) -> bool:
         # return if value of type a can be assigned/passed to type b (ex: b = a)
         if self.isSubtype(a, b):
             return True
-        if a == NoneType() and b not in [IntType(), StrType(), BoolType()]:
+        if a is noneType and not b.isSpecialType():
             return True
-        if isinstance(b, ListValueType) and a == EmptyType():
+        if isinstance(b, ListValueType) and a is emptyType:
             return True
-        if (isinstance(b, ListValueType) and isinstance(a, ListValueType) and a.elementType == NoneType()):
+        if (isinstance(b, ListValueType) and isinstance(a, ListValueType) and a.elementType is noneType):
             return self.canAssign(a.elementType, b.elementType)
         return False
 
@@ -140,54 +303,15 @@ class TypeSystem:
             return ListValueType(self.join(b.elementType, a.elementType))
         # if only 1 of the types is a list then the closest ancestor is object
         if isinstance(b, ListValueType) or isinstance(a, ListValueType):
-            return ObjectType()
+            return objectType
         # for 2 classes that aren't related by subtyping
-        # find paths from A & B to root of typing tree
         aCls, bCls = cast(ClassValueType, a).className, cast(
             ClassValueType, b).className
-        aAncestors = []
-        bAncestors = []
-        curr = aCls
-        while curr is not None and self.classes[curr].superclass is not None:
-            if curr != aCls:
-                aAncestors.append(self.classes[curr].superclass)
-            curr = self.classes[curr].superclass
-        curr = bCls
-        while curr is not None and self.classes[curr].superclass is not None:
-            if curr != bCls:
-                bAncestors.append(self.classes[curr].superclass)
-            curr = self.classes[curr].superclass
-        # reverse lists to find lowest common ancestor
-        aAncestors = aAncestors[::-1]
-        bAncestors = bAncestors[::-1]
-        for i in range(min(len(aAncestors), len(bAncestors))):
-            if aAncestors[i] != bAncestors[i]:
-                return ClassValueType(self.classes[aAncestors[i - 1]].name)
-        # this really shouldn't be returned
-        return ObjectType()
+        return ClassValueType(self.getHierarchy().commonAncestor(aCls, bCls))
 
     def getOrderedMethods(self, className: str) -> List[Tuple[str, FuncType, str]]:
         # (name, signature, defined in class)
-        methods = []
-        classInfo = self.classes[className]
-        if classInfo.superclass is not None:
-            methods = self.getOrderedMethods(classInfo.superclass)
-        for name in classInfo.methods:
-            hasExisting = False
-            for i in range(len(methods)):
-                # pyrefly: ignore [bad-index]
-                if methods[i][0] == name:
-                    # pyrefly: ignore [unsupported-operation]
-                    methods[i] = (
-                        name, classInfo.methods[name], className)
-                    hasExisting = True
-                    break
-            if not hasExisting:
-                # pyrefly: ignore [missing-attribute]
-                methods.append(
-                    (name, classInfo.methods[name], className))
-        # pyrefly: ignore [bad-return]
-        return methods
+        return self.getLayout(className).orderedMethods
 
     def getMappedMethods(self, className: str) -> Dict[str, Tuple[FuncType, str]]:
         # map of name -> signature, defined in class
@@ -196,14 +320,7 @@ class TypeSystem:
 
     def getOrderedAttrs(self, className: str) -> List[Tuple[str, ValueType, Any]]:
         # return list of (name, type, init value) triples
-        attrs = []
-        classInfo = self.classes[className]
-        if classInfo.superclass is not None:
-            attrs = self.getOrderedAttrs(classInfo.superclass)
-        for attr in classInfo.orderedAttrs:
-            attrType, attrInit = classInfo.attrs[attr]
-            attrs.append((attr, attrType, attrInit))
-        return attrs
+        return self.getLayout(className).orderedAttrs
 
     def getMappedAttrs(self, className: str) -> Dict[str, Tuple[ValueType, Any]]:
         # map of name -> type, init value tuples
@@ -2,9 +2,23 @@ from .astnodes import *
 from .types import *
 from .builder import Builder
 from .typesystem import TypeSystem
-from .visitor import CommonVisitor
+from .visitor import CommonVisitor, Visitor
 from typing import List, Dict, Tuple, Set, Optional, cast, Callable
 
+# layouts stored in the header of each heap block, which tell the collector how to trace it
+LAYOUT_ATOMIC = 0
+LAYOUT_POINTER_LIST = 1
+LAYOUT_POINTER_BOX = 2
+# class instances use LAYOUT_CLASS_START + class index
+LAYOUT_CLASS_START = 3
+
+# blocks up to this size (including the header) are kept in per-size free lists
+SMALL_BLOCK_LIMIT = 512
+# bytes allocated before the first collection
+GC_INITIAL_THRESHOLD = 1 << 20
+# bytes reserved for the shadow stack, which holds the pointers of active functions for the collector
+SHADOW_STACK_SIZE = 1 << 18
+
 
 class WasmBuilder(Builder):
     def __init__(self, name: str):
@@ -44,18 +58,6 @@ class WasmBuilder(Builder):
         self.unindent()
         self.newLine(")")
 
-    def emit(self) -> str:
-        lines: List[str] = []
-        for l in self.lines:
-            if isinstance(l, str):
-                if " drop" in l and lines[-1] and " i32.const 0" in lines[-1]:
-                    lines.pop()
-                    continue
-                lines.append(l)
-            else:
-                lines.append(l.emit())
-        return "\n".join(lines)
-
     def newBlock(self) -> "WasmBuilder":
         child = WasmBuilder(self.name)
         child.indentation = self.indentation
@@ -63,6 +65,37 @@ class WasmBuilder(Builder):
         return child
 
 
+class CollectionFinder(Visitor):
+    # finds calls of user defined functions and methods, which may collect garbage
+    # with allocations set, also finds code that allocates and may make a collection necessary
+    found: bool
+    allocations: bool
+
+    def __init__(self, allocations: bool):
+        self.found = False
+        self.allocations = allocations
+
+    def visit(self, node: Node):
+        if not self.found:
+            node.postorder(self)
+
+    def CallExpr(self, node: CallExpr):
+        if node.isConstructor or node.function.name not in {"print", "len", "input", "__assert__"}:
+            self.found = True
+
+    def MethodCallExpr(self, node: MethodCallExpr):
+        self.found = True
+
+    def ListExpr(self, node: ListExpr):
+        if self.allocations:
+            self.found = True
+
+    def BinaryExpr(self, node: BinaryExpr):
+        # concatenation of strings or lists
+        if self.allocations and node.operator == "+" and node.left.inferredValueType() != IntType():
+            self.found = True
+
+
 class WasmBackend(CommonVisitor):
     # (class name, attr name) -> class offset
     attrOffsets: Dict[Tuple[str, str], int]
@@ -70,18 +103,56 @@ class WasmBackend(CommonVisitor):
     methodOffsets: Dict[Tuple[str, str], Tuple[int, int, bool]]
     # class -> offset of start of vtable
     vtables: Dict[str, List[Tuple[int, int]]]
+    # class -> layout for the collector
+    classLayouts: Dict[str, int]
+    # number of slots in the shadow stack frame of the current function
+    frameSize: int
+    # slots of the current frame that are no longer in use
+    freeRoots: List[int]
+    # local holding the address of the current frame
+    framePointer: str
+    # slots of the current frame holding the pointer locals of the function
+    localRoots: Dict[str, int]
+    # blocks for pushing and popping the current frame, filled in once its size is known
+    frameEntry: Optional["WasmBuilder"]
+    frameExits: List["WasmBuilder"]
+    # temporaries of the current function that are no longer in use, by type
+    freeTemps: Dict[str, List[str]]
+    # type of each temporary of the current function
+    tempTypes: Dict[str, str]
+    # string literal -> address in the static data segment
+    strings: Dict[str, int]
+    # contents of the static data segment
+    data: bytearray
+    dataStart: int
     undeclaredFuncs: Set[str]
     localsBuilder: Optional[WasmBuilder] = None
 
-    def __init__(self, main: str, ts: TypeSystem):
+    def __init__(self, main: str, ts: TypeSystem, bulkMemory: bool = True, reuseLocals: bool = True):
         self.builder = WasmBuilder(main)
         self.main = main  # name of main method
         self.ts = ts
+        # use the bulk memory instructions, otherwise memory is copied with a loop
+        self.bulkMemory = bulkMemory
+        # reuse the locals of temporaries once their values are dead
+        self.reuseLocals = reuseLocals
+        self.freeTemps = {}
+        self.tempTypes = {}
         self.defaultToGlobals = False  # treat all vars as global if this is true
         self.localCounter = 0
         self.attrOffsets = {}
         self.methodOffsets = {}
         self.vtables = {}
+        self.classLayouts = {}
+        self.frameSize = 0
+        self.freeRoots = []
+        self.framePointer = ""
+        self.localRoots = {}
+        self.frameEntry = None
+        self.frameExits = []
+        self.strings = {}
+        self.data = bytearray()
+        self.dataStart = 0
         self.undeclaredFuncs = set()
 
     def initializeOffsets(self):
@@ -97,7 +168,8 @@ class WasmBackend(CommonVisitor):
                     tblOffset += 1
         # calculate info for each class
         memOffset = 0
-        for cls in classes:
+        for idx, cls in enumerate(classes):
+            self.classLayouts[cls] = LAYOUT_CLASS_START + idx
             attrs = self.ts.getOrderedAttrs(cls)
             for idx, attrInfo in enumerate(attrs):
                 self.attrOffsets[(cls, attrInfo[0])] = idx
@@ -142,6 +214,100 @@ class WasmBackend(CommonVisitor):
         self.localsBuilder.newLine(f"(local ${name} {t})")
         return name
 
+    def newTemp(self, suffix: str, t: str = "i32") -> str:
+        # get a local for a temporary, reusing one that was freed if possible
+        free = self.freeTemps.get(t, [])
+        if self.reuseLocals and len(free) > 0:
+            return free.pop()
+        name = self.newLocal(self.genLocalName(suffix), t)
+        self.tempTypes[name] = t
+        return name
+
+    def freeTemp(self, name: str):
+        # the value of the temporary is dead, so the local can be reused
+        self.freeTemps.setdefault(self.tempTypes[name], []).append(name)
+
+    def newFunction(self, name: str, sig: str = ""):
+        # start a function, temporaries and frames are not shared between functions
+        self.localsBuilder = self.builder.func(name, sig)
+        self.freeTemps = {}
+        self.tempTypes = {}
+        self.frameSize = 0
+        self.freeRoots = []
+        self.localRoots = {}
+        self.framePointer = self.newLocal(self.genLocalName("frame"))
+        self.frameEntry = self.builder.newBlock()
+        self.frameExits = []
+
+    def endFunction(self):
+        # push the frame on entry and pop it on exit, unless the function has no pointers to keep
+        if self.frameSize > 0:
+            assert self.frameEntry is not None
+            self.frameEntry.newLine(f"i32.const {self.frameSize * 4}")
+            self.frameEntry.newLine("call $gc_push_frame")
+            self.frameEntry.newLine(f"local.set ${self.framePointer}")
+            # locals are stored before the first safepoint, other slots may be read before they are set
+            localSlots = set(self.localRoots.values())
+            for slot in range(self.frameSize):
+                if slot not in localSlots:
+                    self.frameEntry.newLine(f"local.get ${self.framePointer}")
+                    self.frameEntry.newLine("i32.const 0")
+                    self.frameEntry.newLine(f"i32.store offset={slot * 4}")
+            for block in self.frameExits:
+                block.newLine(f"local.get ${self.framePointer}")
+                block.newLine("global.set $shadow_sp")
+        self.builder.end()
+
+    def frameExit(self):
+        # the frame is popped here if the function has one
+        self.frameExits.append(self.builder.newBlock())
+
+    def newRoot(self) -> int:
+        # get a slot in the frame for a pointer that has to survive collections, reusing freed slots
+        if len(self.freeRoots) > 0:
+            return self.freeRoots.pop()
+        self.frameSize += 1
+        return self.frameSize - 1
+
+    def freeRoot(self, slot: int):
+        self.freeRoots.append(slot)
+
+    def storeRoot(self, slot: int, local: str):
+        # copy the pointer in a local to a slot of the frame
+        self.getLocal(self.framePointer)
+        self.getLocal(local)
+        self.instr(f"i32.store offset={slot * 4}")
+
+    def rootLocal(self, local: str) -> int:
+        # the caller frees the returned slot
+        slot = self.newRoot()
+        self.storeRoot(slot, local)
+        return slot
+
+    def rootTop(self) -> int:
+        # copy the pointer on top of the stack to a slot, leaving it on the stack
+        # the caller frees the returned slot
+        temp = self.newTemp("root")
+        self.setLocal(temp)
+        slot = self.rootLocal(temp)
+        self.getLocal(temp)
+        self.freeTemp(temp)
+        return slot
+
+    def mayCollect(self, *nodes: Node) -> bool:
+        # whether evaluating the nodes may reach a safepoint in a user defined function
+        finder = CollectionFinder(False)
+        for n in nodes:
+            finder.visit(n)
+        return finder.found
+
+    def mayAllocate(self, *nodes: Node) -> bool:
+        # code that does not allocate never needs a safepoint of its own
+        finder = CollectionFinder(True)
+        for n in nodes:
+            finder.visit(n)
+        return finder.found
+
     def visitStmtList(self, stmts: List[Stmt]):
         if len(stmts) == 0:
             self.instr("nop")
@@ -149,12 +315,17 @@ class WasmBackend(CommonVisitor):
             for s in stmts:
                 self.visit(s)
 
-    def alloc(self, local: Optional[str] = None):
+    def alloc(self, layout: int, local: Optional[str] = None):
         # consume i32 from top of stack, allocate that many bytes
+        self.instr(f"i32.const {layout}")
         self.instr("call $alloc")
         if local is not None:
             self.setLocal(local)
 
+    def boxLayout(self, t: ValueType) -> int:
+        # layout of a ref holding a nonlocal
+        return LAYOUT_POINTER_BOX if self.isPointer(t) else LAYOUT_ATOMIC
+
     def nullthrow(self):
         # throw if top of stack is 0, otherwise returns top of stack
         self.instr("call $nullthrow")
@@ -166,7 +337,7 @@ class WasmBackend(CommonVisitor):
         var_decls = [d for d in node.declarations if isinstance(d, VarDef)]
 
         self.builder.module()
-        self.instr('(import "imports" "logInt" (func $log_int (param i64)))')
+        self.instr('(import "imports" "logInt" (func $log_int (param i32)))')
         self.instr('(import "imports" "logBool" (func $log_bool (param i32)))')
         self.instr('(import "imports" "logString" (func $log_str (param i32)))')
         self.instr(
@@ -183,10 +354,21 @@ class WasmBackend(CommonVisitor):
         funcNames = " ".join([x[0] for x in funcNames])
         self.instr(f"(elem (i32.const 0) {funcNames})")
 
-        # calculate first index of unallocated memory after vtables
+        # static data is laid out after the vtables
         fst = sum([len(t) * 4 for _, t in self.vtables.items()])
-        fst = fst if fst % 8 == 0 else fst + 4
-        self.instr(f"(global $heap (mut i32) (i32.const {fst}))")
+        self.dataStart = fst if fst % 8 == 0 else fst + 4
+        # table of single character strings, 8 bytes each, shared by all string indexing
+        self.instr(f"(global $chars i32 (i32.const {self.dataStart}))")
+        for i in range(256):
+            self.addStaticString(bytes([i]))
+        self.instr(f"(global $layouts i32 (i32.const {self.addLayoutTable()}))")
+        self.instr(f"(global $gc_threshold (mut i32) (i32.const {GC_INITIAL_THRESHOLD}))")
+        self.instr("(global $gc_allocated (mut i32) (i32.const 0))")
+        self.instr("(global $gc_pending (mut i32) (i32.const 0))")
+        self.instr("(global $gc_sp (mut i32) (i32.const 0))")
+        self.instr("(global $large_free (mut i32) (i32.const 0))")
+        # string literals and the heap start are only known after visiting the program
+        data_builder = self.builder.newBlock()
 
         # initialize all globals to 0 for now, since we don't statically allocate strings or arrays
         for v in var_decls:
@@ -201,25 +383,94 @@ class WasmBackend(CommonVisitor):
         for func in sorted(self.undeclaredFuncs):
             self.instr(f"(func {func} (param $self i32))")
 
+        # globals are roots for the collector
+        self.builder.func("gc_mark_globals")
+        for v in var_decls:
+            if self.isPointer(v.var.getTypeX()):
+                self.instr(f"global.get ${v.var.identifier.name}")
+                self.instr("call $gc_mark")
+        self.builder.end()
+
         module_builder = self.builder
         self.builder = module_builder.newBlock()
 
-        self.localsBuilder = self.builder.func("main")
+        self.newFunction("main")
+        # the shadow stack is below the heap, so memory has to cover it before any frame is pushed
+        assert self.frameEntry is not None
+        self.frameEntry.newLine("global.get $heap_start")
+        self.frameEntry.newLine("call $ensure_memory")
         self.defaultToGlobals = True
         self.initializeVtables()
         # initialize globals
         for v in var_decls:
             self.visit(v.value)
             self.instr(f"global.set ${v.getIdentifier().name}")
-        self.visitStmtList(node.statements)
+        for s in node.statements:
+            self.gcSafepoint()
+            self.visit(s)
         self.defaultToGlobals = False
-        self.builder.end()
+        self.endFunction()
 
         self.builder = module_builder
+        # heads of the free lists for each block size, initially empty
+        freelists = self.dataStart + len(self.data)
+        self.data += bytes(SMALL_BLOCK_LIMIT // 2 + 8)
+        # the shadow stack is not part of the data segment, so it is not stored in the module
+        shadowStack = self.dataStart + len(self.data)
+        heap = shadowStack + SHADOW_STACK_SIZE
+        data_builder.newLine(
+            f"(data (i32.const {self.dataStart}) \"{self.escapeData(self.data)}\")")
+        data_builder.newLine(f"(global $freelists i32 (i32.const {freelists}))")
+        data_builder.newLine(f"(global $shadow_stack i32 (i32.const {shadowStack}))")
+        data_builder.newLine(f"(global $shadow_sp (mut i32) (i32.const {shadowStack}))")
+        data_builder.newLine(f"(global $heap_start i32 (i32.const {heap}))")
+        data_builder.newLine(f"(global $heap (mut i32) (i32.const {heap}))")
         self.instr(self.stdlib())
         self.instr("(start $main)")
         self.builder.end()
 
+    def addStaticString(self, value: bytes) -> int:
+        # append a string to the data segment, 4 bytes for length followed by chars, rounded to 8
+        addr = self.dataStart + len(self.data)
+        self.data += len(value).to_bytes(4, "little") + value
+        self.data += bytes(-len(self.data) % 8)
+        return addr
+
+    def addLayoutTable(self) -> int:
+        # for each class, a descriptor with the number of pointer attributes followed by their offsets
+        descriptors = []
+        for cls in self.classLayouts:
+            offsets = [self.attrOffsets[(cls, name)] * 4 + 4
+                       for name, t, _ in self.ts.getOrderedAttrs(cls) if self.isPointer(t)]
+            descriptors.append(self.dataStart + len(self.data))
+            for n in [len(offsets)] + offsets:
+                self.data += n.to_bytes(4, "little")
+            self.data += bytes(-len(self.data) % 8)
+        # table of descriptor addresses, indexed by layout - LAYOUT_CLASS_START
+        table = self.dataStart + len(self.data)
+        for addr in descriptors:
+            self.data += addr.to_bytes(4, "little")
+        self.data += bytes(-len(self.data) % 8)
+        return table
+
+    def isPointer(self, t: ValueType) -> bool:
+        # everything except ints and bools is a pointer
+        return t != IntType() and t != BoolType()
+
+    def gcSafepoint(self):
+        # collect if requested, emitted between statements when the operand stack is empty
+        # every pointer still in use by this function or its callers is in a frame on the shadow stack
+        self.instr("global.get $gc_pending")
+        self.builder._if()
+        self.builder._then()
+        self.instr("call $gc_collect")
+        self.builder.end()
+        self.builder.end()
+
+    def escapeData(self, data: bytearray) -> str:
+        return "".join(chr(b) if 0x20 <= b < 0x7f and b not in b'"\\' else f"\\{b:02x}"
+                       for b in data)
+
     def initializeVtables(self):
         for _, t in self.vtables.items():
             for memOffset, funcOffset in t:
@@ -233,11 +484,17 @@ class WasmBackend(CommonVisitor):
         # pyrefly: ignore [missing-attribute, missing-attribute]
         ret = None if self.returnType.isNone() else self.returnType.getWasmName()
         paramNames = [x.identifier.name for x in node.params]
-        self.localsBuilder = self.builder.func(
-            name, node.getTypeX().getWasmSignature(paramNames))
+        self.newFunction(name, node.getTypeX().getWasmSignature(paramNames))
+        # refs to nonlocals are always pointers
+        for i, p in enumerate(node.getTypeX().parameters):
+            if i in node.getTypeX().refParams or self.isPointer(p):
+                self.localRoots[paramNames[i]] = self.rootLocal(paramNames[i])
         for d in node.declarations:
             self.visit(d)
+        if self.mayAllocate(*node.statements):
+            self.gcSafepoint()
         self.visitStmtList(node.statements)
+        self.frameExit()
         # implicitly return None if possible
         if ret is not None and not isinstance(node.statements[-1], ReturnStmt):
             # pyrefly: ignore [missing-attribute, missing-attribute]
@@ -245,7 +502,7 @@ class WasmBackend(CommonVisitor):
                 self.instr("i32.const 0")
             else:
                 self.instr("unreachable")
-        self.builder.end()
+        self.endFunction()
 
     def ClassDef(self, node: ClassDef):
         self.currentClass = node.name.name
@@ -263,16 +520,19 @@ class WasmBackend(CommonVisitor):
         if node.isAttr:
             raise Exception("this should be handled elsewhere")
         elif node.var.varInstanceX().isNonlocal:
-            self.instr("i32.const 8")
-            self.instr("call $alloc")
+            self.instr("i32.const 4")
+            self.alloc(self.boxLayout(node.value.inferredValueType()))
             addr = self.newLocal(varName)
             self.teeLocal(addr)
+            self.localRoots[addr] = self.rootLocal(addr)
             self.visit(node.value)
             self.instr(f"{node.value.inferredValueType().getWasmName()}.store")
         else:
             self.visit(node.value)
             n = self.newLocal(varName, node.value.inferredValueType().getWasmName())
             self.setLocal(n)
+            if self.isPointer(node.var.getTypeX()):
+                self.localRoots[n] = self.rootLocal(n)
 
     # # STATEMENTS
 
@@ -288,6 +548,8 @@ class WasmBackend(CommonVisitor):
         else:
             self.getLocal(val)
             self.setLocal(target.name)
+            if target.name in self.localRoots:
+                self.storeRoot(self.localRoots[target.name], target.name)
 
     def processAssignmentTarget(self, target: Expr, val: str):
         # val is the name of the local that the value is stored in
@@ -295,25 +557,28 @@ class WasmBackend(CommonVisitor):
             self.setIdentifier(target, val)
         elif isinstance(target, IndexExpr):
             self.visit(target.list)
-            iterable = self.newLocal(self.genLocalName("iterable"))
+            iterable = self.newTemp("iterable")
             self.setLocal(iterable)
+            slot = self.rootLocal(iterable) if self.mayCollect(target.index) else None
             idx = self.validateIdx(iterable, target)
-            # 8 * idx + 4 + list addr
+            if slot is not None:
+                self.freeRoot(slot)
+            # 4 * idx + list addr, skipping the length
             self.getLocal(idx)
-            self.instr("i32.const 8")
-            self.instr("i32.mul")
             self.instr("i32.const 4")
-            self.instr("i32.add")
+            self.instr("i32.mul")
             self.getLocal(iterable)
             self.instr("i32.add")
             self.getLocal(val)
-            self.instr(f"{target.inferredValueType().getWasmName()}.store")
+            self.instr(f"{target.inferredValueType().getWasmName()}.store offset=4")
+            self.freeTemp(iterable)
+            self.freeTemp(idx)
         elif isinstance(target, MemberExpr):
             cls = cast(ClassValueType, target.object.inferredValueType()).className
             attr = target.member.name
             offset = self.attrOffsets[(cls, attr)]
             self.visit(target.object)
-            self.instr(f"i32.const {offset * 8 + 4}")
+            self.instr(f"i32.const {offset * 4 + 4}")
             self.instr("i32.add")
             self.getLocal(val)
             self.instr(f"{target.inferredValueType().getWasmName()}.store")
@@ -326,18 +591,23 @@ class WasmBackend(CommonVisitor):
         attr = node.member.name
         offset = self.attrOffsets[(cls, attr)]
         self.visit(node.object)
-        self.instr(f"i32.const {offset * 8 + 4}")
+        self.instr(f"i32.const {offset * 4 + 4}")
         self.instr("i32.add")
         self.instr(f"{node.inferredValueType().getWasmName()}.load")
 
     def AssignStmt(self, node: AssignStmt):
         self.visit(node.value)
-        val = self.newLocal(self.genLocalName(
-            "val"), node.value.inferredValueType().getWasmName())
+        val = self.newTemp("val", node.value.inferredValueType().getWasmName())
         self.setLocal(val)
         targets = node.targets[::-1]
+        slot = None
+        if self.isPointer(node.value.inferredValueType()) and self.mayCollect(*targets):
+            slot = self.rootLocal(val)
         for t in targets:
             self.processAssignmentTarget(t, val)
+        if slot is not None:
+            self.freeRoot(slot)
+        self.freeTemp(val)
 
     def IfStmt(self, node: IfStmt):
         self.visit(node.condition)
@@ -378,7 +648,12 @@ class WasmBackend(CommonVisitor):
         shortCircuitOperators = {"and", "or"}
         if operator not in shortCircuitOperators:
             self.visit(node.left)
+            slot = None
+            if self.isPointer(leftType) and self.mayCollect(node.right):
+                slot = self.rootTop()
             self.visit(node.right)
+            if slot is not None:
+                self.freeRoot(slot)
         # concatenation and addition
         if operator == "+":
             if self.isListConcat(operator, leftType, rightType):
@@ -386,51 +661,53 @@ class WasmBackend(CommonVisitor):
             elif leftType == StrType():
                 self.strConcat()
             elif leftType == IntType():
-                self.instr("i64.add")
+                self.instr("i32.add")
             else:
                 raise Exception(
                     "Internal compiler error: unexpected operand types for +")
         # other arithmetic operators
         elif operator == "-":
-            self.instr("i64.sub")
+            self.instr("i32.sub")
         elif operator == "*":
-            self.instr("i64.mul")
+            self.instr("i32.mul")
         elif operator == "//":
-            self.instr("i64.div_s")
+            self.instr("i32.div_s")
         elif operator == "%":
-            a = self.newLocal(None, IntType().getWasmName())
-            b = self.newLocal(None, IntType().getWasmName())
+            a = self.newTemp("a", IntType().getWasmName())
+            b = self.newTemp("b", IntType().getWasmName())
             self.setLocal(b)
             self.setLocal(a)
             # emulate Python modulo with ((a rem b) + b) rem b)
             self.getLocal(a)
             self.getLocal(b)
-            self.instr("i64.rem_s")
+            self.instr("i32.rem_s")
             self.getLocal(b)
-            self.instr("i64.add")
+            self.instr("i32.add")
             self.getLocal(b)
-            self.instr("i64.rem_s")
+            self.instr("i32.rem_s")
+            self.freeTemp(a)
+            self.freeTemp(b)
         # relational operators
         elif operator == "<":
-            self.instr("i64.lt_s")
+            self.instr("i32.lt_s")
         elif operator == "<=":
-            self.instr("i64.gt_s")
+            self.instr("i32.gt_s")
             self.instr("i32.eqz")
         elif operator == ">":
-            self.instr("i64.gt_s")
+            self.instr("i32.gt_s")
         elif operator == ">=":
-            self.instr("i64.lt_s")
+            self.instr("i32.lt_s")
             self.instr("i32.eqz")
         elif operator == "==":
             if leftType == IntType():
-                self.instr("i64.eq")
+                self.instr("i32.eq")
             elif leftType == StrType():
                 self.strCompare()
             else:
                 self.instr("i32.eq")
         elif operator == "!=":
             if leftType == IntType():
-                self.instr("i64.ne")
+                self.instr("i32.ne")
             elif leftType == StrType():
                 self.strCompare()
                 self.instr("i32.eqz")
@@ -458,9 +735,9 @@ class WasmBackend(CommonVisitor):
 
     def UnaryExpr(self, node: UnaryExpr):
         if node.operator == "-":
-            self.instr("i64.const 0")
+            self.instr("i32.const 0")
             self.visit(node.operand)
-            self.instr("i64.sub")
+            self.instr("i32.sub")
         elif node.operator == "not":
             self.visit(node.operand)
             self.instr("i32.eqz")
@@ -468,12 +745,11 @@ class WasmBackend(CommonVisitor):
     def constructor(self, node: CallExpr):
         cls = node.function.name
         self.instr(f";; construct {cls}")
-        attrs = self.ts.getMappedAttrs(cls)
-        size = len(attrs) * 8 + 4
-        increase = size if size % 8 == 0 else size + 4
-        self.instr(f"i32.const {increase}")
-        addr = self.newLocal(self.genLocalName("addr"))
-        self.alloc(addr)
+        attrs = self.ts.getOrderedAttrs(cls)
+        size = len(attrs) * 4 + 4
+        self.instr(f"i32.const {size}")
+        addr = self.newTemp("addr")
+        self.alloc(self.classLayouts[cls], addr)
 
         # store starting position of vtable
         self.getLocal(addr)
@@ -484,7 +760,7 @@ class WasmBackend(CommonVisitor):
         for name, t, v in self.ts.getOrderedAttrs(cls):
             offset = self.attrOffsets[(cls, name)]
             self.getLocal(addr)
-            self.instr(f"i32.const {offset * 8 + 4}")
+            self.instr(f"i32.const {offset * 4 + 4}")
             self.instr("i32.add")
             self.visit(v)
             self.instr(f"{t.getWasmName()}.store")
@@ -496,6 +772,7 @@ class WasmBackend(CommonVisitor):
 
         # return pointer to self
         self.getLocal(addr)
+        self.freeTemp(addr)
 
     def CallExpr(self, node: CallExpr):
         name = node.function.name
@@ -510,9 +787,10 @@ class WasmBackend(CommonVisitor):
         elif name == "__assert__":
             self.emit_assert(node.args[0], node.location[0])
         else:
-            for i in range(len(node.args)):
-                self.visitArg(cast(FuncType, node.function.inferredType), i, node.args[i])
+            slots = self.visitArgs(cast(FuncType, node.function.inferredType), 0, node.args)
             self.instr(f"call ${name}")
+            for slot in slots:
+                self.freeRoot(slot)
             if cast(FuncType, node.function.inferredType).returnType.isNone():
                 self.NoneLiteral(None)  # push null for void return
 
@@ -524,17 +802,18 @@ class WasmBackend(CommonVisitor):
             return
 
         self.visit(node.method.object)
-        obj = self.newLocal(self.genLocalName("obj"))
+        obj = self.newTemp("obj")
         self.setLocal(obj)
+        slots = [self.rootLocal(obj)] if self.mayCollect(*node.args) else []
 
         # args
         self.getLocal(obj)
-        for i in range(len(node.args)):
-            self.visitArg(funcType, i + 1, node.args[i])
+        slots += self.visitArgs(funcType, 1, node.args)
 
         # load indirect index
         self.getLocal(obj)
         self.instr("i32.load")  # load start of vtable
+        self.freeTemp(obj)
 
         methOffset, _, _ = self.methodOffsets[(className, methodName)]
         self.instr(f"i32.const {methOffset * 4}")
@@ -543,24 +822,28 @@ class WasmBackend(CommonVisitor):
 
         self.instr(f";; call method {methodName}")
         self.instr(f"call_indirect {funcType.getWasmSignature()}")
+        for slot in slots:
+            self.freeRoot(slot)
 
         if funcType.returnType.isNone():
             self.NoneLiteral(None)  # push null for void return
 
     # helper for debugging pointers, unused normally
     def debug(self):
-        temp = self.newLocal(self.genLocalName("idx"))
+        temp = self.newTemp("idx")
         self.setLocal(temp)
         self.getLocal(temp)
-        self.instr("i64.extend_i32_u")
         self.instr("call $log_int")
         self.getLocal(temp)
+        self.freeTemp(temp)
 
     def WhileStmt(self, node: WhileStmt):
         block = self.newLabelName()
         loop = self.newLabelName()
         self.builder.block(block)
         self.builder.loop(loop)
+        if self.mayAllocate(node):
+            self.gcSafepoint()
         self.visit(node.condition)
         self.instr("i32.eqz")
         self.instr(f"br_if ${block}")
@@ -574,15 +857,16 @@ class WasmBackend(CommonVisitor):
         block = self.newLabelName()
         loop = self.newLabelName()
 
-        iterable = self.newLocal(self.genLocalName("iterable"))
-        idx = self.newLocal(self.genLocalName("idx"))
-        length = self.newLocal(self.genLocalName("length"))
-        # this temporarily stores the current value
-        temp = self.newLocal(self.genLocalName(
-            "temp"), node.identifier.inferredValueType().getWasmName())
+        # these are live for the whole loop
+        iterable = self.newTemp("iterable")
+        idx = self.newTemp("idx")
+        length = self.newTemp("length")
 
+        # the iterable is live across the safepoint of each iteration
+        allocates = self.mayAllocate(*node.body)
         self.visit(node.iterable)
         self.teeLocal(iterable)
+        slot = self.rootLocal(iterable) if allocates else None
         self.nullthrow()
 
         self.instr("i32.load")
@@ -603,11 +887,17 @@ class WasmBackend(CommonVisitor):
 
         self.instr(f"br_if ${block}")
 
+        if allocates:
+            self.gcSafepoint()
+
         isList = node.iterable.inferredValueType().isListType()
         contentsType = node.identifier.inferredValueType().getWasmName()
+        # this temporarily stores the current value
+        temp = self.newTemp("temp", contentsType)
         self.idxHelper(iterable, idx, isList, contentsType)
         self.setLocal(temp)
         self.setIdentifier(node.identifier, temp)
+        self.freeTemp(temp)
 
         for s in node.body:
             self.visit(s)
@@ -621,16 +911,23 @@ class WasmBackend(CommonVisitor):
         self.instr(f"br ${loop}")
         self.builder.end()
         self.builder.end()
+        if slot is not None:
+            self.freeRoot(slot)
+        self.freeTemp(iterable)
+        self.freeTemp(idx)
+        self.freeTemp(length)
 
     def buildReturn(self, value: Optional[Expr]):
         # pyrefly: ignore [missing-attribute]
         if self.returnType.isNone():
+            self.frameExit()
             self.instr("return")
         else:
             if value is None:
                 self.NoneLiteral(None)
             else:
                 self.visit(value)
+            self.frameExit()
             self.instr("return")
 
     def ReturnStmt(self, node: ReturnStmt):
@@ -653,7 +950,7 @@ class WasmBackend(CommonVisitor):
         self.ternary(c, t, e, resultType)
 
     def ternary(self, condFn: Callable, thenFn: Callable, elseFn: Callable, resultType: str):
-        n = self.newLocal(self.genLocalName("ifexpr_result"), resultType)
+        n = self.newTemp("ifexpr_result", resultType)
         condFn()
         self.builder._if()
         self.builder._then()
@@ -666,6 +963,7 @@ class WasmBackend(CommonVisitor):
         self.builder.end()
         self.builder.end()
         self.getLocal(n)
+        self.freeTemp(n)
 
     def ListExpr(self, node: ListExpr):
         length = len(node.elements)
@@ -679,35 +977,37 @@ class WasmBackend(CommonVisitor):
         else:
             elementType = cast(ListValueType, t).elementType
 
-        # 8 bytes per element + 4 for the length, rounded up to nearest 8
-        increase = (length + 1) * 8
-        self.instr(f"i32.const {increase}")
+        # 4 bytes per element + 4 for the length
+        size = (length + 1) * 4
+        self.instr(f"i32.const {size}")
 
-        addr = self.newLocal(self.genLocalName("addr"))
-        self.alloc(addr)
+        addr = self.newTemp("addr")
+        layout = LAYOUT_POINTER_LIST if self.isPointer(elementType) else LAYOUT_ATOMIC
+        self.alloc(layout, addr)
+        slot = self.rootLocal(addr) if self.mayCollect(*node.elements) else None
 
         # store the length
         self.getLocal(addr)
         self.instr(f"i32.const {length}")  # value
         self.instr("i32.store")  # alignment: 32-bit
-        # unlike strings, each item in the list gets 64 bits instead of 8
+        # unlike strings, each item in the list gets 32 bits instead of 8
         for i in range(length):
-            offset = i * 8 + 4
-            # addr: mem + 4 + idx * 8
+            # addr: mem + 4 + idx * 4
             self.getLocal(addr)
-            self.instr(f"i32.const {offset}")
-            self.instr("i32.add")
             self.visit(node.elements[i])
-            self.instr(f"{elementType.getWasmName()}.store")
+            self.instr(f"{elementType.getWasmName()}.store offset={i * 4 + 4}")
 
         # load the address the list was stored at to the stack
         self.getLocal(addr)
+        if slot is not None:
+            self.freeRoot(slot)
+        self.freeTemp(addr)
 
     def validateIdx(self, iterable: str, node: IndexExpr):
-        idx = self.newLocal(self.genLocalName("idx"))
+        # the caller frees the returned temporary
+        idx = self.newTemp("idx")
 
         self.visit(node.index)
-        self.instr("i32.wrap_i64")
         self.setLocal(idx)
 
         self.getLocal(iterable)
@@ -717,27 +1017,30 @@ class WasmBackend(CommonVisitor):
 
     def idxHelper(self, iterable: str, idx: str, isList: bool, contentsType: str):
         if isList:
-            # 8 * idx + 4 + list addr
+            # 4 * idx + list addr, skipping the length
             self.getLocal(idx)
-            self.instr("i32.const 8")
-            self.instr("i32.mul")
             self.instr("i32.const 4")
-            self.instr("i32.add")
+            self.instr("i32.mul")
             self.getLocal(iterable)
             self.instr("i32.add")
-            self.instr(f"{contentsType}.load")
-        else:  # must be a string, need to alloc a new string
+            self.instr(f"{contentsType}.load offset=4")
+        else:  # must be a string, look up the single character string
             self.getLocal(iterable)
             self.getLocal(idx)
             self.instr("call $str_idx")
 
     def IndexExpr(self, node: IndexExpr):
         self.visit(node.list)
-        iterable = self.newLocal(self.genLocalName("iterable"))
+        iterable = self.newTemp("iterable")
         self.setLocal(iterable)
+        slot = self.rootLocal(iterable) if self.mayCollect(node.index) else None
         idx = self.validateIdx(iterable, node)
+        if slot is not None:
+            self.freeRoot(slot)
         self.idxHelper(iterable, idx, node.list.inferredValueType().isListType(),
                        node.inferredValueType().getWasmName())
+        self.freeTemp(iterable)
+        self.freeTemp(idx)
 
     # # LITERALS
 
@@ -748,39 +1051,31 @@ class WasmBackend(CommonVisitor):
             self.instr("i32.const 0")
 
     def IntegerLiteral(self, node: IntegerLiteral):
-        self.instr(f"i64.const {node.value}")
+        self.instr(f"i32.const {node.value}")
 
     def NoneLiteral(self, node: Optional[NoneLiteral]):
         self.instr("i32.const 0")
 
     def StringLiteral(self, node: StringLiteral):
-        # pyrefly: ignore [bad-argument-type]
-        length = len(node.value)
-        memory = length + 4
-        # 1 byte per char + 4 for length, rounded to nearest 8
-        increase = 8 + (8 * (memory // 8))
-        self.instr(f"i32.const {increase}")
-
-        addr = self.newLocal(self.genLocalName("addr"))
-        self.alloc(addr)
-
-        # store the length
-        self.getLocal(addr)
-        self.instr(f"i32.const {length}")  # value
-        self.instr("i32.store")
-        for i in range(length):
-            offset = i + 4
-            # pyrefly: ignore [unsupported-operation]
-            val = ord(node.value[i])
-            # addr: mem + 4 + idx
-            self.getLocal(addr)
-            self.instr(f"i32.const {offset}")
-            self.instr("i32.add")
-            self.instr(f"i32.const {val}")
-            self.instr("i32.store8")
-
-        # load the address the string was stored at to the stack
-        self.getLocal(addr)
+        # literals are deduplicated into the static data segment
+        value = node.value
+        assert value is not None
+        if value not in self.strings:
+            self.strings[value] = self.addStaticString(
+                bytes([ord(c) for c in value]))
+        self.instr(f"i32.const {self.strings[value]}")
+
+    def visitArgs(self, funcType: FuncType, firstParam: int, args: List[Expr]) -> List[int]:
+        # arguments that are pointers are rooted while later arguments are evaluated
+        # the caller frees the returned slots after the call
+        slots = []
+        for i, arg in enumerate(args):
+            paramIdx = firstParam + i
+            self.visitArg(funcType, paramIdx, arg)
+            isPointer = paramIdx in funcType.refParams or self.isPointer(arg.inferredValueType())
+            if isPointer and self.mayCollect(*args[i + 1:]):
+                slots.append(self.rootTop())
+        return slots
 
     def visitArg(self, funcType: FuncType, paramIdx: int, arg: Expr):
         argIsRef = isinstance(arg, Identifier) and arg.varInstanceX().isNonlocal
@@ -791,13 +1086,17 @@ class WasmBackend(CommonVisitor):
         elif paramIsRef:
             # non-ref arg and ref param, or do not pass ref arg
             # unwrap if necessary, re-wrap
-            self.instr("i32.const 8")
-            self.instr("call $alloc")
-            addr = self.newLocal(self.genLocalName("arg_" + str(paramIdx)))
+            self.instr("i32.const 4")
+            self.alloc(self.boxLayout(arg.inferredValueType()))
+            addr = self.newTemp("arg_" + str(paramIdx))
             self.teeLocal(addr)
+            slot = self.rootLocal(addr) if self.mayCollect(arg) else None
             self.visit(arg)
             self.instr(f"{arg.inferredValueType().getWasmName()}.store")
             self.getLocal(addr)
+            if slot is not None:
+                self.freeRoot(slot)
+            self.freeTemp(addr)
 
         else:  # non-ref param, maybe unwrap
             self.visit(arg)
@@ -822,58 +1121,607 @@ class WasmBackend(CommonVisitor):
         # the length of a string or array is always in the first 4 bytes
         self.visit(arg)
         self.instr("call $len")
-        self.instr("i64.extend_i32_u")
 
-    def stdlib(self) -> str:
-        return """
-    ;; allocate and return addr of memory
-    ;; based on https://github.com/ucsd-cse231-s22/chocopy-wasm-compiler-A/blob/2022/stdlib/memory.wat
-    (func $alloc (param $bytes i32) (result i32)
-        (local $addr i32)
-        global.get $heap
-        local.set $addr
-        local.get $bytes
-        global.get $heap
-        i32.add
-        global.set $heap
-        local.get $addr
+    def memCpy(self) -> str:
+        if self.bulkMemory:
+            return """    ;; copy $size bytes from $src to $dest
+    (func $mem_cpy (param $src i32) (param $dest i32) (param $size i32)
+        local.get $dest
+        local.get $src
+        local.get $size
+        memory.copy
     )
-    ;; copy $size bytes from $src to $dest
+"""
+        return """    ;; copy $size bytes from $src to $dest, 8 bytes at a time followed by the remaining bytes
     ;; this just blindly copies memory and does not do any sort of validation/checks
     (func $mem_cpy (param $src i32) (param $dest i32) (param $size i32)
         (local $idx i32)
-        (local $temp i32)
+        (local $words i32)
         i32.const 0
         local.set $idx
-        (block $block
-            (loop $loop
+        local.get $size
+        i32.const -8
+        i32.and
+        local.set $words
+        (block $words_done
+            (loop $words_loop
+                local.get $idx
+                local.get $words
+                i32.ge_u
+                br_if $words_done
+                ;; copy a word from $src + offset to $dest + offset
+                local.get $idx
+                local.get $dest
+                i32.add
+                local.get $idx
+                local.get $src
+                i32.add
+                i64.load
+                i64.store
+                local.get $idx
+                i32.const 8
+                i32.add
+                local.set $idx
+                br $words_loop
+            )
+        )
+        (block $bytes_done
+            (loop $bytes_loop
                 local.get $idx
                 local.get $size
-                i32.lt_s
-                i32.eqz
-                br_if $block
-                ;; read byte from $src + offset
+                i32.ge_u
+                br_if $bytes_done
+                ;; copy a byte from $src + offset to $dest + offset
+                local.get $idx
+                local.get $dest
+                i32.add
                 local.get $idx
                 local.get $src
                 i32.add
                 i32.load8_u
-                local.set $temp
-                ;; write byte to $dest + offset
+                i32.store8
+                local.get $idx
+                i32.const 1
+                i32.add
+                local.set $idx
+                br $bytes_loop
+            )
+        )
+    )
+"""
+
+    def memZero(self) -> str:
+        if self.bulkMemory:
+            return """    ;; clear $size bytes at $dest
+    (func $mem_zero (param $dest i32) (param $size i32)
+        local.get $dest
+        i32.const 0
+        local.get $size
+        memory.fill
+    )
+"""
+        return """    ;; clear $size bytes at $dest, 8 bytes at a time, $size is always a multiple of 8
+    (func $mem_zero (param $dest i32) (param $size i32)
+        (local $idx i32)
+        i32.const 0
+        local.set $idx
+        (block $words_done
+            (loop $words_loop
+                local.get $idx
+                local.get $size
+                i32.ge_u
+                br_if $words_done
                 local.get $idx
                 local.get $dest
                 i32.add
-                local.get $temp
-                i32.store8
-                ;; increment offset
+                i64.const 0
+                i64.store
                 local.get $idx
+                i32.const 8
+                i32.add
+                local.set $idx
+                br $words_loop
+            )
+        )
+    )
+"""
+
+    def stdlib(self) -> str:
+        return f"""
+    ;; allocate a block for $bytes bytes with the given layout, returning the address of the data
+    ;; each block starts with an 8 byte header: the block size, whose low bits are the mark and free flags, and the layout
+    ;; freed blocks are reused from free lists, otherwise memory is bump allocated from $heap
+    (func $alloc (param $bytes i32) (param $layout i32) (result i32)
+        (local $size i32)
+        (local $block i32)
+        (local $prev i32)
+        (local $list i32)
+        ;; size including the header, rounded up to a multiple of 8
+        local.get $bytes
+        i32.const 15
+        i32.add
+        i32.const -8
+        i32.and
+        local.set $size
+        (block $found
+            local.get $size
+            i32.const {SMALL_BLOCK_LIMIT}
+            i32.le_u
+            (if
+                (then
+                    ;; pop from the free list for this size
+                    global.get $freelists
+                    local.get $size
+                    i32.const 1
+                    i32.shr_u
+                    i32.add
+                    local.tee $list
+                    i32.load
+                    local.tee $block
+                    (if
+                        (then
+                            local.get $list
+                            local.get $block
+                            i32.load offset=8
+                            i32.store
+                            br $found
+                        )
+                    )
+                )
+                (else
+                    ;; first fit from the free list of large blocks
+                    i32.const 0
+                    local.set $prev
+                    global.get $large_free
+                    local.set $block
+                    (block $search_done
+                        (loop $search
+                            local.get $block
+                            i32.eqz
+                            br_if $search_done
+                            local.get $block
+                            i32.load
+                            i32.const -8
+                            i32.and
+                            local.get $size
+                            i32.ge_u
+                            (if
+                                (then
+                                    ;; unlink the block, which keeps its own size
+                                    local.get $block
+                                    i32.load
+                                    i32.const -8
+                                    i32.and
+                                    local.set $size
+                                    local.get $prev
+                                    i32.eqz
+                                    (if
+                                        (then
+                                            local.get $block
+                                            i32.load offset=8
+                                            global.set $large_free
+                                        )
+                                        (else
+                                            local.get $prev
+                                            local.get $block
+                                            i32.load offset=8
+                                            i32.store offset=8
+                                        )
+                                    )
+                                    br $found
+                                )
+                            )
+                            local.get $block
+                            local.set $prev
+                            local.get $block
+                            i32.load offset=8
+                            local.set $block
+                            br $search
+                        )
+                    )
+                )
+            )
+            ;; no free block, bump allocate
+            global.get $heap
+            local.tee $block
+            local.get $size
+            i32.add
+            global.set $heap
+            global.get $heap
+            call $ensure_memory
+        )
+        ;; write the header
+        local.get $block
+        local.get $size
+        i32.store
+        local.get $block
+        local.get $layout
+        i32.store offset=4
+        ;; clear the data, since reused blocks and memory above the heap hold stale pointers
+        ;; objects are rooted before all their fields are written, so the collector can see them
+        ;; atomic blocks are never scanned, and are skipped since strings are large and always overwritten
+        local.get $layout
+        i32.const {LAYOUT_ATOMIC}
+        i32.ne
+        (if
+            (then
+                local.get $block
+                i32.const 8
+                i32.add
+                local.get $size
+                i32.const 8
+                i32.sub
+                call $mem_zero
+            )
+        )
+        ;; request a collection at the next safepoint once enough has been allocated
+        ;; collecting here is not possible, since callers may hold pointers that are not on the shadow stack
+        global.get $gc_allocated
+        local.get $size
+        i32.add
+        global.set $gc_allocated
+        global.get $gc_allocated
+        global.get $gc_threshold
+        i32.ge_u
+        (if
+            (then
                 i32.const 1
+                global.set $gc_pending
+            )
+        )
+        local.get $block
+        i32.const 8
+        i32.add
+    )
+    ;; grow memory so that addresses below $end are valid, trapping if memory is exhausted
+    (func $ensure_memory (param $end i32)
+        (local $pages i32)
+        local.get $end
+        memory.size
+        i32.const 16
+        i32.shl
+        i32.gt_u
+        (if
+            (then
+                ;; number of missing pages
+                local.get $end
+                memory.size
+                i32.const 16
+                i32.shl
+                i32.sub
+                i32.const 65535
                 i32.add
+                i32.const 16
+                i32.shr_u
+                local.set $pages
+                ;; try to double the memory, to avoid growing for every page
+                local.get $pages
+                memory.size
+                local.get $pages
+                memory.size
+                i32.gt_u
+                select
+                memory.grow
+                i32.const -1
+                i32.eq
+                (if
+                    (then
+                        local.get $pages
+                        memory.grow
+                        i32.const -1
+                        i32.eq
+                        (if
+                            (then
+                                unreachable
+                            )
+                        )
+                    )
+                )
+            )
+        )
+    )
+    ;; mark a heap object and push it onto the mark stack, ignoring null, static data, marked objects, and free blocks
+    ;; a free block can be reached from a stale pointer in an object that is rooted before it is filled in
+    (func $gc_mark (param $addr i32)
+        (local $header i32)
+        local.get $addr
+        global.get $heap_start
+        i32.gt_u
+        local.get $addr
+        global.get $heap
+        i32.lt_u
+        i32.and
+        (if
+            (then
+                local.get $addr
+                i32.const 8
+                i32.sub
+                local.tee $header
+                i32.load
+                ;; the mark and free flags
+                i32.const 3
+                i32.and
+                i32.eqz
+                (if
+                    (then
+                        local.get $header
+                        local.get $header
+                        i32.load
+                        i32.const 1
+                        i32.or
+                        i32.store
+                        global.get $gc_sp
+                        i32.const 4
+                        i32.add
+                        call $ensure_memory
+                        global.get $gc_sp
+                        local.get $addr
+                        i32.store
+                        global.get $gc_sp
+                        i32.const 4
+                        i32.add
+                        global.set $gc_sp
+                    )
+                )
+            )
+        )
+    )
+    ;; push a frame of $size bytes onto the shadow stack, returning its address
+    (func $gc_push_frame (param $size i32) (result i32)
+        (local $frame i32)
+        global.get $shadow_sp
+        local.tee $frame
+        local.get $size
+        i32.add
+        global.set $shadow_sp
+        ;; trap if the shadow stack overflows into the heap
+        global.get $shadow_sp
+        global.get $heap_start
+        i32.gt_u
+        (if
+            (then
+                unreachable
+            )
+        )
+        local.get $frame
+    )
+    ;; mark the globals and the frames on the shadow stack, then trace the heap and free unmarked blocks
+    (func $gc_collect
+        (local $addr i32)
+        (local $layout i32)
+        (local $desc i32)
+        (local $idx i32)
+        (local $count i32)
+        (local $block i32)
+        (local $header i32)
+        (local $size i32)
+        (local $live i32)
+        (local $list i32)
+        ;; the mark stack lives in unallocated memory after the heap
+        global.get $heap
+        global.set $gc_sp
+        call $gc_mark_globals
+        global.get $shadow_stack
+        local.set $addr
+        (block $roots_done
+            (loop $roots
+                local.get $addr
+                global.get $shadow_sp
+                i32.ge_u
+                br_if $roots_done
+                local.get $addr
+                i32.load
+                call $gc_mark
+                local.get $addr
+                i32.const 4
+                i32.add
+                local.set $addr
+                br $roots
+            )
+        )
+        (block $trace_done
+            (loop $trace
+                global.get $gc_sp
+                global.get $heap
+                i32.le_u
+                br_if $trace_done
+                ;; pop an object from the mark stack
+                global.get $gc_sp
+                i32.const 4
+                i32.sub
+                global.set $gc_sp
+                global.get $gc_sp
+                i32.load
+                local.tee $addr
+                i32.const 4
+                i32.sub
+                i32.load
+                local.set $layout
+                i32.const 0
                 local.set $idx
-                br $loop
+                local.get $layout
+                i32.const {LAYOUT_POINTER_LIST}
+                i32.eq
+                (if
+                    (then
+                        ;; mark each element, which are 4 bytes apart
+                        local.get $addr
+                        i32.load
+                        local.set $count
+                        (block $list_done
+                            (loop $list_loop
+                                local.get $idx
+                                local.get $count
+                                i32.ge_u
+                                br_if $list_done
+                                local.get $addr
+                                local.get $idx
+                                i32.const 4
+                                i32.mul
+                                i32.add
+                                i32.load offset=4
+                                call $gc_mark
+                                local.get $idx
+                                i32.const 1
+                                i32.add
+                                local.set $idx
+                                br $list_loop
+                            )
+                        )
+                    )
+                )
+                local.get $layout
+                i32.const {LAYOUT_POINTER_BOX}
+                i32.eq
+                (if
+                    (then
+                        local.get $addr
+                        i32.load
+                        call $gc_mark
+                    )
+                )
+                local.get $layout
+                i32.const {LAYOUT_CLASS_START}
+                i32.ge_u
+                (if
+                    (then
+                        ;; mark each pointer attribute listed in the descriptor for the class
+                        global.get $layouts
+                        local.get $layout
+                        i32.const {LAYOUT_CLASS_START}
+                        i32.sub
+                        i32.const 4
+                        i32.mul
+                        i32.add
+                        i32.load
+                        local.tee $desc
+                        i32.load
+                        local.set $count
+                        (block $attrs_done
+                            (loop $attrs_loop
+                                local.get $idx
+                                local.get $count
+                                i32.ge_u
+                                br_if $attrs_done
+                                local.get $addr
+                                local.get $desc
+                                local.get $idx
+                                i32.const 4
+                                i32.mul
+                                i32.add
+                                i32.load offset=4
+                                i32.add
+                                i32.load
+                                call $gc_mark
+                                local.get $idx
+                                i32.const 1
+                                i32.add
+                                local.set $idx
+                                br $attrs_loop
+                            )
+                        )
+                    )
+                )
+                br $trace
+            )
+        )
+        ;; sweep every block in the heap
+        i32.const 0
+        local.set $live
+        global.get $heap_start
+        local.set $block
+        (block $sweep_done
+            (loop $sweep
+                local.get $block
+                global.get $heap
+                i32.ge_u
+                br_if $sweep_done
+                local.get $block
+                i32.load
+                local.tee $header
+                i32.const -8
+                i32.and
+                local.set $size
+                local.get $header
+                i32.const 1
+                i32.and
+                (if
+                    (then
+                        ;; live, clear the mark
+                        local.get $block
+                        local.get $size
+                        i32.store
+                        local.get $live
+                        local.get $size
+                        i32.add
+                        local.set $live
+                    )
+                    (else
+                        local.get $header
+                        i32.const 2
+                        i32.and
+                        i32.eqz
+                        (if
+                            (then
+                                ;; garbage, flag as free and push onto a free list
+                                local.get $block
+                                local.get $size
+                                i32.const 2
+                                i32.or
+                                i32.store
+                                local.get $size
+                                i32.const {SMALL_BLOCK_LIMIT}
+                                i32.le_u
+                                (if
+                                    (then
+                                        global.get $freelists
+                                        local.get $size
+                                        i32.const 1
+                                        i32.shr_u
+                                        i32.add
+                                        local.tee $list
+                                        i32.load
+                                        local.set $addr
+                                        local.get $block
+                                        local.get $addr
+                                        i32.store offset=8
+                                        local.get $list
+                                        local.get $block
+                                        i32.store
+                                    )
+                                    (else
+                                        local.get $block
+                                        global.get $large_free
+                                        i32.store offset=8
+                                        local.get $block
+                                        global.set $large_free
+                                    )
+                                )
+                            )
+                        )
+                    )
+                )
+                local.get $block
+                local.get $size
+                i32.add
+                local.set $block
+                br $sweep
             )
         )
+        ;; collect again after allocating as much as is live, but at least the initial threshold
+        local.get $live
+        i32.const {GC_INITIAL_THRESHOLD}
+        local.get $live
+        i32.const {GC_INITIAL_THRESHOLD}
+        i32.gt_u
+        select
+        global.set $gc_threshold
+        i32.const 0
+        global.set $gc_allocated
+        i32.const 0
+        global.set $gc_pending
     )
-    ;; return the length of a string or list as i32
+{self.memCpy()}{self.memZero()}    ;; return the length of a string or list as i32
     (func $len (param $addr i32) (result i32)
         local.get $addr
         call $nullthrow
@@ -923,23 +1771,15 @@ class WasmBackend(CommonVisitor):
         i32.add
         i32.load8_u
     )
-    ;; index a string, allocating a new string for the single character and returning the address
+    ;; index a string, returning the address of the single character string from the table
     (func $str_idx (param $addr i32) (param $idx i32) (result i32)
-        (local $new i32)
-        i32.const 8
-        call $alloc
-        local.set $new
-        local.get $new
-        i32.const 1
-        i32.store
-        local.get $new
-        i32.const 4
-        i32.add
+        global.get $chars
         local.get $addr
         local.get $idx
         call $get_char
-        i32.store8
-        local.get $new
+        i32.const 8
+        i32.mul
+        i32.add
     )
     ;; concatenate two strings, returning the address of the new string
     (func $str_concat (param $s1 i32) (param $s2 i32) (result i32)
@@ -962,6 +1802,7 @@ class WasmBackend(CommonVisitor):
         i32.mul
         i32.const 8
         i32.add
+        i32.const {LAYOUT_ATOMIC}
         call $alloc
         local.tee $addr
         ;; store length
@@ -1054,7 +1895,7 @@ class WasmBackend(CommonVisitor):
         (local $len1 i32)
         (local $len2 i32)
         (local $addr i32)
-        ;; allocate 8 * (len1 + len2 + 1) bytes
+        ;; allocate 4 * (len1 + len2 + 1) bytes
         local.get $l1
         call $len
         local.tee $len1
@@ -1064,8 +1905,18 @@ class WasmBackend(CommonVisitor):
         i32.add
         i32.const 1
         i32.add
-        i32.const 8
+        i32.const 4
         i32.mul
+        ;; the result holds pointers if either list does
+        local.get $l1
+        i32.const 4
+        i32.sub
+        i32.load
+        local.get $l2
+        i32.const 4
+        i32.sub
+        i32.load
+        i32.or
         call $alloc
         local.tee $addr
         ;; store length
@@ -1081,7 +1932,7 @@ class WasmBackend(CommonVisitor):
         i32.const 4
         i32.add
         local.get $len1
-        i32.const 8
+        i32.const 4
         i32.mul
         call $mem_cpy
         ;; copy list 2
@@ -1092,11 +1943,11 @@ class WasmBackend(CommonVisitor):
         i32.const 4
         i32.add
         local.get $len1
-        i32.const 8
+        i32.const 4
         i32.mul
         i32.add
         local.get $len2
-        i32.const 8
+        i32.const 4
         i32.mul
         call $mem_cpy
         local.get $addr
@@ -0,0 +1,709 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from .builder import Builder
+
+# assembles the WAT emitted by WasmBackend directly into the WebAssembly binary format,
+# so that no external tools are needed to produce a .wasm file
+# the lines of a WasmBuilder are read directly, without joining them into one text first
+# supports the subset of the text format used by the backend and its stdlib:
+# integer instructions, folded and flat control flow, and the module fields below
+
+# an s-expression, atoms are str and string literals are bytes
+SExpr = Union[str, bytes, List["SExpr"]]
+# "(" and ")" delimit lists, other tokens are atoms and decoded string literals
+Token = Union[str, bytes]
+# list of (name, type) for params and locals
+Params = List[Tuple[Optional[str], str]]
+
+VALTYPES = {"i32": 0x7f, "i64": 0x7e, "f32": 0x7d, "f64": 0x7c,
+            "funcref": 0x70, "externref": 0x6f}
+
+# opcodes for instructions without immediates
+SIMPLE_OPS: Dict[str, int] = {
+    "unreachable": 0x00, "nop": 0x01, "return": 0x0f, "drop": 0x1a, "select": 0x1b,
+    "i32.wrap_i64": 0xa7, "i64.extend_i32_s": 0xac, "i64.extend_i32_u": 0xad,
+    "i32.extend8_s": 0xc0, "i32.extend16_s": 0xc1, "i64.extend8_s": 0xc2,
+    "i64.extend16_s": 0xc3, "i64.extend32_s": 0xc4,
+}
+for prefix, base in [("i32", 0x45), ("i64", 0x50)]:
+    for i, op in enumerate(["eqz", "eq", "ne", "lt_s", "lt_u", "gt_s", "gt_u",
+                            "le_s", "le_u", "ge_s", "ge_u"]):
+        SIMPLE_OPS[f"{prefix}.{op}"] = base + i
+for prefix, base in [("i32", 0x67), ("i64", 0x79)]:
+    for i, op in enumerate(["clz", "ctz", "popcnt", "add", "sub", "mul", "div_s", "div_u",
+                            "rem_s", "rem_u", "and", "or", "xor", "shl", "shr_s", "shr_u",
+                            "rotl", "rotr"]):
+        SIMPLE_OPS[f"{prefix}.{op}"] = base + i
+
+# opcode and natural alignment (log 2) of memory instructions
+MEMORY_OPS: Dict[str, Tuple[int, int]] = {
+    "i32.load": (0x28, 2), "i64.load": (0x29, 3),
+    "i32.load8_s": (0x2c, 0), "i32.load8_u": (0x2d, 0),
+    "i32.load16_s": (0x2e, 1), "i32.load16_u": (0x2f, 1),
+    "i64.load8_s": (0x30, 0), "i64.load8_u": (0x31, 0),
+    "i64.load16_s": (0x32, 1), "i64.load16_u": (0x33, 1),
+    "i64.load32_s": (0x34, 2), "i64.load32_u": (0x35, 2),
+    "i32.store": (0x36, 2), "i64.store": (0x37, 3),
+    "i32.store8": (0x3a, 0), "i32.store16": (0x3b, 1),
+    "i64.store8": (0x3c, 0), "i64.store16": (0x3d, 1), "i64.store32": (0x3e, 2),
+}
+
+# bulk memory instructions, prefixed by 0xfc
+BULK_OPS: Dict[str, bytes] = {
+    "memory.copy": bytes([0xfc, 0x0a, 0x00, 0x00]),
+    "memory.fill": bytes([0xfc, 0x0b, 0x00]),
+}
+
+TOKEN_RE = re.compile(
+    r'\s+|;;[^\n]*|\(;.*?;\)|(\()|(\))|("(?:[^"\\]|\\.)*")|([^\s()";]+)', re.S)
+
+STRING_ESCAPES = {"n": 0x0a, "t": 0x09, "r": 0x0d,
+                  "\\": 0x5c, "'": 0x27, "\"": 0x22}
+
+# a run of hex escapes, or a single character escape
+ESCAPE_RE = re.compile(r'((?:\\[0-9a-fA-F]{2})+)|\\(.)', re.S)
+
+# characters that need the full tokenizer, text without them is split on whitespace and parentheses
+SPECIAL_CHARS = re.compile(r'[";]')
+
+# tokens of multi-line chunks, such as the stdlib, which are the same for every module
+TOKEN_CACHE: Dict[str, Sequence[Token]] = {}
+TOKEN_CACHE_SIZE = 16
+
+
+def uleb(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7f
+        n >>= 7
+        if n == 0:
+            out.append(b)
+            return bytes(out)
+        out.append(b | 0x80)
+
+
+def sleb(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7f
+        n >>= 7
+        if (n == 0 and b & 0x40 == 0) or (n == -1 and b & 0x40 != 0):
+            out.append(b)
+            return bytes(out)
+        out.append(b | 0x80)
+
+
+def vec(items: List[bytes]) -> bytes:
+    return uleb(len(items)) + b"".join(items)
+
+
+def name(s: str) -> bytes:
+    data = s.encode("utf-8")
+    return uleb(len(data)) + data
+
+
+def parseInt(s: str, bits: int) -> int:
+    # accept signed and unsigned literals, normalized to signed
+    n = int(s.replace("_", ""), 0)
+    if n >= 1 << (bits - 1):
+        n -= 1 << bits
+    if n < -(1 << (bits - 1)) or n >= 1 << (bits - 1):
+        raise Exception(f"WASM integer literal out of range: {s}")
+    return n
+
+
+def decodeString(s: str) -> bytes:
+    # runs of hex escapes, as in data segments, are decoded at once
+    body = s[1:-1]
+    out = bytearray()
+    pos = 0
+    for m in ESCAPE_RE.finditer(body):
+        out += body[pos:m.start()].encode("utf-8")
+        if m.group(1):
+            out += bytes.fromhex(m.group(1).replace("\\", ""))
+        else:
+            out.append(STRING_ESCAPES[m.group(2)])
+        pos = m.end()
+    out += body[pos:].encode("utf-8")
+    return bytes(out)
+
+
+def tokenize(text: str) -> Sequence[Token]:
+    if SPECIAL_CHARS.search(text) is None:
+        return text.replace("(", " ( ").replace(")", " ) ").split()
+    tokens: List[Token] = []
+    pos = 0
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if m is None:
+            raise Exception(f"Invalid WAT at offset {pos}")
+        pos = m.end()
+        if m.group(1):
+            tokens.append("(")
+        elif m.group(2):
+            tokens.append(")")
+        elif m.group(3):
+            tokens.append(decodeString(m.group(3)))
+        elif m.group(4):
+            tokens.append(m.group(4))
+    return tokens
+
+
+def lineTokens(line: str) -> Sequence[Token]:
+    if "\n" not in line:
+        return tokenize(line)
+    tokens = TOKEN_CACHE.get(line)
+    if tokens is None:
+        if len(TOKEN_CACHE) >= TOKEN_CACHE_SIZE:
+            TOKEN_CACHE.clear()
+        tokens = TOKEN_CACHE[line] = tokenize(line)
+    return tokens
+
+
+def addTokens(stack: List[List[SExpr]], tokens: Sequence[Token]):
+    # add the tokens to the innermost open list of the stack
+    top = stack[-1]
+    for token in tokens:
+        if token == "(":
+            top = []
+            stack.append(top)
+        elif token == ")":
+            if len(stack) == 1:
+                raise Exception("Unbalanced parentheses in WAT")
+            done = stack.pop()
+            top = stack[-1]
+            top.append(done)
+        else:
+            top.append(token)
+
+
+def addBuilder(stack: List[List[SExpr]], builder: Builder):
+    for line in builder.lines:
+        if isinstance(line, Builder):
+            addBuilder(stack, line)
+        else:
+            addTokens(stack, lineTokens(line))
+
+
+def parseBuilder(builder: Builder) -> List[SExpr]:
+    stack: List[List[SExpr]] = [[]]
+    addBuilder(stack, builder)
+    if len(stack) != 1:
+        raise Exception("Unbalanced parentheses in WAT")
+    return stack[0]
+
+
+def parse(wat: str) -> List[SExpr]:
+    stack: List[List[SExpr]] = [[]]
+    addTokens(stack, tokenize(wat))
+    if len(stack) != 1:
+        raise Exception("Unbalanced parentheses in WAT")
+    return stack[0]
+
+
+def isField(expr: SExpr, *heads: str) -> bool:
+    return isinstance(expr, list) and len(expr) > 0 and expr[0] in heads
+
+
+def isId(expr: SExpr) -> bool:
+    return isinstance(expr, str) and expr.startswith("$")
+
+
+class WasmFunc:
+    def __init__(self, name: Optional[str], typeIdx: int, params: Params, body: List[SExpr]):
+        self.name = name
+        self.typeIdx = typeIdx
+        self.params = params
+        self.body = body
+
+
+class WasmGlobal:
+    def __init__(self, globalType: SExpr, init: SExpr):
+        self.globalType = globalType
+        self.init = init
+
+
+class WasmExport:
+    # ref is a name or index in the index space of the kind,
+    # or the position of a function defined in this module for inline exports
+    def __init__(self, exportName: bytes, kind: str, ref: Union[str, int]):
+        self.exportName = exportName
+        self.kind = kind
+        self.ref = ref
+
+
+class WasmSegment:
+    # an active elem or data segment, items are function references or string literals
+    def __init__(self, offset: SExpr, items: List[SExpr]):
+        self.offset = offset
+        self.items = items
+
+
+class WasmAssembler:
+    types: List[Tuple[Tuple[str, ...], Tuple[str, ...]]]
+    typeNames: Dict[str, int]
+    # name -> index, for each index space
+    funcNames: Dict[str, int]
+    globalNames: Dict[str, int]
+    # encoded section entries
+    imports: List[bytes]
+    funcs: List[WasmFunc]
+    tables: List[bytes]
+    memories: List[bytes]
+    globals: List[WasmGlobal]
+    exports: List[WasmExport]
+    elems: List[WasmSegment]
+    datas: List[WasmSegment]
+    start: Optional[SExpr]
+
+    def __init__(self):
+        self.types = []
+        self.typeNames = {}
+        self.funcNames = {}
+        self.globalNames = {}
+        self.imports = []
+        self.funcs = []
+        self.tables = []
+        self.memories = []
+        self.globals = []
+        self.exports = []
+        self.elems = []
+        self.datas = []
+        self.start = None
+        self.numImportedFuncs = 0
+        self.numImportedGlobals = 0
+
+    def assemble(self, exprs: List[SExpr]) -> bytes:
+        if len(exprs) != 1 or not isField(exprs[0], "module"):
+            raise Exception("Expected a single WAT module")
+        fields = [f for f in cast_list(exprs[0])[1:] if not isId(f)]
+        for f in fields:
+            if isField(f, "type"):
+                self.typeField(cast_list(f))
+        for f in fields:
+            if isField(f, "import"):
+                self.importField(cast_list(f))
+            elif isField(f, "memory", "table") and any(isField(x, "import") for x in cast_list(f)):
+                self.inlineImportField(cast_list(f))
+        for f in fields:
+            self.moduleField(cast_list(f))
+        return self.encode()
+
+    # type uses and signatures
+
+    def typeIndex(self, params: Tuple[str, ...], results: Tuple[str, ...]) -> int:
+        sig = (params, results)
+        if sig not in self.types:
+            self.types.append(sig)
+        return self.types.index(sig)
+
+    def typeUse(self, items: List[SExpr], idx: int) -> Tuple[int, Params, List[str], int]:
+        # parse (type $t)? (param ...)* (result ...)*, returns type index, params, results, next index
+        explicit = None
+        params: Params = []
+        results: List[str] = []
+        if idx < len(items) and isField(items[idx], "type"):
+            explicit = self.lookup(self.typeNames, cast_list(items[idx])[1])
+            idx += 1
+        while idx < len(items) and isField(items[idx], "param"):
+            params += self.declarations(cast_list(items[idx]))
+            idx += 1
+        while idx < len(items) and isField(items[idx], "result"):
+            results += [cast_str(t) for t in cast_list(items[idx])[1:]]
+            idx += 1
+        if explicit is not None:
+            if len(params) == 0 and len(results) == 0:
+                params = [(None, t) for t in self.types[explicit][0]]
+            return explicit, params, list(self.types[explicit][1]), idx
+        return self.typeIndex(tuple(t for _, t in params), tuple(results)), params, results, idx
+
+    def declarations(self, field: List[SExpr]) -> Params:
+        # (param $x i32) or (param i32 i64), same for locals
+        if len(field) > 1 and isId(field[1]):
+            return [(cast_str(field[1]), cast_str(field[2]))]
+        return [(None, cast_str(t)) for t in field[1:]]
+
+    def lookup(self, names: Dict[str, int], ref: SExpr) -> int:
+        ref = cast_str(ref)
+        if isId(ref):
+            if ref not in names:
+                raise Exception(f"Unknown WASM identifier: {ref}")
+            return names[ref]
+        return int(ref, 0)
+
+    def limits(self, items: List[SExpr]) -> bytes:
+        nums = [int(cast_str(x), 0) for x in items
+                if isinstance(x, str) and x[0].isdigit()]
+        if len(nums) == 1:
+            return b"\x00" + uleb(nums[0])
+        return b"\x01" + uleb(nums[0]) + uleb(nums[1])
+
+    def globalType(self, t: SExpr) -> bytes:
+        if isField(t, "mut"):
+            return bytes([VALTYPES[cast_str(cast_list(t)[1])], 0x01])
+        return bytes([VALTYPES[cast_str(t)], 0x00])
+
+    # module fields
+
+    def typeField(self, field: List[SExpr]):
+        idx = 1
+        typeName = None
+        if isId(field[idx]):
+            typeName = cast_str(field[idx])
+            idx += 1
+        func = cast_list(field[idx])
+        params = []
+        results = []
+        for item in func[1:]:
+            if isField(item, "param"):
+                params += [t for _, t in self.declarations(cast_list(item))]
+            elif isField(item, "result"):
+                results += [cast_str(t) for t in cast_list(item)[1:]]
+        sig = (tuple(params), tuple(results))
+        # explicit types are never deduplicated, so their indices are stable
+        self.types.append(sig)
+        if typeName is not None:
+            self.typeNames[typeName] = len(self.types) - 1
+
+    def importField(self, field: List[SExpr]):
+        module, field_name, desc = cast_bytes(
+            field[1]), cast_bytes(field[2]), cast_list(field[3])
+        header = uleb(len(module)) + module + \
+            uleb(len(field_name)) + field_name
+        kind = desc[0]
+        idx = 1
+        descName = None
+        if idx < len(desc) and isId(desc[idx]):
+            descName = cast_str(desc[idx])
+            idx += 1
+        if kind == "func":
+            typeIdx, _, _, _ = self.typeUse(desc, idx)
+            if descName is not None:
+                self.funcNames[descName] = self.numImportedFuncs
+            self.numImportedFuncs += 1
+            self.imports.append(header + b"\x00" + uleb(typeIdx))
+        elif kind == "table":
+            self.imports.append(header + b"\x01" + bytes([VALTYPES[cast_str(desc[-1])]]) +
+                                self.limits(desc[idx:-1]))
+        elif kind == "memory":
+            self.imports.append(header + b"\x02" + self.limits(desc[idx:]))
+        elif kind == "global":
+            if descName is not None:
+                self.globalNames[descName] = self.numImportedGlobals
+            self.numImportedGlobals += 1
+            self.imports.append(
+                header + b"\x03" + self.globalType(desc[idx]))
+        else:
+            raise Exception(f"Unsupported WASM import: {kind}")
+
+    def inlineImportField(self, field: List[SExpr]):
+        # (memory (import "js" "mem") 1) is sugar for an import
+        imp = [x for x in field if isField(x, "import")][0]
+        desc: List[SExpr] = [field[0]]
+        desc += [x for x in field[1:] if not isField(x, "import") and not isId(x)]
+        self.importField(cast_list(imp) + [desc])
+
+    def moduleField(self, field: List[SExpr]):
+        kind = field[0]
+        if kind in {"type", "import"}:
+            return
+        elif kind in {"memory", "table"}:
+            if any(isField(x, "import") for x in field):
+                return
+            rest = [x for x in field[1:] if not isId(x)]
+            if kind == "memory":
+                self.memories.append(self.limits(rest))
+            else:
+                self.tables.append(bytes([VALTYPES[cast_str(rest[-1])]]) +
+                                   self.limits(rest[:-1]))
+        elif kind == "func":
+            idx = 1
+            funcName = None
+            if isId(field[idx]):
+                funcName = cast_str(field[idx])
+                idx += 1
+            while idx < len(field) and isField(field[idx], "export"):
+                self.exports.append(WasmExport(
+                    cast_bytes(cast_list(field[idx])[1]), "func", len(self.funcs)))
+                idx += 1
+            typeIdx, params, _, idx = self.typeUse(field, idx)
+            if funcName is not None:
+                self.funcNames[funcName] = self.numImportedFuncs + \
+                    len(self.funcs)
+            self.funcs.append(WasmFunc(funcName, typeIdx,
+                                       params, field[idx:]))
+        elif kind == "global":
+            idx = 1
+            if isId(field[1]):
+                self.globalNames[cast_str(field[1])] = self.numImportedGlobals + \
+                    len(self.globals)
+                idx = 2
+            self.globals.append(WasmGlobal(field[idx], field[idx + 1]))
+        elif kind == "export":
+            desc = cast_list(field[2])
+            self.exports.append(WasmExport(
+                cast_bytes(field[1]), cast_str(desc[0]), cast_str(desc[1])))
+        elif kind == "elem":
+            self.elems.append(self.segment([x for x in field[1:] if x != "func"]))
+        elif kind == "data":
+            self.datas.append(self.segment([x for x in field[1:] if not isId(x)]))
+        elif kind == "start":
+            self.start = field[1]
+        else:
+            raise Exception(f"Unsupported WASM module field: {kind}")
+
+    def segment(self, items: List[SExpr]) -> WasmSegment:
+        # (offset expr) or a folded expr, followed by the contents
+        offset = items[0]
+        if isField(offset, "offset"):
+            offset = cast_list(offset)[1]
+        return WasmSegment(offset, items[1:])
+
+    # instructions
+
+    def constExpr(self, expr: SExpr) -> bytes:
+        code = FuncCompiler(self, {}).compileFolded(cast_list(expr))
+        return code + b"\x0b"
+
+    def encode(self) -> bytes:
+        sections: List[Tuple[int, List[bytes]]] = []
+        code = []
+        for f in self.funcs:
+            code.append(FuncCompiler(self, {}).compileFunc(f))
+        globals = [self.globalType(g.globalType) + self.constExpr(g.init)
+                   for g in self.globals]
+        kinds = {"func": 0x00, "table": 0x01, "memory": 0x02, "global": 0x03}
+        exports = []
+        for e in self.exports:
+            if isinstance(e.ref, int):
+                idx = self.numImportedFuncs + e.ref
+            elif e.kind == "func":
+                idx = self.lookup(self.funcNames, e.ref)
+            elif e.kind == "global":
+                idx = self.lookup(self.globalNames, e.ref)
+            else:
+                idx = int(e.ref, 0)
+            exports.append(name(e.exportName.decode("utf-8")) +
+                           bytes([kinds[e.kind]]) + uleb(idx))
+        elems = []
+        for e in self.elems:
+            funcs = [uleb(self.lookup(self.funcNames, f)) for f in e.items]
+            elems.append(b"\x00" + self.constExpr(e.offset) + vec(funcs))
+        datas = []
+        for d in self.datas:
+            contents = b"".join(cast_bytes(x) for x in d.items)
+            datas.append(b"\x00" + self.constExpr(d.offset) +
+                         uleb(len(contents)) + contents)
+        types = [b"\x60" + vec([bytes([VALTYPES[t]]) for t in params]) +
+                 vec([bytes([VALTYPES[t]]) for t in results])
+                 for params, results in self.types]
+
+        sections.append((1, types))
+        sections.append((2, self.imports))
+        sections.append((3, [uleb(f.typeIdx) for f in self.funcs]))
+        sections.append((4, self.tables))
+        sections.append((5, self.memories))
+        sections.append((6, globals))
+        sections.append((7, exports))
+        out = bytearray(b"\x00asm\x01\x00\x00\x00")
+        for sid, entries in sections:
+            if len(entries) > 0:
+                out += self.section(sid, vec(entries))
+        if self.start is not None:
+            out += self.section(8,
+                                uleb(self.lookup(self.funcNames, self.start)))
+        for sid, entries in [(9, elems), (10, code), (11, datas)]:
+            if len(entries) > 0:
+                out += self.section(sid, vec(entries))
+        return bytes(out)
+
+    def section(self, sid: int, contents: bytes) -> bytes:
+        return bytes([sid]) + uleb(len(contents)) + contents
+
+
+class FuncCompiler:
+    # compiles the body of a single function
+    def __init__(self, asm: WasmAssembler, locals: Dict[str, int]):
+        self.asm = asm
+        self.locals = locals
+        # names of enclosing blocks, innermost last
+        self.labels: List[Optional[str]] = []
+
+    def compileFunc(self, func: WasmFunc) -> bytes:
+        localTypes: List[str] = []
+        for idx, (n, _) in enumerate(func.params):
+            if n is not None:
+                self.locals[n] = idx
+        body = func.body
+        i = 0
+        while i < len(body) and isField(body[i], "local"):
+            for n, t in self.asm.declarations(cast_list(body[i])):
+                if n is not None:
+                    self.locals[n] = len(func.params) + len(localTypes)
+                localTypes.append(t)
+            i += 1
+        # group consecutive locals of the same type
+        groups: List[bytes] = []
+        j = 0
+        while j < len(localTypes):
+            k = j
+            while k < len(localTypes) and localTypes[k] == localTypes[j]:
+                k += 1
+            groups.append(uleb(k - j) + bytes([VALTYPES[localTypes[j]]]))
+            j = k
+        code = vec(groups) + self.compileSeq(body[i:]) + b"\x0b"
+        return uleb(len(code)) + code
+
+    def compileSeq(self, items: List[SExpr]) -> bytes:
+        out = bytearray()
+        i = 0
+        while i < len(items):
+            item = items[i]
+            if isinstance(item, list):
+                out += self.compileFolded(item)
+                i += 1
+            else:
+                code, i = self.compilePlain(items, i)
+                out += code
+        return bytes(out)
+
+    def blockType(self, items: List[SExpr], idx: int) -> Tuple[bytes, int]:
+        if idx < len(items) and isField(items[idx], "type", "param", "result"):
+            typeIdx, params, results, idx = self.asm.typeUse(items, idx)
+            if len(params) == 0 and len(results) == 1:
+                return bytes([VALTYPES[results[0]]]), idx
+            return sleb(typeIdx), idx
+        return b"\x40", idx
+
+    def label(self, items: List[SExpr], idx: int) -> Tuple[Optional[str], int]:
+        if idx < len(items) and isId(items[idx]):
+            return cast_str(items[idx]), idx + 1
+        return None, idx
+
+    def compileFolded(self, expr: List[SExpr]) -> bytes:
+        op = cast_str(expr[0])
+        if op in {"block", "loop"}:
+            label, idx = self.label(expr, 1)
+            bt, idx = self.blockType(expr, idx)
+            self.labels.append(label)
+            body = self.compileSeq(expr[idx:])
+            self.labels.pop()
+            return bytes([0x02 if op == "block" else 0x03]) + bt + body + b"\x0b"
+        elif op == "if":
+            label, idx = self.label(expr, 1)
+            bt, idx = self.blockType(expr, idx)
+            cond = bytearray()
+            while idx < len(expr) and not isField(expr[idx], "then"):
+                cond += self.compileFolded(cast_list(expr[idx]))
+                idx += 1
+            self.labels.append(label)
+            out = bytes(cond) + b"\x04" + bt + \
+                self.compileSeq(cast_list(expr[idx])[1:])
+            if idx + 1 < len(expr) and isField(expr[idx + 1], "else"):
+                out += b"\x05" + self.compileSeq(cast_list(expr[idx + 1])[1:])
+            self.labels.pop()
+            return out + b"\x0b"
+        # plain folded instruction, operands are evaluated first
+        code, idx = self.compilePlain(expr, 0)
+        return self.compileSeq(expr[idx:]) + code
+
+    def compilePlain(self, items: List[SExpr], idx: int) -> Tuple[bytes, int]:
+        # compile a flat instruction and its immediates, returns the code and next index
+        op = cast_str(items[idx])
+        idx += 1
+        if op in SIMPLE_OPS:
+            return bytes([SIMPLE_OPS[op]]), idx
+        elif op in BULK_OPS:
+            return BULK_OPS[op], idx
+        elif op in MEMORY_OPS:
+            opcode, align = MEMORY_OPS[op]
+            offset = 0
+            while idx < len(items) and isinstance(items[idx], str) and \
+                    cast_str(items[idx]).startswith(("offset=", "align=")):
+                key, value = cast_str(items[idx]).split("=")
+                if key == "offset":
+                    offset = int(value, 0)
+                else:
+                    align = int(value, 0).bit_length() - 1
+                idx += 1
+            return bytes([opcode]) + uleb(align) + uleb(offset), idx
+        elif op in {"memory.size", "memory.grow"}:
+            return bytes([0x3f if op == "memory.size" else 0x40, 0x00]), idx
+        elif op == "i32.const":
+            return b"\x41" + sleb(parseInt(cast_str(items[idx]), 32)), idx + 1
+        elif op == "i64.const":
+            return b"\x42" + sleb(parseInt(cast_str(items[idx]), 64)), idx + 1
+        elif op in {"local.get", "local.set", "local.tee"}:
+            opcode = {"local.get": 0x20, "local.set": 0x21, "local.tee": 0x22}[op]
+            return bytes([opcode]) + uleb(self.asm.lookup(self.locals, items[idx])), idx + 1
+        elif op in {"global.get", "global.set"}:
+            opcode = 0x23 if op == "global.get" else 0x24
+            return bytes([opcode]) + uleb(self.asm.lookup(self.asm.globalNames, items[idx])), idx + 1
+        elif op == "call":
+            return b"\x10" + uleb(self.asm.lookup(self.asm.funcNames, items[idx])), idx + 1
+        elif op == "call_indirect":
+            table = 0
+            if idx < len(items) and isinstance(items[idx], str) and cast_str(items[idx])[0].isdigit():
+                table = int(cast_str(items[idx]), 0)
+                idx += 1
+            typeIdx, _, _, idx = self.asm.typeUse(items, idx)
+            return b"\x11" + uleb(typeIdx) + uleb(table), idx
+        elif op in {"br", "br_if"}:
+            return bytes([0x0c if op == "br" else 0x0d]) + uleb(self.depth(items[idx])), idx + 1
+        elif op == "br_table":
+            targets = []
+            while idx < len(items) and isinstance(items[idx], str) and \
+                    (isId(items[idx]) or cast_str(items[idx])[0].isdigit()):
+                targets.append(self.depth(items[idx]))
+                idx += 1
+            return b"\x0e" + vec([uleb(t) for t in targets[:-1]]) + uleb(targets[-1]), idx
+        elif op in {"block", "loop", "if"}:
+            label, idx = self.label(items, idx)
+            bt, idx = self.blockType(items, idx)
+            self.labels.append(label)
+            return bytes([{"block": 0x02, "loop": 0x03, "if": 0x04}[op]]) + bt, idx
+        elif op == "else":
+            _, idx = self.label(items, idx)
+            return b"\x05", idx
+        elif op == "end":
+            self.labels.pop()
+            _, idx = self.label(items, idx)
+            return b"\x0b", idx
+        raise Exception(f"Unsupported WASM instruction: {op}")
+
+    def depth(self, ref: SExpr) -> int:
+        ref = cast_str(ref)
+        if isId(ref):
+            for depth, label in enumerate(reversed(self.labels)):
+                if label == ref:
+                    return depth
+            raise Exception(f"Unknown WASM label: {ref}")
+        return int(ref, 0)
+
+
+def cast_list(expr: SExpr) -> List[SExpr]:
+    assert isinstance(expr, list)
+    return expr
+
+
+def cast_str(expr: SExpr) -> str:
+    if not isinstance(expr, str):
+        raise Exception(f"Expected a WAT atom, got {expr}")
+    return expr
+
+
+def cast_bytes(expr: SExpr) -> bytes:
+    if not isinstance(expr, bytes):
+        raise Exception(f"Expected a WAT string, got {expr}")
+    return expr
+
+
+def assemble(wat: str) -> bytes:
+    # encode a WAT module as a WebAssembly binary
+    return WasmAssembler().assemble(parse(wat))
+
+
+def assembleBuilder(builder: Builder) -> bytes:
+    # encode the module in a WasmBuilder, reading its lines directly
+    return WasmAssembler().assemble(parseBuilder(builder))
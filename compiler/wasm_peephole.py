@@ -0,0 +1,297 @@
+import re
+from typing import Callable, Dict, List, Optional, Set, Tuple, cast
+
+from .builder import Builder
+
+# a rule rewrites a run of straight-line instructions, returning the new run and the number of rewrites
+Rule = Callable[[List[str]], Tuple[List[str], int]]
+
+# instructions that push a value without side effects
+PURE_PUSH = {"i32.const", "i64.const", "local.get", "global.get"}
+
+MEMORY_ACCESS = re.compile(r"^(i32|i64)\.(load|store)\w*( offset=(\d+))?$")
+
+
+def wrapI32(value: int) -> int:
+    # wrap to a signed 32 bit integer
+    return ((value + (1 << 31)) % (1 << 32)) - (1 << 31)
+
+
+def constValue(instr: str) -> Optional[int]:
+    parts = instr.split()
+    if len(parts) != 2 or parts[0] != "i32.const":
+        return None
+    try:
+        return int(parts[1])
+    except ValueError:
+        return None
+
+
+def divS(a: int, b: int) -> int:
+    # division rounding towards zero
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def remS(a: int, b: int) -> int:
+    # remainder with the sign of the dividend
+    return a - divS(a, b) * b
+
+
+# binary operators that can be evaluated at compile time, None if the operation would trap
+BINARY_OPS: Dict[str, Callable[[int, int], Optional[int]]] = {
+    "i32.add": lambda a, b: a + b,
+    "i32.sub": lambda a, b: a - b,
+    "i32.mul": lambda a, b: a * b,
+    "i32.and": lambda a, b: a & b,
+    "i32.or": lambda a, b: a | b,
+    "i32.xor": lambda a, b: a ^ b,
+    "i32.shl": lambda a, b: a << (b % 32),
+    "i32.shr_s": lambda a, b: a >> (b % 32),
+    "i32.eq": lambda a, b: int(a == b),
+    "i32.ne": lambda a, b: int(a != b),
+    "i32.lt_s": lambda a, b: int(a < b),
+    "i32.gt_s": lambda a, b: int(a > b),
+    "i32.le_s": lambda a, b: int(a <= b),
+    "i32.ge_s": lambda a, b: int(a >= b),
+    "i32.div_s": lambda a, b: None if b == 0 or (a == -(1 << 31) and b == -1) else divS(a, b),
+    "i32.rem_s": lambda a, b: None if b == 0 else remS(a, b),
+}
+
+# operators that leave the other operand unchanged when the constant is on the right
+IDENTITIES: Dict[str, int] = {
+    "i32.add": 0,
+    "i32.sub": 0,
+    "i32.or": 0,
+    "i32.xor": 0,
+    "i32.shl": 0,
+    "i32.shr_s": 0,
+    "i32.mul": 1,
+    "i32.div_s": 1,
+}
+
+
+def windowRule(size: int, rewrite: Callable[[List[str]], Optional[List[str]]]) -> Rule:
+    # apply rewrite to each window of size instructions, returns None if the window does not match
+    # rewrites must shrink the window, so the rule terminates
+    def rule(instrs: List[str]) -> Tuple[List[str], int]:
+        out: List[str] = []
+        count = 0
+        for instr in instrs:
+            out.append(instr)
+            # a rewrite can expose a new match ending at the same instruction
+            while len(out) >= size:
+                replacement = rewrite(out[-size:])
+                if replacement is None:
+                    break
+                del out[-size:]
+                out += replacement
+                count += 1
+        return out, count
+    return rule
+
+
+def selfCopy(w: List[str]) -> Optional[List[str]]:
+    # local.get $x, local.set $x
+    a, b = w[0].split(), w[1].split()
+    if a[0] == "local.get" and b[0] == "local.set" and a[1] == b[1]:
+        return []
+    return None
+
+
+def setGet(w: List[str]) -> Optional[List[str]]:
+    # local.set $x, local.get $x
+    a, b = w[0].split(), w[1].split()
+    if a[0] == "local.set" and b[0] == "local.get" and a[1] == b[1]:
+        return [f"local.tee {a[1]}"]
+    return None
+
+
+def deadDrop(w: List[str]) -> Optional[List[str]]:
+    # a value without side effects that is immediately dropped
+    if w[1] != "drop":
+        return None
+    op = w[0].split()[0]
+    if op in PURE_PUSH:
+        return []
+    if op == "local.tee":
+        return ["local.set " + w[0].split()[1]]
+    return None
+
+
+def foldUnary(w: List[str]) -> Optional[List[str]]:
+    a = constValue(w[0])
+    if a is None:
+        return None
+    if w[1] == "i32.eqz":
+        return [f"i32.const {int(a == 0)}"]
+    if IDENTITIES.get(w[1]) == a:
+        return []
+    return None
+
+
+def foldBinary(w: List[str]) -> Optional[List[str]]:
+    a, b = constValue(w[0]), constValue(w[1])
+    if a is None or b is None or w[2] not in BINARY_OPS:
+        return None
+    value = BINARY_OPS[w[2]](a, b)
+    if value is None:
+        return None
+    return [f"i32.const {wrapI32(value)}"]
+
+
+def foldAdds(w: List[str]) -> Optional[List[str]]:
+    # i32.const a, i32.add, i32.const b, i32.add
+    a, b = constValue(w[0]), constValue(w[2])
+    if a is None or b is None or w[1] != "i32.add" or w[3] != "i32.add":
+        return None
+    return [f"i32.const {wrapI32(a + b)}", "i32.add"]
+
+
+def addressOffset(w: List[str]) -> Optional[List[str]]:
+    # move a constant added to an address into the offset immediate of a load or store
+    # the address is a heap pointer, so the addition never wraps
+    k = constValue(w[0])
+    if k is None or k < 0 or w[1] != "i32.add":
+        return None
+    value: List[str] = []
+    access = w[2]
+    if len(w) == 4:
+        # a store of a value pushed without side effects
+        if w[2].split()[0] not in PURE_PUSH:
+            return None
+        value = [w[2]]
+        access = w[3]
+    match = MEMORY_ACCESS.match(access)
+    if match is None or (match.group(2) == "store") != (len(w) == 4):
+        return None
+    offset = k + int(match.group(4) or 0)
+    if offset >= 1 << 32:
+        return None
+    return value + [f"{match.group(1)}.{access.split()[0].split('.')[1]} offset={offset}"]
+
+
+def concat(*rules: Rule) -> Rule:
+    def rule(instrs: List[str]) -> Tuple[List[str], int]:
+        count = 0
+        for r in rules:
+            instrs, n = r(instrs)
+            count += n
+        return instrs, count
+    return rule
+
+
+def nullChecks(instrs: List[str]) -> Tuple[List[str], int]:
+    # remove calls to $nullthrow on values that are known to be non-null
+    # and replace $len, which checks for null, with a plain load
+    out: List[str] = []
+    count = 0
+    nonNull: Set[str] = set()  # locals holding non-null values
+    topNonNull = False
+    topLocal: Optional[str] = None  # local holding the value on top of the stack
+    for instr in instrs:
+        parts = instr.split()
+        if instr == "call $nullthrow":
+            if topNonNull:
+                count += 1
+                continue
+            if topLocal is not None:
+                nonNull.add(topLocal)
+            topNonNull = True
+            out.append(instr)
+            continue
+        if instr == "call $len" and topNonNull:
+            count += 1
+            out.append("i32.load")
+        else:
+            out.append(instr)
+        if parts[0] == "local.get":
+            topLocal = parts[1]
+            topNonNull = topLocal in nonNull
+        elif parts[0] in {"local.set", "local.tee"}:
+            if topNonNull:
+                nonNull.add(parts[1])
+            else:
+                nonNull.discard(parts[1])
+            topLocal = parts[1] if parts[0] == "local.tee" else None
+            topNonNull = topNonNull and parts[0] == "local.tee"
+        else:
+            value = constValue(instr)
+            topNonNull = (value is not None and value != 0) or instr == "call $alloc"
+            topLocal = None
+    return out, count
+
+
+# named rules that can be used to build a pipeline
+RULES: Dict[str, Rule] = {
+    "self-copy": windowRule(2, selfCopy),
+    "set-get": windowRule(2, setGet),
+    "const-fold": concat(windowRule(2, foldUnary), windowRule(3, foldBinary), windowRule(4, foldAdds)),
+    "address-offset": concat(windowRule(3, addressOffset), windowRule(4, addressOffset)),
+    "dead-drop": windowRule(2, deadDrop),
+    "null-check": nullChecks,
+}
+
+
+def isInstr(line: object) -> bool:
+    # plain instructions, as opposed to structure, declarations, comments and the stdlib
+    if not isinstance(line, str) or "\n" in line:
+        return False
+    line = line.strip()
+    return len(line) > 0 and not line.startswith(("(", ")", ";;"))
+
+
+def countInstrs(builder: Builder) -> int:
+    # number of instructions that the peephole optimizer can rewrite
+    return sum(countInstrs(l) if isinstance(l, Builder) else int(isInstr(l))
+               for l in builder.lines)
+
+
+class WasmPeephole:
+    # rewrites runs of straight-line instructions in a WasmBuilder in place
+    # control flow, declarations and comments end a run
+    rules: List[str]
+    # rule -> number of rewrites and number of instructions removed
+    rewrites: Dict[str, int]
+    removed: Dict[str, int]
+
+    def __init__(self, rules: Optional[List[str]] = None):
+        self.rules = list(RULES) if rules is None else rules
+        for r in self.rules:
+            if r not in RULES:
+                raise Exception(f"Unknown WASM peephole rule: {r}")
+        self.rewrites = {r: 0 for r in self.rules}
+        self.removed = {r: 0 for r in self.rules}
+
+    def optimize(self, builder: Builder):
+        lines: List = []
+        run: List[str] = []
+        for l in builder.lines:
+            if isInstr(l):
+                run.append(cast(str, l))
+                continue
+            lines += self.optimizeRun(run)
+            run = []
+            if isinstance(l, Builder):
+                self.optimize(l)
+            lines.append(l)
+        lines += self.optimizeRun(run)
+        builder.lines = lines
+
+    def optimizeRun(self, run: List[str]) -> List[str]:
+        if len(run) == 0:
+            return run
+        indent = run[0][:len(run[0]) - len(run[0].lstrip())]
+        instrs = [l.strip() for l in run]
+        # rules can enable each other, so repeat until nothing changes
+        changed = True
+        while changed:
+            changed = False
+            for r in self.rules:
+                before = len(instrs)
+                instrs, n = RULES[r](instrs)
+                if n > 0:
+                    changed = True
+                    self.rewrites[r] += n
+                    self.removed[r] += before - len(instrs)
+        return [indent + i for i in instrs]
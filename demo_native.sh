@@ -0,0 +1,7 @@
+# utility for compiling a Chocopy file to a native executable and running it
+base_name="$(basename $1 .py)"
+
+rm -f $base_name
+
+python3 main.py --mode native $1 .
+./$base_name
@@ -1,6 +1,15 @@
 import argparse
+import base64
+import contextlib
 import json
+import multiprocessing
+import os
+import socket
+import stat
+import sys
+import tempfile
 from test import run_all_tests
+from benchmark import run_all_benchmarks
 from compiler.compiler import Compiler
 from compiler.astnodes import Node
 
@@ -11,89 +20,89 @@ mode_help = (
     'python - output untyped Python 3 source code\n' +
     'hoist - output untyped Python 3 source code w/o nonlocals or nested function definitions\n' +
     'jvm - output JVM bytecode formatted for the Krakatau assembler\n' +
+    'jvm-class - output JVM .class files, without the Krakatau assembler\n' +
     'cil - output CIL bytecode formatted for the Mono ilasm assembler\n' +
     'wasm - output WASM in WAT format\n' +
-    'llvm - output LLVM IR\n'
+    'wasm-bin - output WASM in the binary .wasm format\n' +
+    'llvm - output LLVM IR\n' +
+    'llvm-obj - output a native object file compiled from LLVM IR\n' +
+    'native - output a native executable, linked with the system C compiler\n' +
+    'all - output python, jvm, cil, wasm and llvm from a single parse and typecheck\n'
 )
 
+modes = ["parse", "tc", "python", "jvm", "jvm-class", "hoist", "cil", "wasm",
+         "wasm-bin", "llvm", "llvm-obj", "native"]
 
-def out_msg(path, verbose):
-    if verbose:
-        print("Output to {}".format(path))
+# modes that can be emitted together from one parse and typecheck
+target_modes = [m for m in modes if m not in {"parse", "tc"}]
 
+all_targets = ["python", "jvm", "cil", "wasm", "llvm"]
 
-def main():
-    parser = argparse.ArgumentParser(description='Chocopy frontend')
-    parser.add_argument('--mode',
-                        dest='mode',
-                        choices=["parse", "tc", "python", "jvm",
-                                 "hoist", "cil", "wasm", "llvm"],
-                        default="python",
-                        help=mode_help)
-    parser.add_argument('--print', dest='should_print', action='store_true',
-                        help="output to stdout instead of file")
-    parser.add_argument('--test', dest='test', action='store_true',
-                        help="run all test cases")
-    parser.add_argument('--verbose', dest='verbose', action='store_true',
-                        help="verbose output")
-    parser.add_argument('infile', nargs='?', type=str, default=None)
-    parser.add_argument('outdir', nargs='?', type=str, default=None)
-    args = parser.parse_args()
+# the lowered program, set before forking workers that emit targets in parallel
+shared_program = None
 
-    if args.test:
-        run_all_tests()
-        return
+# options that compile requests to the server can override, with a check and a description of their values
+# bools are ints in Python, so ints are checked by their exact type
+server_options = {
+    "opt_level": (lambda v: type(v) is int and 0 <= v <= 3, "an integer from 0 to 3"),
+    "passes": (lambda v: isinstance(v, str), "a string"),
+    "alloc": (lambda v: v in ("gc", "arena"), "gc or arena"),
+    "bulk_memory": (lambda v: isinstance(v, bool), "a boolean"),
+    "peephole": (lambda v: isinstance(v, bool), "a boolean"),
+    "jobs": (lambda v: type(v) is int and v >= 1, "a positive integer"),
+}
 
-    infile = args.infile
-    outdir = args.outdir
-    if args.infile is None:
-        parser.print_help()
-        raise Exception("Error: must specify input file")
+# output files that the server returns base64 encoded, native executables have no suffix
+binary_suffixes = {".class", ".wasm", ".o", ""}
 
-    if args.infile[-3:] != ".py":
-        raise Exception("Error: input file must end with .py")
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
 
-    infile_name = infile[:-3].split("/")[-1]
 
-    if outdir is None:
-        outdir = "./"
-    elif outdir[-1] != "/":
-        outdir = outdir + "/"
+class RequestError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
 
-    outfile = None
-    if args.mode == "tc":
-        outfile = outdir + infile_name + ".ast.typed"
-    elif args.mode == "parse":
-        outfile = outdir + infile_name + ".ast"
-    elif args.mode in {"python", "hoist"}:
-        outfile = outdir + infile_name + ".out.py"
-    elif args.mode == "jvm":
-        outfile = outdir + infile_name + ".j"
-    elif args.mode == "llvm":
-        outfile = outdir + infile_name + ".ll"
-    elif args.mode == "cil":
-        outfile = outdir + infile_name + ".cil"
-    elif args.mode == "wasm":
-        outfile = outdir + infile_name + ".wat"
-    assert outfile is not None
 
-    compiler = Compiler()
-    astparser = compiler.parser
-    tc = compiler.typechecker
-    tree = compiler.parse(infile)
+def out_msg(path, verbose):
+    if verbose:
+        print("Output to {}".format(path))
+
+
+def output_file(mode, outdir, infile_name):
+    if mode == "tc":
+        return outdir + infile_name + ".ast.typed"
+    elif mode == "parse":
+        return outdir + infile_name + ".ast"
+    elif mode in {"python", "hoist"}:
+        return outdir + infile_name + ".out.py"
+    elif mode == "jvm":
+        return outdir + infile_name + ".j"
+    elif mode == "jvm-class":
+        return outdir + infile_name + ".class"
+    elif mode == "llvm":
+        return outdir + infile_name + ".ll"
+    elif mode == "llvm-obj":
+        return outdir + infile_name + ".o"
+    elif mode == "native":
+        return outdir + infile_name
+    elif mode == "cil":
+        return outdir + infile_name + ".cil"
+    elif mode == "wasm":
+        return outdir + infile_name + ".wat"
+    elif mode == "wasm-bin":
+        return outdir + infile_name + ".wasm"
+    raise Exception(f"Error: unknown mode {mode}")
 
-    if len(astparser.errors) > 0 or not isinstance(tree, Node):
-        for e in astparser.errors:
-            print(e)
-        raise Exception("Encountered parse errors. Exiting.")
-    elif args.mode != "parse":
-        compiler.typecheck(tree)
-        if len(tc.errors) > 0:
-            for e in tc.errors:
-                print(e)
-            raise Exception("Encountered typecheck errors. Exiting.")
 
-    if args.mode in {"parse", "tc"}:
+def write_output(compiler, tree, mode, args, infile_name, outdir):
+    outfile = output_file(mode, outdir, infile_name)
+    if mode in {"parse", "tc"}:
         ast_json = tree.toJSON(False)
         if args.should_print:
             print(json.dumps(ast_json, indent=2))
@@ -101,7 +110,7 @@ def main():
             with open(outfile, "w") as f:
                 out_msg(outfile, args.verbose)
                 json.dump(ast_json, f, indent=2)
-    elif args.mode == "python":
+    elif mode == "python":
         builder = compiler.emitPython(tree)
         if args.should_print:
             print(builder.emit())
@@ -109,8 +118,8 @@ def main():
             with open(outfile, "w") as f:
                 out_msg(outfile, args.verbose)
                 f.write(builder.emit())
-    elif args.mode == "hoist":
-        compiler.closurepass(tree)
+    elif mode == "hoist":
+        compiler.lower(tree)
         builder = compiler.emitPython(tree)
         if args.should_print:
             print(builder.emit())
@@ -118,7 +127,7 @@ def main():
             with open(outfile, "w") as f:
                 out_msg(outfile, args.verbose)
                 f.write(builder.emit())
-    elif args.mode == "jvm":
+    elif mode == "jvm":
         jvm_emitters = compiler.emitJVM(infile_name, tree)
         for cls in jvm_emitters:
             jvm_emitter = jvm_emitters[cls]
@@ -129,7 +138,14 @@ def main():
                 with open(fname, "w") as f:
                     out_msg(fname, args.verbose)
                     f.write(jvm_emitter.emit())
-    elif args.mode == "cil":
+    elif mode == "jvm-class":
+        classfiles = compiler.emitJVMClasses(infile_name, tree)
+        for cls in classfiles:
+            fname = outdir + cls + ".class"
+            with open(fname, "wb") as f:
+                out_msg(fname, args.verbose)
+                f.write(classfiles[cls])
+    elif mode == "cil":
         cil_emitter = compiler.emitCIL(infile_name, tree)
         if args.should_print:
             print(cil_emitter.emit())
@@ -137,22 +153,308 @@ def main():
             with open(outfile, "w") as f:
                 out_msg(outfile, args.verbose)
                 f.write(cil_emitter.emit())
-    elif args.mode == "wasm":
-        wat_emitter = compiler.emitWASM(infile_name, tree)
+    elif mode == "wasm":
+        wat_emitter = compiler.emitWASM(infile_name, tree, args.bulk_memory,
+                                       peephole=args.peephole)
         if args.should_print:
             print(wat_emitter.emit())
         else:
             with open(outfile, "w") as f:
                 out_msg(outfile, args.verbose)
                 f.write(wat_emitter.emit())
-    elif args.mode == "llvm":
-        llvm_module = compiler.emitLLVM(tree)
+    elif mode == "wasm-bin":
+        wasm = compiler.emitWASMBinary(
+            infile_name, tree, args.bulk_memory, args.peephole)
+        with open(outfile, "wb") as f:
+            out_msg(outfile, args.verbose)
+            f.write(wasm)
+    elif mode == "llvm":
+        llvm_module = compiler.emitLLVM(tree, args.alloc)
+        if args.opt_level > 0 or args.passes is not None:
+            passes = None if args.passes is None else args.passes.split(",")
+            llvm_module = compiler.optimizeLLVM(
+                llvm_module, args.opt_level, passes)
         if args.should_print:
             print(str(llvm_module))
         else:
             with open(outfile, "w") as f:
                 out_msg(outfile, args.verbose)
                 f.write(str(llvm_module))
+    elif mode in {"llvm-obj", "native"}:
+        llvm_module = compiler.emitLLVM(tree, args.alloc)
+        passes = None if args.passes is None else args.passes.split(",")
+        obj = compiler.emitLLVMObject(llvm_module, args.opt_level, passes)
+        if mode == "llvm-obj":
+            with open(outfile, "wb") as f:
+                out_msg(outfile, args.verbose)
+                f.write(obj)
+        else:
+            # the object file is temporary, so it cannot clash with the llvm-obj target
+            with tempfile.TemporaryDirectory() as tmpdir:
+                objfile = os.path.join(tmpdir, infile_name + ".o")
+                with open(objfile, "wb") as f:
+                    f.write(obj)
+                compiler.linkNative(objfile, outfile)
+            out_msg(outfile, args.verbose)
+
+
+def write_shared_output(mode):
+    # runs in a forked worker, which inherits the lowered program
+    assert shared_program is not None
+    compiler, tree, args, infile_name, outdir = shared_program
+    write_output(compiler, tree, mode, args, infile_name, outdir)
+
+
+def write_targets(compiler, tree, targets, args, infile_name, outdir):
+    # the Python backend emits the program before closures are lowered
+    if "python" in targets:
+        write_output(compiler, tree, "python", args, infile_name, outdir)
+    targets = [t for t in targets if t != "python"]
+    compiler.lower(tree)
+    if args.jobs <= 1 or len(targets) <= 1:
+        for t in targets:
+            write_output(compiler, tree, t, args, infile_name, outdir)
+        return
+    global shared_program
+    shared_program = (compiler, tree, args, infile_name, outdir)
+    with multiprocessing.get_context("fork").Pool(min(args.jobs, len(targets))) as pool:
+        pool.map(write_shared_output, targets)
+
+
+def compile_request(params, defaults):
+    # compile source text into a temporary directory, returns the output files and any errors
+    if not isinstance(params, dict) or not isinstance(params.get("source"), str):
+        raise RequestError(INVALID_PARAMS, "params must include the source text")
+    name = params.get("name", "main")
+    if not isinstance(name, str) or not name.isidentifier():
+        raise RequestError(INVALID_PARAMS, "name must be a valid identifier")
+    args = argparse.Namespace(**vars(defaults))
+    args.should_print = False
+    args.verbose = False
+    options = params.get("options", {})
+    if not isinstance(options, dict):
+        raise RequestError(INVALID_PARAMS, "options must be an object")
+    for key in options:
+        if key not in server_options:
+            raise RequestError(INVALID_PARAMS, f"unknown option {key}")
+        valid, description = server_options[key]
+        if not valid(options[key]):
+            raise RequestError(INVALID_PARAMS, f"option {key} must be {description}")
+        setattr(args, key, options[key])
+    mode = params.get("mode", defaults.mode)
+    targets = params.get("targets")
+    if mode == "all":
+        targets = all_targets
+    if targets is not None:
+        if not isinstance(targets, list) or any(t not in target_modes for t in targets):
+            raise RequestError(
+                INVALID_PARAMS, f"targets must be a list of {', '.join(target_modes)}")
+        if "python" in targets and "hoist" in targets:
+            raise RequestError(
+                INVALID_PARAMS, "python and hoist cannot both be targets, they output to the same file")
+    elif mode not in modes:
+        raise RequestError(INVALID_PARAMS, f"unknown mode {mode}")
+
+    compiler = Compiler()
+    tree = compiler.parseSource(params["source"], name + ".py")
+    if len(compiler.parser.errors) > 0 or not isinstance(tree, Node):
+        return {"outputs": {}, "errors": [{"message": str(e)} for e in compiler.parser.errors]}
+    if mode != "parse" or targets is not None:
+        compiler.typecheck(tree)
+        if len(compiler.typechecker.errors) > 0:
+            return {"outputs": {}, "errors": [{"message": e.message, "location": e.location[:2]}
+                                              for e in compiler.typechecker.errors]}
+
+    outputs = {}
+    with tempfile.TemporaryDirectory() as outdir:
+        # stdout may be the connection to the client, so keep output from the backends off it
+        with contextlib.redirect_stdout(sys.stderr):
+            if targets is not None:
+                write_targets(compiler, tree, targets, args, name, outdir + "/")
+            else:
+                write_output(compiler, tree, mode, args, name, outdir + "/")
+        for fname in sorted(os.listdir(outdir)):
+            with open(os.path.join(outdir, fname), "rb") as f:
+                data = f.read()
+            if os.path.splitext(fname)[1] in binary_suffixes:
+                outputs[fname] = {"encoding": "base64",
+                                  "data": base64.b64encode(data).decode()}
+            else:
+                outputs[fname] = {"encoding": "utf-8", "data": data.decode()}
+    return {"outputs": outputs, "errors": []}
+
+
+def handle_request(line, defaults):
+    # returns the JSON-RPC response, or None for notifications, and whether the server should stop
+    request_id = None
+    try:
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            raise RequestError(PARSE_ERROR, f"invalid JSON: {e}")
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            raise RequestError(INVALID_REQUEST, "expected a JSON-RPC request object")
+        request_id = request.get("id")
+        method = request["method"]
+        if method == "compile":
+            result = compile_request(request.get("params"), defaults)
+        elif method == "shutdown":
+            result = None
+        else:
+            raise RequestError(METHOD_NOT_FOUND, f"unknown method {method}")
+        if "id" not in request:
+            return None, method == "shutdown"
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}, method == "shutdown"
+    except RequestError as e:
+        error = {"code": e.code, "message": str(e)}
+    except Exception as e:
+        error = {"code": INTERNAL_ERROR, "message": str(e)}
+    return {"jsonrpc": "2.0", "id": request_id, "error": error}, False
+
+
+def serve_stream(infile, outfile, defaults) -> bool:
+    # one JSON-RPC message per line, returns whether the client asked the server to stop
+    for line in infile:
+        if len(line.strip()) == 0:
+            continue
+        response, stop = handle_request(line, defaults)
+        if response is not None:
+            outfile.write(json.dumps(response) + "\n")
+            outfile.flush()
+        if stop:
+            return True
+    return False
+
+
+def serve(args):
+    # compile requests in a long lived process, so each one avoids startup and import costs
+    if args.socket is None:
+        serve_stream(sys.stdin, sys.stdout, args)
+        return
+    if os.path.exists(args.socket):
+        # only replace a socket left behind by an earlier server
+        if not stat.S_ISSOCK(os.stat(args.socket).st_mode):
+            raise Exception(f"Error: {args.socket} exists and is not a socket")
+        os.remove(args.socket)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(args.socket)
+    server.listen()
+    try:
+        stop = False
+        while not stop:
+            # clients are served one at a time
+            conn, _ = server.accept()
+            with conn, conn.makefile("r") as infile, conn.makefile("w") as outfile:
+                stop = serve_stream(infile, outfile, args)
+    finally:
+        server.close()
+        os.remove(args.socket)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chocopy frontend')
+    parser.add_argument('--mode',
+                        dest='mode',
+                        choices=modes + ["all"],
+                        default="python",
+                        help=mode_help)
+    parser.add_argument('--targets', dest='targets', type=str, default=None,
+                        help="comma-separated list of modes to output from a single parse and typecheck, instead of --mode")
+    parser.add_argument('--jobs', dest='jobs', type=int, default=1,
+                        help="number of worker processes that emit the targets of --targets or --mode all in parallel")
+    parser.add_argument('--print', dest='should_print', action='store_true',
+                        help="output to stdout instead of file")
+    parser.add_argument('--test', dest='test', action='store_true',
+                        help="run all test cases")
+    parser.add_argument('--serve', dest='serve', action='store_true',
+                        help="serve JSON-RPC compile requests on stdin/stdout, one per line, until shutdown")
+    parser.add_argument('--socket', dest='socket', type=str, default=None,
+                        help="serve requests on this Unix socket instead of stdin/stdout")
+    parser.add_argument('--bench', dest='bench', action='store_true',
+                        help="run all benchmarks")
+    parser.add_argument('--verbose', dest='verbose', action='store_true',
+                        help="verbose output")
+    parser.add_argument('--opt-level', dest='opt_level', type=int,
+                        choices=[0, 1, 2, 3], default=0,
+                        help="LLVM optimization level (-O0 to -O3)")
+    parser.add_argument('--passes', dest='passes', type=str, default=None,
+                        help="comma-separated list of LLVM passes to run instead of the default pipeline for the optimization level")
+    parser.add_argument('--alloc', dest='alloc', choices=["gc", "arena"], default="gc",
+                        help="memory allocator for LLVM programs: garbage collected heap, or a bump allocator that never frees memory")
+    parser.add_argument('--no-bulk-memory', dest='bulk_memory', action='store_false',
+                        help="do not use WASM bulk memory instructions, for runtimes that do not support them")
+    parser.add_argument('--no-peephole', dest='peephole', action='store_false',
+                        help="do not run the WASM peephole optimizer")
+    parser.add_argument('infile', nargs='?', type=str, default=None)
+    parser.add_argument('outdir', nargs='?', type=str, default=None)
+    args = parser.parse_args()
+
+    if args.test:
+        run_all_tests()
+        return
+
+    if args.bench:
+        run_all_benchmarks()
+        return
+
+    if args.serve:
+        serve(args)
+        return
+
+    infile = args.infile
+    outdir = args.outdir
+    if args.infile is None:
+        parser.print_help()
+        raise Exception("Error: must specify input file")
+
+    if args.infile[-3:] != ".py":
+        raise Exception("Error: input file must end with .py")
+
+    targets = None
+    if args.targets is not None:
+        targets = args.targets.split(",")
+    elif args.mode == "all":
+        targets = all_targets
+    if targets is not None:
+        for t in targets:
+            if t not in target_modes:
+                raise Exception(
+                    f"Error: unknown target {t}, expected one of {', '.join(target_modes)}")
+        if "python" in targets and "hoist" in targets:
+            raise Exception("Error: python and hoist cannot both be targets, they output to the same file")
+        if args.should_print:
+            raise Exception("Error: cannot print the output of multiple targets to stdout")
+
+    if args.should_print and args.mode in {"jvm-class", "wasm-bin", "llvm-obj", "native"}:
+        raise Exception("Error: cannot print binary output to stdout")
+
+    infile_name = infile[:-3].split("/")[-1]
+
+    if outdir is None:
+        outdir = "./"
+    elif outdir[-1] != "/":
+        outdir = outdir + "/"
+
+    compiler = Compiler()
+    astparser = compiler.parser
+    tc = compiler.typechecker
+    tree = compiler.parse(infile)
+
+    if len(astparser.errors) > 0 or not isinstance(tree, Node):
+        for e in astparser.errors:
+            print(e)
+        raise Exception("Encountered parse errors. Exiting.")
+    elif args.mode != "parse" or targets is not None:
+        compiler.typecheck(tree)
+        if len(tc.errors) > 0:
+            for e in tc.errors:
+                print(e)
+            raise Exception("Encountered typecheck errors. Exiting.")
+
+    if targets is not None:
+        write_targets(compiler, tree, targets, args, infile_name, outdir)
+    else:
+        write_output(compiler, tree, args.mode, args, infile_name, outdir)
 
 
 if __name__ == "__main__":
@@ -1,22 +1,33 @@
 from pathlib import Path
 import json
+import copy
+import pickle
+import gc
 import ast
 import traceback
 import subprocess
+import resource
 from compiler.typechecker import TypeChecker
 from compiler.typeeraser import TypeEraser
 from compiler.typesystem import TypeSystem
+from compiler.symboltable import SymbolTable
+from compiler.types import FuncType, ClassValueType, ListValueType, IntType, BoolType, StrType
 from compiler.compiler import Compiler
+from compiler.wasm_backend import WasmBuilder
+from compiler.astnodes import Program
 import llvmlite.binding as llvm
-from ctypes import CFUNCTYPE
+from ctypes import CFUNCTYPE, c_int
 from typing import List, Optional
 
 dump_location = True
+# address space limit for native executables, so that leaks fail the tests
+native_memory_limit = 128 * 1024 * 1024
 error_flags = {"error", "Error", "Exception",
                "exception", "Expected", "expected", "failed"}
 
 
-disabled_llvm_tests = []
+# the LLVM backend does not support nonlocal list variables
+disabled_llvm_tests = ["nonlocal_list"]
 
 disabled_jvm_tests = []
 
@@ -24,6 +35,35 @@ disabled_cil_tests = []
 
 disabled_wasm_tests = []
 
+# (rule, instructions, expected instructions after running only that rule)
+wasm_peephole_cases = [
+    ("self-copy", ["local.get $x", "local.set $x"], []),
+    ("set-get", ["local.set $x", "local.get $x"], ["local.tee $x"]),
+    ("set-get", ["local.set $x", "local.get $y"], ["local.set $x", "local.get $y"]),
+    ("const-fold", ["i32.const 0", "i32.const 5", "i32.sub"], ["i32.const -5"]),
+    ("const-fold", ["i32.const 2147483647", "i32.const 1", "i32.add"], ["i32.const -2147483648"]),
+    ("const-fold", ["i32.const -7", "i32.const 2", "i32.div_s"], ["i32.const -3"]),
+    ("const-fold", ["i32.const 1", "i32.const 0", "i32.div_s"],
+     ["i32.const 1", "i32.const 0", "i32.div_s"]),
+    ("const-fold", ["local.get $x", "i32.const 4", "i32.add", "i32.const 8", "i32.add"],
+     ["local.get $x", "i32.const 12", "i32.add"]),
+    ("address-offset", ["local.get $x", "i32.const 8", "i32.add", "i32.load"],
+     ["local.get $x", "i32.load offset=8"]),
+    ("address-offset", ["i32.const 8", "i32.add", "local.get $v", "i32.store offset=4"],
+     ["local.get $v", "i32.store offset=12"]),
+    ("address-offset", ["i32.const 8", "i32.add", "call $f", "i32.store"],
+     ["i32.const 8", "i32.add", "call $f", "i32.store"]),
+    ("dead-drop", ["call $f", "i32.const 0", "drop"], ["call $f"]),
+    ("dead-drop", ["call $f", "local.tee $x", "drop"], ["call $f", "local.set $x"]),
+    ("dead-drop", ["call $f", "drop"], ["call $f", "drop"]),
+    ("null-check", ["local.get $x", "call $nullthrow", "drop", "local.get $x", "call $nullthrow"],
+     ["local.get $x", "call $nullthrow", "drop", "local.get $x"]),
+    ("null-check", ["call $alloc", "local.tee $x", "call $len"],
+     ["call $alloc", "local.tee $x", "i32.load"]),
+    ("null-check", ["local.get $x", "call $nullthrow", "call $f", "local.set $x", "local.get $x", "call $len"],
+     ["local.get $x", "call $nullthrow", "call $f", "local.set $x", "local.get $x", "call $len"]),
+]
+
 
 def should_skip(disabled_tests: List[str], test: Path) -> bool:
     skip = False
@@ -38,12 +78,24 @@ def should_skip(disabled_tests: List[str], test: Path) -> bool:
 def run_all_tests():
     run_parse_tests()
     run_typecheck_tests()
+    run_typesystem_tests()
+    run_symboltable_tests()
     run_python_backend_tests()
     run_closure_tests()
     run_jvm_tests()
+    run_jvm_tests(True)
     run_cil_tests()
     run_wasm_tests()
+    run_wasm_tests(True)
+    run_wasm_tests(True, False)
+    run_wasm_tests(False, True, False)
+    run_wasm_peephole_tests()
+    run_shared_lowering_tests()
+    run_server_tests()
     run_llvm_tests()
+    run_llvm_tests(2)
+    run_llvm_native_tests()
+    run_llvm_native_tests(2, "arena")
     # run_llvm_test("tests/runtime/nested_list.py", "debug.ll")
 
 
@@ -152,6 +204,118 @@ def run_closure_tests():
         ), shell=True)
 
 
+def run_typesystem_tests():
+    print("Running type system tests...\n")
+    ts = TypeSystem()
+    ts.addClass("A", "object")
+    ts.addMethod("A", "f", FuncType([ClassValueType("A")], IntType()))
+    ts.addAttr("A", "x", IntType(), None)
+    ts.addClass("B", "A")
+    ts.addMethod("B", "f", FuncType([ClassValueType("B")], IntType()))
+    ts.addMethod("B", "g", FuncType([ClassValueType("B")], IntType()))
+    ts.addAttr("B", "y", BoolType(), None)
+    cases = [
+        [n for n, _, _ in ts.getOrderedMethods("B")] == ["__init__", "f", "g"],
+        ts.getMethodDefClass("B", "f") == "B",
+        ts.getMethodDefClass("B", "__init__") == "object",
+        [n for n, _, _ in ts.getOrderedAttrs("B")] == ["x", "y"],
+        ts.getAttr("B", "x") == IntType(),
+    ]
+    # adding to a superclass after its subclasses were laid out
+    ts.addMethod("A", "h", FuncType([ClassValueType("A")], IntType()))
+    ts.addAttr("A", "z", StrType(), None)
+    cases += [
+        [n for n, _, _ in ts.getOrderedMethods("B")] == ["__init__", "f", "h", "g"],
+        [n for n, _, _ in ts.getOrderedAttrs("B")] == ["x", "z", "y"],
+        ts.getMethodDefClass("B", "h") == "A",
+        ts.getAttrOrMethod("B", "z") == StrType(),
+    ]
+    # subclass tests and joins
+    ts.addClass("C", "A")
+    ts.addClass("D", "B")
+    cases += [
+        ts.isSubClass("D", "A"),
+        ts.isSubClass("A", "A"),
+        not ts.isSubClass("A", "D"),
+        not ts.isSubClass("C", "B"),
+        ts.join(ClassValueType("D"), ClassValueType("C")) == ClassValueType("A"),
+        ts.join(ClassValueType("D"), ClassValueType("B")) == ClassValueType("B"),
+        ts.join(ClassValueType("C"), IntType()) == ClassValueType("object"),
+        ts.join(ListValueType(ClassValueType("C")), ListValueType(ClassValueType("B"))) ==
+        ListValueType(ClassValueType("A")),
+    ]
+    # adding a class after the hierarchy was indexed
+    ts.addClass("E", "C")
+    cases += [
+        ts.isSubClass("E", "A"),
+        ts.join(ClassValueType("E"), ClassValueType("D")) == ClassValueType("A"),
+    ]
+    # types are interned
+    cases += [
+        ClassValueType("int") is IntType(),
+        ListValueType(ListValueType(ClassValueType("A"))) is ListValueType(ListValueType(ClassValueType("A"))),
+        ListValueType(IntType()) is not ListValueType(BoolType()),
+        ts.join(ClassValueType("D"), ClassValueType("C")) is ClassValueType("A"),
+        copy.deepcopy(ListValueType(StrType())) is ListValueType(StrType()),
+        pickle.loads(pickle.dumps(ListValueType(StrType()))) is ListValueType(StrType()),
+    ]
+    # unused user types are dropped from the interning tables, the special types are not
+    ListValueType(ListValueType(ClassValueType("Unused")))
+    gc.collect()
+    cases += [
+        "Unused" not in ClassValueType.interned,
+        ClassValueType("Unused") not in ListValueType.interned,
+        "int" in ClassValueType.interned,
+    ]
+    for i in range(len(cases)):
+        if not cases[i]:
+            print(f"Failed: type system test case {i}\n")
+    print("\nPassed {:d} out of {:d} type system test cases\n".format(
+        sum(cases), len(cases)))
+
+
+def run_symboltable_tests():
+    print("Running symbol table tests...\n")
+    st = SymbolTable()
+    st.add("x", IntType())
+    st.add("y", IntType())
+    st.enterScope()
+    st.add("x", StrType())
+    st.add("z", BoolType())
+    st.enterScope()
+    st.add("z", IntType())
+    cases = [
+        st.lookup("x") is StrType(),
+        st.lookup("z") is IntType(),
+        st.lookupLocal("y") is None,
+        st.lookupNonLocal("z") is BoolType(),
+        st.lookupNonLocal("x") is StrType(),
+        st.lookupNonLocal("y") is None,
+        st.lookupGlobal("x") is IntType(),
+        st.definedInCurrentScope("z"),
+        not st.definedInCurrentScope("x"),
+        st.lookup("w") is None,
+    ]
+    st.exitScope()
+    st.add("x", BoolType())
+    cases += [
+        st.lookup("z") is BoolType(),
+        st.lookupNonLocal("z") is None,
+        st.lookup("x") is BoolType(),
+    ]
+    st.exitScope()
+    cases += [
+        st.lookup("x") is IntType(),
+        st.lookup("z") is None,
+        st.definedInCurrentScope("y"),
+    ]
+    for i in range(len(cases)):
+        if not cases[i]:
+            print(f"Failed: symbol table test case {i}\n")
+    print("\nPassed {:d} out of {:d} symbol table test cases\n".format(
+        sum(cases), len(cases)))
+
+
 def run_python_backend_tests():
     print("Running Python backend tests...\n")
     total = 0
@@ -187,15 +351,20 @@ def run_python_backend_tests():
         n_passed, total))
 
 
-def run_wasm_tests():
-    print("Running WASM backend tests...\n")
+def run_wasm_tests(binary: bool = False, bulkMemory: bool = True, peephole: bool = True):
+    # binary tests encode .wasm files directly instead of using wat2wasm
+    fmt = "binary" if binary else "WAT"
+    if not bulkMemory:
+        fmt += ", no bulk memory"
+    if not peephole:
+        fmt += ", no peephole"
+    print(f"Running WASM backend tests ({fmt})...\n")
     total = 0
     n_passed = 0
-    wasm_tests_dir = (Path(__file__).parent / "tests/runtime/").resolve()
-    for test in wasm_tests_dir.glob('*.py'):
+    for test in runtime_test_programs():
         if should_skip(disabled_wasm_tests, test):
             continue
-        passed = run_wasm_test(test)
+        passed = run_wasm_test(test, binary, bulkMemory, peephole)
         total += 1
         if not passed:
             print("Failed: " + str(test) + "\n")
@@ -207,19 +376,131 @@ def run_wasm_tests():
         ), shell=True)
     else:
         print("\nNot all test cases passed. Please run `make clean` after inspecting the output")
-    print("\nPassed {:d} out of {:d} WASM backend test cases\n".format(
+    print("\nPassed {:d} out of {:d} WASM backend test cases ({})\n".format(
+        n_passed, total, fmt))
+
+
+def emit_target(compiler: Compiler, chocopy_ast: Program, target: str) -> str:
+    if target == "jvm":
+        return "".join(b.emit() for b in compiler.emitJVM("test", chocopy_ast).values())
+    elif target == "cil":
+        return compiler.emitCIL("test", chocopy_ast).emit()
+    elif target == "wasm":
+        return compiler.emitWASM("test", chocopy_ast).emit()
+    elif target == "llvm":
+        return str(compiler.emitLLVM(chocopy_ast))
+    raise Exception(f"unknown target {target}")
+
+
+def run_shared_lowering_tests():
+    # every target emitted from one lowered AST must match the target compiled on its own
+    print("Running shared lowering tests...\n")
+    total = 0
+    n_passed = 0
+    for test in runtime_test_programs():
+        targets = ["jvm", "cil", "wasm"]
+        if not should_skip(disabled_llvm_tests, test):
+            targets.append("llvm")
+        compiler = Compiler()
+        chocopy_ast = build_and_check_ast(compiler, test)
+        compiler.lower(chocopy_ast)
+        passed = True
+        for target in targets:
+            fresh = Compiler()
+            expected = emit_target(fresh, build_and_check_ast(fresh, test), target)
+            if emit_target(compiler, chocopy_ast, target) != expected:
+                print(f"Output for {target} differs from the output of a separate compile")
+                passed = False
+        total += 1
+        if not passed:
+            print("Failed: " + str(test) + "\n")
+        else:
+            n_passed += 1
+    print("\nPassed {:d} out of {:d} shared lowering test cases\n".format(
         n_passed, total))
 
 
-def run_jvm_tests():
-    print("Running JVM backend tests...\n")
+# (request, expected key of the response, or None for notifications)
+server_cases = [
+    ({"jsonrpc": "2.0", "id": 1, "method": "compile",
+      "params": {"source": "print(1)\n", "name": "prog", "mode": "wasm"}}, "result"),
+    ({"jsonrpc": "2.0", "id": 2, "method": "compile",
+      "params": {"source": "x:int = 1\nx = True\n", "mode": "llvm"}}, "result"),
+    ({"jsonrpc": "2.0", "id": 3, "method": "compile",
+      "params": {"source": "print(1)\n", "mode": "unknown"}}, "error"),
+    ({"jsonrpc": "2.0", "id": 4, "method": "unknown"}, "error"),
+    ({"jsonrpc": "2.0", "method": "compile", "params": {"source": "print(1)\n"}}, None),
+    ({"jsonrpc": "2.0", "id": 5, "method": "compile",
+      "params": {"source": "print(1)\n", "targets": ["jvm-class", "llvm"]}}, "result"),
+    ({"jsonrpc": "2.0", "id": 8, "method": "compile",
+      "params": {"source": "print(1)\n", "targets": ["llvm-obj", "native"]}}, "result"),
+    ({"jsonrpc": "2.0", "id": 9, "method": "compile",
+      "params": {"source": "print(1)\n", "mode": "llvm", "options": {"opt_level": "2"}}}, "error"),
+    ({"jsonrpc": "2.0", "id": 10, "method": "compile",
+      "params": {"source": "print(1)\n", "mode": "wasm", "options": {"peephole": 0}}}, "error"),
+    ({"jsonrpc": "2.0", "id": 6, "method": "shutdown"}, "result"),
+    ({"jsonrpc": "2.0", "id": 7, "method": "compile", "params": {"source": "print(1)\n"}}, "result"),
+]
+
+
+def run_server_tests():
+    # main imports this module, so it can only be imported once both are loaded
+    import argparse
+    import io
+    from main import serve_stream
+    print("Running compile server tests...\n")
+    defaults = argparse.Namespace(mode="python", opt_level=0, passes=None, alloc="gc",
+                                  bulk_memory=True, peephole=True, jobs=1)
+    requests = io.StringIO("".join(json.dumps(r) + "\n" for r, _ in server_cases))
+    out = io.StringIO()
+    stopped = serve_stream(requests, out, defaults)
+    responses = [json.loads(l) for l in out.getvalue().splitlines()]
+    # the notification gets no response, and the request after shutdown is not served
+    expected = [(r, k) for r, k in server_cases if k is not None][:-1]
+    passed = stopped and len(responses) == len(expected)
+    for response, (request, key) in zip(responses, expected):
+        if response.get("id") != request["id"] or key not in response:
+            print(f"Unexpected response to {request}: {response}")
+            passed = False
+    if passed:
+        outputs = [r["result"]["outputs"] for r in responses[:2]]
+        errors = [r["result"]["errors"] for r in responses[:2]]
+        passed = list(outputs[0]) == ["prog.wat"] and errors[0] == [] and \
+            outputs[1] == {} and len(errors[1]) == 1 and \
+            set(responses[4]["result"]["outputs"]) == {"main.class", "main.ll"} and \
+            responses[4]["result"]["outputs"]["main.class"]["encoding"] == "base64" and \
+            set(responses[5]["result"]["outputs"]) == {"main.o", "main"} and \
+            all(r["error"]["code"] == -32602 for r in responses[6:8])
+    print("\nPassed {:d} out of 1 compile server test cases\n".format(int(passed)))
+
+
+def run_wasm_peephole_tests():
+    print("Running WASM peephole optimizer tests...\n")
+    n_passed = 0
+    for rule, instrs, expected in wasm_peephole_cases:
+        builder = WasmBuilder("test")
+        for i in instrs:
+            builder.newLine(i)
+        Compiler().optimizeWASM(builder, [rule])
+        if builder.lines == expected:
+            n_passed += 1
+        else:
+            print(f"Failed: {rule} {instrs}, got {builder.lines}")
+    print("\nPassed {:d} out of {:d} WASM peephole optimizer test cases\n".format(
+        n_passed, len(wasm_peephole_cases)))
+
+
+def run_jvm_tests(classfile: bool = False):
+    # classfile tests write .class files directly instead of using Krakatau
+    fmt = "class files" if classfile else "Krakatau"
+    print(f"Running JVM backend tests ({fmt})...\n")
     total = 0
     n_passed = 0
     jvm_tests_dir = (Path(__file__).parent / "tests/runtime/").resolve()
     for test in jvm_tests_dir.glob('*.py'):
         if should_skip(disabled_jvm_tests, test):
             continue
-        passed = run_jvm_test(test)
+        passed = run_jvm_test(test, classfile)
         total += 1
         if not passed:
             print("Failed: " + str(test) + "\n")
@@ -231,8 +512,8 @@ def run_jvm_tests():
         ), shell=True)
     else:
         print("\nNot all test cases passed. Please run `make clean` after inspecting the output")
-    print("\nPassed {:d} out of {:d} JVM backend test cases\n".format(
-        n_passed, total))
+    print("\nPassed {:d} out of {:d} JVM backend test cases ({})\n".format(
+        n_passed, total, fmt))
 
 
 def run_cil_tests():
@@ -406,14 +687,21 @@ def run_python_runtime_test(test) -> bool:
         return False
 
 
-def run_jvm_test(test) -> bool:
+def run_jvm_test(test, classfile: bool = False) -> bool:
     passed = True
     try:
         infile_name = str(test)[:-3].split("/")[-1]
         outdir = "./"
         compiler = Compiler()
         chocopy_ast = build_and_check_ast(compiler, test)
-        jvm_emitters = compiler.emitJVM(infile_name, chocopy_ast)
+        if classfile:
+            classfiles = compiler.emitJVMClasses(infile_name, chocopy_ast)
+            for cls in classfiles:
+                with open(outdir + cls + ".class", "wb") as f:
+                    f.write(classfiles[cls])
+            jvm_emitters = {}
+        else:
+            jvm_emitters = compiler.emitJVM(infile_name, chocopy_ast)
         for cls in jvm_emitters:
             jvm_emitter = jvm_emitters[cls]
             fname = outdir + cls + ".j"
@@ -426,12 +714,12 @@ def run_jvm_test(test) -> bool:
         print(track)
         return False
     try:
-        assembler_commands = [
+        commands = [
             "python3 ../Krakatau/assemble.py -q ./{}.j".format(cls) for cls in jvm_emitters]
-        output = subprocess.check_output("cd {} && {} && java -cp . {}".format(
+        commands.append("java -cp . {}".format(str(test.name[:-3])))
+        output = subprocess.check_output("cd {} && {}".format(
             str(Path(__file__).parent.resolve()),
-            " && ".join(assembler_commands),
-            str(test.name[:-3])
+            " && ".join(commands)
         ), shell=True)
         lines = output.decode().split("\n")
         for l in lines:
@@ -484,7 +772,7 @@ def run_cil_test(test) -> bool:
     return passed
 
 
-def run_wasm_test(test) -> bool:
+def run_wasm_test(test, binary: bool = False, bulkMemory: bool = True, peephole: bool = True) -> bool:
     passed = True
     name = str(test.name[:-3])
     try:
@@ -492,10 +780,16 @@ def run_wasm_test(test) -> bool:
         outdir = "./"
         compiler = Compiler()
         chocopy_ast = build_and_check_ast(compiler, test)
-        wasm_emitter = compiler.emitWASM(infile_name, chocopy_ast)
-        fname = outdir + name + ".wat"
-        with open(fname, "w") as f:
-            f.write(wasm_emitter.emit())
+        if binary:
+            with open(outdir + name + ".wasm", "wb") as f:
+                f.write(compiler.emitWASMBinary(
+                    infile_name, chocopy_ast, bulkMemory, peephole))
+        else:
+            wasm_emitter = compiler.emitWASM(
+                infile_name, chocopy_ast, bulkMemory, peephole=peephole)
+            fname = outdir + name + ".wat"
+            with open(fname, "w") as f:
+                f.write(wasm_emitter.emit())
     except Exception as e:
         print("Internal compiler error:", test)
         track = traceback.format_exc()
@@ -503,8 +797,10 @@ def run_wasm_test(test) -> bool:
         print(track)
         return False
     try:
-        output = subprocess.check_output(
-            f"wat2wasm {name}.wat -o {name}.wasm && node wasm.js {name}.wasm", shell=True)
+        command = f"node wasm.js {name}.wasm"
+        if not binary:
+            command = f"wat2wasm {name}.wat -o {name}.wasm && " + command
+        output = subprocess.check_output(command, shell=True)
         lines = output.decode().split("\n")
         for l in lines:
             for e in error_flags:
@@ -564,12 +860,11 @@ def ast_equals(d1, d2) -> bool:
     return d1 == d2
 
 
-def run_llvm_tests():
-    print("Running LLVM backend tests...\n")
+def run_llvm_tests(optLevel: int = 0):
+    print(f"Running LLVM backend tests (-O{optLevel})...\n")
     total = 0
     n_passed = 0
-    llvm_tests_dir = (Path(__file__).parent / "tests/runtime/").resolve()
-    for test in llvm_tests_dir.glob('*.py'):
+    for test in runtime_test_programs():
         skip = False
         for disabled in disabled_llvm_tests:
             if disabled in str(test):
@@ -578,7 +873,7 @@ def run_llvm_tests():
         if skip:
             print("Skipping: " + str(test) + "\n")
             continue
-        passed = run_llvm_test(test)
+        passed = run_llvm_test(test, optLevel=optLevel)
         total += 1
         if not passed:
             print("Failed: " + str(test) + "\n")
@@ -587,40 +882,115 @@ def run_llvm_tests():
             n_passed += 1
     if total != n_passed:
         print("\nNot all test cases passed")
-    print("\nPassed {:d} out of {:d} LLVM backend test cases\n".format(
-        n_passed, total))
+    print("\nPassed {:d} out of {:d} LLVM backend test cases (-O{:d})\n".format(
+        n_passed, total, optLevel))
+
+
+def runtime_test_programs() -> List[Path]:
+    # benchmark programs are also run, to catch pathological slowdowns and memory exhaustion
+    runtime_tests_dir = (Path(__file__).parent / "tests/runtime/").resolve()
+    benchmark_tests_dir = (Path(__file__).parent / "tests/benchmark/").resolve()
+    return list(runtime_tests_dir.glob('*.py')) + list(benchmark_tests_dir.glob('*.py'))
 
 
 def eval_llvm(module):
     # eval the compiled LLVMLite from Python
+    # accepts either an llvmlite.ir module or an already parsed/optimized module
     target = llvm.Target.from_default_triple()
     target_machine = target.create_target_machine()
-    llvmmod = llvm.parse_assembly(str(module))
+    if isinstance(module, llvm.ModuleRef):
+        llvmmod = module
+    else:
+        llvmmod = llvm.parse_assembly(str(module))
     llvmmod.verify()
     with llvm.create_mcjit_compiler(llvmmod, target_machine) as ee:
         ee.finalize_object()
-        fptr = CFUNCTYPE(None)(ee.get_function_address("main"))
-        fptr()
+        fptr = CFUNCTYPE(c_int)(ee.get_function_address("main"))
+        return fptr()
 
 
-def run_llvm_test(test: str, debug: Optional[str] = None):
+def run_llvm_test(test: str, debug: Optional[str] = None, optLevel: int = 0):
     if debug:
         print("Running test", test)
     try:
         compiler = Compiler()
         chocopy_ast = build_and_check_ast(compiler, test)
         module = compiler.emitLLVM(chocopy_ast)
+        if optLevel > 0:
+            module = compiler.optimizeLLVM(module, optLevel)
         if debug:
             with open(debug, "w") as f:
                 f.write(str(module))
-        eval_llvm(module)
-        return True
+        return eval_llvm(module) == 0
+    except Exception as e:
+        print("Internal compiler error:", test)
+        track = traceback.format_exc()
+        print(e)
+        print(track)
+        return False
+
+
+def run_llvm_native_tests(optLevel: int = 0, alloc: str = "gc"):
+    print(f"Running LLVM native executable tests (-O{optLevel}, {alloc} allocator)...\n")
+    total = 0
+    n_passed = 0
+    for test in runtime_test_programs():
+        if should_skip(disabled_llvm_tests, test):
+            continue
+        passed = run_llvm_native_test(test, optLevel, alloc)
+        total += 1
+        if not passed:
+            print("Failed: " + str(test) + "\n")
+        else:
+            print("Passed: " + str(test) + "\n")
+            n_passed += 1
+    if total != n_passed:
+        print("\nNot all test cases passed")
+    print("\nPassed {:d} out of {:d} LLVM native executable test cases (-O{:d}, {:s} allocator)\n".format(
+        n_passed, total, optLevel, alloc))
+
+
+def run_llvm_native_test(test, optLevel: int = 0, alloc: str = "gc") -> bool:
+    passed = True
+    name = str(test.name[:-3])
+    outdir = str(Path(__file__).parent.resolve()) + "/"
+    try:
+        compiler = Compiler()
+        chocopy_ast = build_and_check_ast(compiler, test)
+        module = compiler.emitLLVM(chocopy_ast, alloc)
+        with open(outdir + name + ".o", "wb") as f:
+            f.write(compiler.emitLLVMObject(module, optLevel))
+        compiler.linkNative(outdir + name + ".o", outdir + name + ".native")
     except Exception as e:
         print("Internal compiler error:", test)
         track = traceback.format_exc()
         print(e)
         print(track)
         return False
+    try:
+        # the arena never frees memory, so it is not limited
+        result = subprocess.run([outdir + name + ".native"], check=True,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                preexec_fn=limit_native_memory if alloc == "gc" else None)
+        if alloc == "arena" and "allocations" not in result.stderr.decode():
+            print("Expected allocation statistics on stderr")
+            return False
+        lines = result.stdout.decode().split("\n")
+        for l in lines:
+            for e in error_flags:
+                if e in l:
+                    passed = False
+                    print(l)
+                    break
+    except Exception as e:
+        print(e)
+        return False
+    return passed
+
+
+def limit_native_memory():
+    resource.setrlimit(resource.RLIMIT_AS,
+                       (native_memory_limit, native_memory_limit))
 
 
 def build_and_check_ast(compiler: Compiler, test: str):
@@ -0,0 +1,25 @@
+def collatz(n: int) -> int:
+    steps: int = 0
+    while n != 1:
+        if n % 2 == 0:
+            n = n // 2
+        else:
+            n = 3 * n + 1
+        steps = steps + 1
+    return steps
+
+
+i: int = 1
+steps: int = 0
+best: int = 0
+best_start: int = 0
+while i < 100000:
+    steps = collatz(i)
+    if steps > best:
+        best = steps
+        best_start = i
+    i = i + 1
+
+assert best == 350
+assert best_start == 77031
+print(best_start)
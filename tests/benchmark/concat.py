@@ -0,0 +1,24 @@
+# concatenates large strings and lists, which is dominated by copying memory
+s: str = "abcdefgh"
+t: str = ""
+l: [int] = None
+m: [int] = None
+i: int = 0
+total: int = 0
+
+l = [1, 2, 3, 4, 5, 6, 7, 8]
+while len(s) < 65536:
+    s = s + s
+    l = l + l
+
+while i < 1000:
+    t = s + s
+    m = l + l
+    total = total + len(t) + len(m) + m[i]
+    i = i + 1
+
+assert len(t) == 131072
+assert len(m) == 131072
+assert t[131071] == "h"
+assert total == 262148500
+print(total)
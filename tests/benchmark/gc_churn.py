@@ -0,0 +1,53 @@
+class Node(object):
+    value: int = 0
+    name: str = ""
+    next: "Node" = None
+
+
+def make_chain(n: int) -> Node:
+    head: Node = None
+    node: Node = None
+    i: int = 0
+    while i < n:
+        node = Node()
+        node.value = i
+        node.name = "node" + "!"
+        node.next = head
+        head = node
+        i = i + 1
+    return head
+
+
+def chain_sum(head: Node) -> int:
+    total: int = 0
+    while not (head is None):
+        total = total + head.value
+        head = head.next
+    return total
+
+
+# a long-lived chain and list which must survive every collection
+kept: Node = None
+kept_list: [Node] = None
+garbage: Node = None
+numbers: [int] = None
+i: int = 0
+total: int = 0
+
+kept = make_chain(1000)
+kept_list = [make_chain(10), make_chain(20), None]
+
+# allocates several hundred megabytes in total, most of which is garbage
+while i < 3000:
+    garbage = make_chain(1000)
+    numbers = [i, i, i, i, i, i, i, i] + [i, i, i, i, i, i, i, i]
+    total = total + chain_sum(garbage) + numbers[15] - i
+    i = i + 1
+
+assert total == 3000 * 499500
+assert chain_sum(kept) == 499500
+assert chain_sum(kept_list[0]) == 45
+assert chain_sum(kept_list[1]) == 190
+assert kept_list[2] is None
+assert kept.name == "node!"
+print(total)
@@ -0,0 +1,44 @@
+def make_list(n: int) -> [int]:
+    items: [int] = None
+    seed: int = 12345
+    i: int = 0
+    items = []
+    while i < n:
+        seed = (seed * 1103 + 12345) % 65536
+        items = items + [seed]
+        i = i + 1
+    return items
+
+
+def bubble_sort(items: [int]) -> object:
+    i: int = 0
+    j: int = 0
+    tmp: int = 0
+    n: int = 0
+    n = len(items)
+    while i < n:
+        j = 0
+        while j < n - i - 1:
+            if items[j] > items[j + 1]:
+                tmp = items[j]
+                items[j] = items[j + 1]
+                items[j + 1] = tmp
+            j = j + 1
+        i = i + 1
+
+
+def is_sorted(items: [int]) -> bool:
+    i: int = 1
+    while i < len(items):
+        if items[i - 1] > items[i]:
+            return False
+        i = i + 1
+    return True
+
+
+data: [int] = None
+data = make_list(2000)
+bubble_sort(data)
+assert len(data) == 2000
+assert is_sorted(data)
+print(data[0])
@@ -0,0 +1,17 @@
+s: str = "a"
+c: str = ""
+i: int = 0
+n: int = 0
+
+# build a 1 MB string
+while i < 20:
+    s = s + s
+    i = i + 1
+assert len(s) == 1048576
+
+for c in s:
+    if c == "a":
+        n = n + 1
+
+assert n == len(s)
+print(n)
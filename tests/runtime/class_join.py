@@ -0,0 +1,48 @@
+class Shape(object):
+    def area(self: "Shape") -> int:
+        return 0
+
+
+class Square(Shape):
+    side: int = 0
+
+    def area(self: "Square") -> int:
+        return self.side * self.side
+
+
+class Rect(Shape):
+    w: int = 0
+    h: int = 0
+
+    def area(self: "Rect") -> int:
+        return self.w * self.h
+
+
+class Cube(Square):
+    def area(self: "Cube") -> int:
+        return 6 * self.side * self.side
+
+
+def make(n: int) -> Shape:
+    s: Square = None
+    r: Rect = None
+    c: Cube = None
+    s = Square()
+    s.side = n
+    r = Rect()
+    r.w = n
+    r.h = n + 1
+    c = Cube()
+    c.side = n
+    return (s if n % 2 == 0 else r) if n % 3 != 0 else (c if n > 3 else r)
+
+
+shapes: [Shape] = None
+total: int = 0
+i: int = 0
+shapes = [Square(), Rect(), Cube()]
+for i in [1, 2, 3, 4, 5, 6]:
+    shapes = shapes + [make(i)]
+for i in [0, 1, 2, 3, 4, 5, 6, 7, 8]:
+    total = total + shapes[i].area()
+assert total == 2 + 4 + 12 + 16 + 30 + 216
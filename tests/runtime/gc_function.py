@@ -0,0 +1,62 @@
+class Box(object):
+    items: [int] = None
+
+    def fill(self: "Box", items: [int]) -> "Box":
+        self.items = items
+        return self
+
+    def total(self: "Box", extra: int) -> int:
+        return self.items[0] + self.items[1] + self.items[2] + extra
+
+
+def grow(n: int) -> [int]:
+    xs: [int] = None
+    xs = []
+    while len(xs) < n:
+        xs = xs + [len(xs)]
+    return xs
+
+
+def churn(big: [int], n: int) -> int:
+    # allocates far more than the maximum memory unless garbage is collected inside this function
+    small: [int] = None
+    copy: [int] = None
+    i: int = 0
+    while i < n:
+        small = [0, 0, i]
+        copy = big + small
+        i = i + 1
+    return small[2]
+
+
+def first(xs: [int], n: int) -> int:
+    return xs[0] + xs[1] + xs[2] + n
+
+
+def countdown(xs: [int], n: int) -> int:
+    # collections at function entries
+    if n == 0:
+        return xs[2]
+    return countdown(xs + grow(100), n - 1)
+
+
+def keep() -> int:
+    # pointers held by callers while their callees collect
+    big: [int] = None
+    total: int = 0
+    x: int = 0
+    big = grow(4096)
+    total = first([1, 2, 3], churn(big, 1000))
+    assert total == 1005
+    total = Box().fill([4, 5, 6]).total(churn(big, 1000))
+    assert total == 1014
+    for x in [7, 8, 9]:
+        total = total + x + churn(big, 100)
+    assert total == 1014 + 24 + 297
+    assert ([10, 11] + [churn(big, 1000)])[1] == 11
+    assert countdown([12, 13, 14], 500) == 14
+    assert len(big) == 4096
+    return churn(big, 80000)
+
+
+assert keep() == 79999
@@ -0,0 +1,59 @@
+class Node(object):
+    value: str = ""
+    next: "Node" = None
+
+
+def a() -> str:
+    # allocates enough to request a collection, then returns a new string
+    i: int = 0
+    xs: [int] = None
+    while i < 2000:
+        xs = [i, i, i, i, i, i]
+        i = i + 1
+    return "x" + "y"
+
+
+digits: str = "0123456789"
+prefix: str = "abcdefghijklmnop"
+lists: [[str]] = None
+garbage: [str] = None
+x: [str] = None
+head: Node = None
+node: Node = None
+i: int = 0
+
+# garbage lists the same size as [a(), a()], holding garbage strings of another size
+while i < 5000:
+    garbage = [prefix + digits[i % 10], prefix + digits[i % 10]]
+    i = i + 1
+
+i = 0
+lists = []
+while i < 200:
+    # the new list is a root before its elements are written
+    x = [a(), a()]
+    lists = lists + [x]
+    i = i + 1
+
+# reuse the freed strings, which must each be handed out once
+i = 0
+while i < 12000:
+    node = Node()
+    node.value = prefix + digits[i % 10]
+    node.next = head
+    head = node
+    i = i + 1
+
+i = 0
+while i < len(lists):
+    assert lists[i][0] == "xy"
+    assert lists[i][1] == "xy"
+    i = i + 1
+i = 12000
+node = head
+while not (node is None):
+    i = i - 1
+    assert node.value == prefix + digits[i % 10]
+    node = node.next
+assert i == 0
+print(len(lists))
@@ -0,0 +1,46 @@
+def sum_all(xs:[int]) -> int:
+    total:int = 0
+    x:int = 0
+    for x in xs + [0]:
+        total = total + x
+    for x in xs + [1]:
+        total = total + x
+    for x in xs + [2]:
+        total = total + x
+    for x in xs + [3]:
+        total = total + x
+    for x in xs + [4]:
+        total = total + x
+    for x in xs + [5]:
+        total = total + x
+    for x in xs + [6]:
+        total = total + x
+    for x in xs + [7]:
+        total = total + x
+    for x in xs + [8]:
+        total = total + x
+    for x in xs + [9]:
+        total = total + x
+    for x in xs + [10]:
+        total = total + x
+    for x in xs + [11]:
+        total = total + x
+    for x in xs + [12]:
+        total = total + x
+    for x in xs + [13]:
+        total = total + x
+    for x in xs + [14]:
+        total = total + x
+    for x in xs + [15]:
+        total = total + x
+    for x in xs + [16]:
+        total = total + x
+    for x in xs + [17]:
+        total = total + x
+    for x in xs + [18]:
+        total = total + x
+    for x in xs + [19]:
+        total = total + x
+    return total
+
+assert sum_all([1, 2, 3]) == 310
@@ -0,0 +1,24 @@
+def grow() -> int:
+    n:[int] = None
+    b:[bool] = None
+    def step():
+        nonlocal n
+        nonlocal b
+        n = n + [len(n)]
+        b = b + [not b[len(b) - 1]]
+    n = [1]
+    b = [True]
+    step()
+    step()
+    assert b[2]
+    assert not b[1]
+    return n[0] + n[1] + n[2]
+
+x:[int] = None
+y:[object] = None
+x = [1, 2]
+y = x + [True]
+assert len(y) == 3
+y = [False] + x
+assert len(y) == 3
+assert grow() == 4
@@ -3,5 +3,13 @@ def foo() -> bool:
     return True
 
 
+def positive_at(xs: [int], i: int) -> bool:
+    return i < len(xs) and xs[i] > 0
+
+
 print(True or foo())
 print(False and foo())
+assert positive_at([1, 2], 1)
+assert not positive_at([1, 2], 2)
+assert (False or True) and (True or foo())
+assert not (False and foo() or False)
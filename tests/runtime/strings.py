@@ -63,3 +63,9 @@ assert "1" + "2" + "3" + "4" + "5" == "12345"
 
 x = "123123"
 assert x[0] + x[1] + x[2] == x[3] + x[4] + x[5]
+
+x = "123"
+assert x != "12"
+assert "12" != x
+assert x != "124"
+assert not (x == "1234")
@@ -24,9 +24,8 @@ function logString(offset) {
 }
 
 function logInt(val) {
-    // cast BigInt to a number for pretty-printing w/o the "n"
-    // this may truncate or break for values that take >53 bits
-    console.log(Number(val));
+    // this is a signed 32 bit number
+    console.log(val);
 }
 
 function logBool(val) {
@@ -42,7 +41,7 @@ function assert(val, line) {
 
 const memory = new WebAssembly.Memory({
     initial: 10,
-    maximum: 100
+    maximum: 16384
 });
 
 const importObject = {